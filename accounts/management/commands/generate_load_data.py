@@ -0,0 +1,396 @@
+"""
+Management command to generate a large synthetic data set for load testing.
+
+Creates N employees with their user accounts and salary history, then M
+months of payslips with line items and approval audit entries, all with
+chunked bulk_create. The same --seed always produces the same data.
+"""
+import random
+import re
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max, Q
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from core_config.models import DeductionType, PaymentType
+from payroll.generation import calculate_payslip_figures, resolve_period_settings
+from payroll.models import EmployeeYTD, Payslip, PayslipAudit, PayslipLineItem, SystemConfiguration
+from payroll.transitions import status_config_for
+from payroll.ytd import rebuild_ytd
+from payslip.date_utils import month_year_range, parse_month_year
+from staff.models import Employee, EmployeeSalary
+from .password_utils import resolve_default_password
+
+FIRST_NAMES = [
+    "KWAME", "KOFI", "KWABENA", "KWAKU", "YAW", "KWADWO", "KOJO", "AMA", "AKOSUA", "ABENA", "AKUA",
+    "YAA", "AFUA", "ADWOA", "ESI", "EFUA", "EMMANUEL", "GIFTY", "PRINCE", "MERCY", "ISAAC", "GRACE",
+    "SAMUEL", "JOYCE", "DANIEL", "PATIENCE", "ERIC", "VIDA", "FRANCIS", "COMFORT", "IBRAHIM", "ZAINAB",
+]
+SURNAMES = [
+    "MENSAH", "BOATENG", "OWUSU", "ASANTE", "OSEI", "ADDO", "AGYEMAN", "APPIAH", "DARKO", "OFORI",
+    "AMOAH", "ANSAH", "QUAYE", "LARTEY", "TETTEH", "ANNAN", "BAIDOO", "AMPONSAH", "DANSO", "ACQUAH",
+    "LAAR", "ISSAH", "ABUBAKAR", "YEBOAH", "FORDJOUR", "KUMI", "NKRUMAH", "ARYEE", "SACKEY", "DOKU",
+]
+# (department, units, weight)
+DEPARTMENTS = [
+    ("Operations", ["Emergency Response", "Dispatch", "Fleet"], 40),
+    ("Administration", ["Estate", "Registry", "Protocol"], 20),
+    ("Security", ["Main Gate", "Stations"], 15),
+    ("Transport", ["Drivers", "Workshop"], 10),
+    ("Finance", ["Accounts", "Payroll", "Stores"], 5),
+    ("Human Resources", ["Recruitment", "Welfare"], 4),
+    ("ICT", ["Support", "Systems"], 3),
+    ("Public Relations", ["Media"], 2),
+    ("Audit", ["Internal Audit"], 1),
+]
+# Districts get Zipf-like weights: a few large assemblies, a long tail of small ones.
+DISTRICTS = [
+    "Accra Metropolitan Assembly", "Kumasi Metropolitan Assembly", "Tema Metropolitan Assembly",
+    "Sekondi-Takoradi Metropolitan Assembly", "Tamale Metropolitan Assembly", "Cape Coast Metropolitan Assembly",
+    "Ho Municipal Assembly", "Koforidua (New Juaben) Municipal Assembly", "Sunyani Municipal Assembly",
+    "Bolgatanga Municipal Assembly", "Wa Municipal Assembly", "Techiman Municipal Assembly",
+    "Obuasi Municipal Assembly", "Ashaiman Municipal Assembly", "Kasoa (Awutu Senya East) Municipal Assembly",
+    "Winneba (Effutu) Municipal Assembly", "Nkawkaw (Kwahu West) Municipal Assembly", "Hohoe Municipal Assembly",
+]
+DISTRICT_WEIGHTS = [1 / (rank + 1) for rank in range(len(DISTRICTS))]
+# (status, grade, level, salary band low/high in GHS, weight)
+POSITIONS = [
+    ("CLEANER", "Temporal Worker", "Cleaner", 800, 1100, 25),
+    ("SECURITY", "Temporal Worker", "Security Officer", 900, 1400, 25),
+    ("DRIVER", "Casual", "Driver", 1100, 1900, 20),
+    ("ADMINISTRATIVE ASSISTANT", "Casual", "Administrative Assistant", 1300, 2600, 15),
+    ("PHOTOGRAPHER", "Casual", "Photographer", 1400, 2600, 2),
+    ("INTERN", "National Service", "Intern", 600, 900, 8),
+    ("OTHER", "Casual", "Technician", 1000, 3200, 5),
+]
+BANKS = [
+    ("GCB", ["OSU", "HIGH STREET", "KUMASI MAIN", "TEMA", "TAKORADI"]),
+    ("ECOBANK", ["RIDGE", "ADUM", "SPINTEX"]),
+    ("ABSA", ["INDEPENDENCE AVENUE", "KEJETIA"]),
+    ("STANBIC", ["AIRPORT CITY", "ACHIMOTA"]),
+    ("CAL BANK", ["LEGON", "KOFORIDUA"]),
+    ("AGRICULTURAL DEVELOPMENT BANK", ["HEAD OFFICE", "TAMALE"]),
+]
+# Approval status mix by how far the month is from the newest one generated.
+STATUS_MIX = {
+    0: [("pending", 65), ("approved", 33), ("rejected", 2)],
+    1: [("pending", 8), ("approved", 90), ("rejected", 2)],
+}
+SETTLED_STATUS_MIX = [("approved", 99), ("rejected", 1)]
+REJECT_REASONS = ["Wrong department", "Incorrect basic salary", "Duplicate payment", "Employee on leave"]
+SEPARATION_REASONS = ["Contract ended", "Resigned", "End of national service", "Dismissed"]
+
+NEW_HIRE_RATE = 0.08
+SEPARATION_RATE = 0.05
+RAISE_RATE = 0.01
+BANKED_RATE = 0.85
+ALLOWANCE_RATE = 0.4
+OVERTIME_RATE = 0.1
+LOAN_RATE = 0.12
+EDIT_RATE = 0.02
+
+
+class Command(BaseCommand):
+    help = "Generates synthetic employees, users and months of payslips for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=1000, help="Number of employees (default 1000)")
+        parser.add_argument('--months', type=int, default=12, help="Months of payslips (default 12)")
+        parser.add_argument('--end', help="Newest period, e.g. Jun-2026 (defaults to the current month)")
+        parser.add_argument('--seed', type=int, default=1, help="Random seed; the same seed gives the same data")
+        parser.add_argument('--prefix', default='LT', help="Staff ID and username prefix for generated records")
+        parser.add_argument('--chunk-size', type=int, default=5000, help="Rows per bulk insert transaction")
+        parser.add_argument('--clear', action='store_true', help="Delete records generated earlier with this prefix first")
+        parser.add_argument('--default-password', help="Password for the generated users (defaults to DEFAULT_USER_PASSWORD)")
+
+    def handle(self, *args, **options):
+        end = options['end'] or timezone.localdate().strftime('%b-%Y')
+        if parse_month_year(end) is None:
+            raise CommandError(f"Invalid period {end!r}; expected e.g. Jan-2026.")
+        if options['employees'] < 1 or options['months'] < 1:
+            raise CommandError("--employees and --months must be at least 1.")
+        self.prefix = options['prefix']
+        # Generated ids are the prefix and six digits; matching the digits too keeps
+        # case-insensitive collations from catching real records such as 'lt' or 'LTA1'.
+        self.id_pattern = rf"^{re.escape(self.prefix)}[0-9]{{6}}$"
+        self.chunk_size = options['chunk_size']
+        self.rng = random.Random(options['seed'])
+
+        if options['clear']:
+            self.clear()
+        elif Employee.objects.filter(staff_id__regex=self.id_pattern).exists():
+            raise CommandError(f"Employees with prefix {self.prefix!r} already exist; pass --clear or another --prefix.")
+
+        end_dt = parse_month_year(end)
+        start_index = end_dt.year * 12 + end_dt.month - options['months']
+        start = date(start_index // 12, start_index % 12 + 1, 1).strftime('%b-%Y')
+        periods = month_year_range(start, end)
+
+        # One hash for every generated account; hashing per user would dominate the run.
+        password_hash = make_password(resolve_default_password(options['default_password']))
+        approvers = self.create_approvers(password_hash)
+        employees = self.create_employees(options['employees'], periods, password_hash)
+        self.create_payslips(employees, periods, approvers)
+
+        years = sorted({parse_month_year(period).year for period in periods})
+        for year in years:
+            rebuild_ytd(year)
+        self.stdout.write(self.style.SUCCESS(
+            f"Load data complete: {len(employees)} employees, {len(periods)} months ({start} to {end}), "
+            f"year-to-date totals rebuilt for {', '.join(map(str, years))}."
+        ))
+
+    def clear(self):
+        employees = Employee.objects.filter(staff_id__regex=self.id_pattern)
+        payslips = Payslip.objects.filter(employee__in=employees)
+        with transaction.atomic():
+            # Children first, so each delete is a single statement instead of a cascade collection.
+            PayslipLineItem.objects.filter(payslip__in=payslips).delete()
+            PayslipAudit.objects.filter(payslip__in=payslips).delete()
+            EmployeeYTD.objects.filter(employee__in=employees).delete()
+            EmployeeSalary.objects.filter(employee__in=employees).delete()
+            _, deleted = payslips.delete()
+            employees.delete()
+            CustomUser.objects.filter(
+                Q(username__regex=self.id_pattern) | Q(username__regex=rf"^{re.escape(self.prefix)}-finance[0-9]$"),
+                is_superuser=False,
+            ).delete()
+        self.stdout.write(self.style.WARNING(f"Cleared {deleted.get('payroll.Payslip', 0)} generated payslips and records under prefix {self.prefix!r}"))
+
+    def create_approvers(self, password_hash):
+        approvers = []
+        for number in range(1, 4):
+            user, _ = CustomUser.objects.get_or_create(
+                username=f"{self.prefix}-finance{number}",
+                defaults={
+                    'password': password_hash,
+                    'email': f"{self.prefix.lower()}_finance{number}@nas.gov.gh",
+                    'first_name': self.rng.choice(FIRST_NAMES).title(),
+                    'last_name': self.rng.choice(SURNAMES).title(),
+                    'role': 'finance',
+                    'department': 'Finance',
+                },
+            )
+            approvers.append(user)
+        return approvers
+
+    def random_employee(self, number, periods):
+        rng = self.rng
+        staff_id = f"{self.prefix}{number:06d}"
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(FIRST_NAMES + [''])} {rng.choice(SURNAMES)}".replace('  ', ' ')
+        department, units, _ = rng.choices(DEPARTMENTS, weights=[d[2] for d in DEPARTMENTS])[0]
+        status, grade, level, low, high, _ = rng.choices(POSITIONS, weights=[p[5] for p in POSITIONS])[0]
+        salary = Decimal(round(rng.triangular(low, high, low + (high - low) / 3) / 5) * 5)
+
+        # First and last period index paid; hires and separations fall inside the window.
+        first, last = 0, len(periods) - 1
+        if len(periods) > 1 and rng.random() < NEW_HIRE_RATE:
+            first = rng.randrange(1, len(periods))
+        if last > first and rng.random() < SEPARATION_RATE:
+            last = rng.randrange(first, len(periods) - 1)
+        first_day = parse_month_year(periods[first]).date()
+        hired = first_day + timedelta(days=rng.randrange(0, 20)) if first else first_day - timedelta(
+            days=rng.randrange(30, 3650))
+
+        salaries = {}
+        for index in range(first, last + 1):
+            if index > first and rng.random() < RAISE_RATE:
+                salary = (salary * Decimal(rng.uniform(1.05, 1.25))).quantize(Decimal('5'))
+            salaries[index] = salary
+
+        bank_name, bank_branch, bank_account = '', '', ''
+        if rng.random() < BANKED_RATE:
+            bank_name, branches = rng.choice(BANKS)
+            bank_branch = rng.choice(branches)
+            bank_account = str(rng.randrange(10 ** 12, 10 ** 13))
+        employee = Employee(
+            staff_id=staff_id,
+            name=name,
+            date_of_hire=hired,
+            date_of_birth=hired - timedelta(days=rng.randrange(18 * 365, 50 * 365)),
+            status=status,
+            ssnit_number=f"P{rng.randrange(10 ** 11, 10 ** 12)}",
+            ghana_card=f"GHA-{rng.randrange(10 ** 8, 10 ** 9)}-{rng.randrange(10)}",
+            bank_name=bank_name,
+            bank_account=bank_account,
+            bank_branch=bank_branch,
+            contact=f"0{rng.choice([24, 54, 55, 20, 50, 27])}{rng.randrange(10 ** 6, 10 ** 7)}",
+            gender=rng.choice(['Male', 'Female']),
+            monthly_salary=salaries[last],
+            department=department,
+            unit=rng.choice(units),
+            grade=grade,
+            level=level,
+            is_active=last == len(periods) - 1,
+        )
+        if not employee.is_active:
+            employee.separation_reason = rng.choice(SEPARATION_REASONS)
+            employee.separated_at = timezone.make_aware(datetime.combine(
+                parse_month_year(periods[last]).date() + timedelta(days=27), time(12)))
+        return {
+            'employee': employee,
+            'district': rng.choices(DISTRICTS, weights=DISTRICT_WEIGHTS)[0],
+            'salaries': salaries,
+            'first': first,
+            'last': last,
+            'allowance': Decimal(rng.randrange(50, 400, 10)) if rng.random() < ALLOWANCE_RATE else None,
+            'loan': Decimal(rng.randrange(50, 300, 10)) if rng.random() < LOAN_RATE else None,
+        }
+
+    def create_employees(self, count, periods, password_hash):
+        """Employees, their salary history and user accounts, inserted in chunks."""
+        employees = []
+        for start in range(0, count, self.chunk_size):
+            chunk = [self.random_employee(number, periods)
+                     for number in range(start + 1, min(start + self.chunk_size, count) + 1)]
+            history, users = [], []
+            for record in chunk:
+                employee = record['employee']
+                previous = None
+                for index, salary in record['salaries'].items():
+                    if salary != previous:
+                        effective = employee.date_of_hire if index == record['first'] else \
+                            parse_month_year(periods[index]).date()
+                        history.append(EmployeeSalary(employee=employee, monthly_salary=salary, effective_from=effective))
+                        previous = salary
+                first_name, _, last_name = employee.name.partition(' ')
+                users.append(CustomUser(
+                    username=employee.staff_id,
+                    email=f"{employee.staff_id.lower()}@nas.gov.gh",
+                    password=password_hash,
+                    role='staff',
+                    staff_id=employee.staff_id,
+                    first_name=first_name.title(),
+                    last_name=last_name.title(),
+                    is_active=employee.is_active,
+                    must_change_password=True,
+                ))
+            with transaction.atomic():
+                Employee.objects.bulk_create([record['employee'] for record in chunk])
+                EmployeeSalary.objects.bulk_create(history)
+                CustomUser.objects.bulk_create(users)
+            employees.extend(chunk)
+            self.stdout.write(f"  {len(employees)}/{count} employees")
+        return employees
+
+    def create_payslips(self, employees, periods, approvers):
+        """
+        Payslips month by month, with their line items and audit entries.
+
+        Ids are assigned here rather than read back after each insert (MySQL
+        does not return them from bulk_create), so nothing else may write
+        payslips, line items or audits while the command runs. Each month's
+        rows get consecutive ids, which lets one range UPDATE per month
+        backdate their auto_now_add timestamps.
+        """
+        config = SystemConfiguration.get_settings()
+        payment_types = PaymentType.objects.in_bulk(['ALLOWANCE', 'OVERTIME'], field_name='code')
+        deduction_types = DeductionType.objects.in_bulk(['OTHER'], field_name='code')
+        status_configs = {status: status_config_for(status) for status in ['pending', 'approved', 'rejected']}
+        next_ids = {
+            model: (model.objects.aggregate(top=Max('id'))['top'] or 0) + 1
+            for model in (Payslip, PayslipLineItem, PayslipAudit)
+        }
+
+        for age, month_year in enumerate(reversed(periods)):
+            index = len(periods) - 1 - age
+            period = resolve_period_settings(month_year, config=config)
+            month_start = parse_month_year(month_year).date()
+            generated_at = timezone.make_aware(datetime.combine(month_start + timedelta(days=24), time(9)))
+            first_ids = dict(next_ids)
+            statuses, weights = zip(*STATUS_MIX.get(age, SETTLED_STATUS_MIX))
+            figures_cache = {}
+            paid = [record for record in employees if record['first'] <= index <= record['last']]
+
+            for start in range(0, len(paid), self.chunk_size):
+                payslips, line_items, audits = [], [], []
+                for record in paid[start:start + self.chunk_size]:
+                    employee = record['employee']
+                    basic = record['salaries'][index]
+                    lines = []
+                    if record['allowance']:
+                        lines.append(('payment', payment_types.get('ALLOWANCE'), 'General Allowance', record['allowance']))
+                    if self.rng.random() < OVERTIME_RATE:
+                        # Time and a half for 4-40 hours on a 176-hour month.
+                        overtime = round(basic * Decimal('1.5') * self.rng.randrange(4, 40) / 176, 2)
+                        lines.append(('payment', payment_types.get('OVERTIME'), 'Overtime', overtime))
+                    if record['loan']:
+                        lines.append(('deduction', deduction_types.get('OTHER'), 'Staff Loan Repayment', record['loan']))
+                    allowances = sum((amount for kind, _, _, amount in lines if kind == 'payment'), Decimal(0))
+                    other = record['loan'] or Decimal(0)
+                    key = (basic, allowances, other)
+                    if key not in figures_cache:
+                        figures_cache[key] = calculate_payslip_figures(basic, period, allowances, other)
+
+                    status = self.rng.choices(statuses, weights)[0]
+                    approver = self.rng.choice(approvers)
+                    payslip_id = next_ids[Payslip]
+                    next_ids[Payslip] += 1
+                    payslips.append(Payslip(
+                        id=payslip_id,
+                        employee=employee,
+                        month_year=month_year,
+                        agency=config.agency_name,
+                        district=record['district'],
+                        department=employee.department,
+                        unit=employee.unit,
+                        grade=employee.grade,
+                        level=employee.level,
+                        payment_mode=f"{employee.bank_name}, {employee.bank_branch}" if employee.bank_name else "",
+                        approval_status=status,
+                        status_config=status_configs[status],
+                        approved_by=approver if status == 'approved' else None,
+                        approved_at=generated_at + timedelta(days=2) if status == 'approved' else None,
+                        generated_by=approver,
+                        last_modified_by=approver,
+                        version=0 if status == 'pending' else 1,
+                        **figures_cache[key],
+                    ))
+                    for order, (kind, item_type, nature, amount) in enumerate(lines):
+                        line_items.append(PayslipLineItem(
+                            id=next_ids[PayslipLineItem],
+                            payslip_id=payslip_id,
+                            item_type=kind,
+                            payment_type=item_type if kind == 'payment' else None,
+                            deduction_type=item_type if kind == 'deduction' else None,
+                            nature=nature,
+                            hours_or_amount=amount,
+                            balance=amount,
+                            order=order,
+                        ))
+                        next_ids[PayslipLineItem] += 1
+                    entries = []
+                    if status != 'pending' and self.rng.random() < EDIT_RATE:
+                        entries.append(('edit', 'pending', 'pending', "Corrected allowances"))
+                    if status == 'approved':
+                        entries.append(('approve', 'pending', 'approved', ''))
+                    elif status == 'rejected':
+                        entries.append(('reject', 'pending', 'rejected', self.rng.choice(REJECT_REASONS)))
+                    for action, old_status, new_status, reason in entries:
+                        audits.append(PayslipAudit(
+                            id=next_ids[PayslipAudit],
+                            payslip_id=payslip_id,
+                            action=action,
+                            old_status=old_status,
+                            new_status=new_status,
+                            reason=reason,
+                            performed_by=approver,
+                        ))
+                        next_ids[PayslipAudit] += 1
+                with transaction.atomic():
+                    Payslip.objects.bulk_create(payslips)
+                    PayslipLineItem.objects.bulk_create(line_items)
+                    PayslipAudit.objects.bulk_create(audits)
+
+            # bulk_create stamps auto_now_add fields with the current time; move them into the month.
+            with transaction.atomic():
+                Payslip.objects.filter(id__gte=first_ids[Payslip], id__lt=next_ids[Payslip]).update(
+                    generated_at=generated_at, last_modified_at=generated_at + timedelta(days=2))
+                PayslipAudit.objects.filter(id__gte=first_ids[PayslipAudit], id__lt=next_ids[PayslipAudit]).update(
+                    performed_at=generated_at + timedelta(days=2))
+            self.stdout.write(f"  {month_year}: {len(paid)} payslips")
@@ -10,7 +10,8 @@ from datetime import datetime
 from .models import CustomUser
 from .forms import CustomUserCreationForm, StaffIdPasswordResetForm
 from staff.models import Employee
-from payroll.models import Payslip
+from payroll.models import Payslip, PayrollPeriod
+from payroll.signed_links import signed_pdf_links
 from .decorators import admin_required, hr_admin_required, finance_required
 from payslip.date_utils import build_month_year_filters
 
@@ -260,7 +261,7 @@ def staff_dashboard(request):
             if selected_year:
                 payslips_qs = payslips_qs.filter(month_year__endswith=selected_year)
 
-            payslips_qs = payslips_qs.order_by('-generated_at')
+            payslips_qs = payslips_qs.select_related('employee').order_by('-generated_at')
             payslips = Paginator(payslips_qs, 10).get_page(request.GET.get('page'))
             selected_payslip = payslips_qs.first()
         else:
@@ -272,11 +273,18 @@ def staff_dashboard(request):
         employee = None
         payslips = []
         selected_payslip = None
+
+    # Signed links let the PDF requests skip login and database checks.
+    pdf_links = None
+    if selected_payslip:
+        period = PayrollPeriod.objects.filter(month_year=selected_payslip.month_year).first()
+        pdf_links = signed_pdf_links(selected_payslip, period)
         
     context = {
         'employee': employee,
         'payslips': payslips,
         'selected_payslip': selected_payslip,
+        'pdf_links': pdf_links,
         'month_options': month_options,
         'year_options': year_options,
         'selected_month': selected_month,
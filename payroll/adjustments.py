@@ -0,0 +1,247 @@
+"""
+Bulk allowance and deduction adjustments for a pay period
+"""
+from collections import defaultdict
+from dataclasses import dataclass, field, replace
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from core_config.models import DeductionType, PaymentType
+from payslip.sheet_utils import iter_sheet_rows, read_sheet_headers
+from staff.importers import STAFF_ID_HEADERS, get_row_value
+from .generation import calculate_payslip_figures, resolve_period_settings
+from .models import Payslip, PayslipAudit, PayslipLineItem, PayrollPeriod
+from .rules import rule_amount
+
+TYPE_HEADERS = ['type', 'TYPE', 'code']
+AMOUNT_HEADERS = ['amount', 'AMOUNT']
+ADJUSTMENT_HEADERS = {
+    'staff_id': STAFF_ID_HEADERS,
+    'type': TYPE_HEADERS,
+    'amount': AMOUNT_HEADERS,
+}
+PAYSLIP_ADJUSTMENT_FIELDS = [
+    'allowances', 'gross_salary', 'ssnit_deduction', 'tier2_deduction', 'income_tax', 'other_deductions',
+    'net_salary', 'ssnit_rate', 'tier2_rate', 'last_modified_by', 'last_modified_at', 'version',
+]
+
+
+@dataclass
+class AdjustmentBatch:
+    """Validated adjustments for one period, summed per payslip and type"""
+    month_year: str
+    amounts: dict = field(default_factory=lambda: defaultdict(Decimal))
+    payslip_ids: dict = field(default_factory=dict)
+    errors: list = field(default_factory=list)
+    row_count: int = 0
+
+    @property
+    def is_valid(self):
+        return not self.errors
+
+
+def _load_adjustment_types():
+    """Map lower-cased codes and names of active types to (kind, type)."""
+    types = {}
+    for kind, model in (('payment', PaymentType), ('deduction', DeductionType)):
+        for adjustment_type in model.objects.filter(is_active=True):
+            types.setdefault(adjustment_type.code.lower(), (kind, adjustment_type))
+            types.setdefault(adjustment_type.name.lower(), (kind, adjustment_type))
+    return types
+
+
+def validate_adjustments(path, month_year):
+    """
+    Validate an adjustments sheet in one streaming pass.
+
+    Each row names a staff ID, a payment or deduction type (code or name) and
+    an amount. Repeated rows for the same staff ID and type are summed.
+    Every staff ID must have a pending payslip for ``month_year``.
+    """
+    batch = AdjustmentBatch(month_year=month_year)
+    if PayrollPeriod.is_month_final(month_year):
+        batch.errors.append(f"{month_year} is closed; its payslips can no longer be adjusted.")
+        return batch
+    headers = {h.lower() for h in read_sheet_headers(path)}
+    missing = [
+        label for label, options in ADJUSTMENT_HEADERS.items()
+        if not any(option.lower() in headers for option in options)
+    ]
+    if missing:
+        batch.errors.append(f"Missing required column(s): {', '.join(missing)}")
+        return batch
+
+    types = _load_adjustment_types()
+    rows_by_staff = defaultdict(list)
+    for row_number, row in enumerate(iter_sheet_rows(path), start=2):
+        batch.row_count += 1
+        staff_id = get_row_value(row, STAFF_ID_HEADERS)
+        type_label = get_row_value(row, TYPE_HEADERS)
+        raw_amount = get_row_value(row, AMOUNT_HEADERS)
+        if not staff_id:
+            batch.errors.append(f"Row {row_number}: staff ID is required.")
+            continue
+        adjustment_type = types.get((type_label or '').lower())
+        if adjustment_type is None:
+            batch.errors.append(f"Row {row_number}: unknown payment or deduction type '{type_label}'.")
+            continue
+        try:
+            amount = Decimal(str(raw_amount).replace(',', ''))
+        except (InvalidOperation, ValueError):
+            batch.errors.append(f"Row {row_number}: invalid amount '{raw_amount}'.")
+            continue
+        if not amount.is_finite() or amount < 0:
+            batch.errors.append(f"Row {row_number}: amount must be zero or more.")
+            continue
+        rows_by_staff[staff_id].append((row_number, adjustment_type, amount))
+
+    pending = dict(
+        Payslip.objects.filter(
+            month_year=month_year,
+            approval_status='pending',
+            employee_id__in=list(rows_by_staff),
+        ).values_list('employee_id', 'id')
+    )
+    for staff_id, rows in rows_by_staff.items():
+        payslip_id = pending.get(staff_id)
+        if payslip_id is None:
+            batch.errors.append(
+                f"Row {rows[0][0]}: no pending payslip for {staff_id} in {month_year}."
+            )
+            continue
+        batch.payslip_ids[staff_id] = payslip_id
+        for _, (kind, adjustment_type), amount in rows:
+            batch.amounts[(payslip_id, kind, adjustment_type)] += amount
+    return batch
+
+
+def _line_type_filter(batch):
+    payment_ids = {t.id for (_, kind, t) in batch.amounts if kind == 'payment'}
+    deduction_ids = {t.id for (_, kind, t) in batch.amounts if kind == 'deduction'}
+    return Q(payment_type_id__in=payment_ids) | Q(deduction_type_id__in=deduction_ids)
+
+
+def _payslip_rates(payslip, period):
+    """The period's settings with the SSNIT and Tier 2 rates the payslip was generated with, if it kept them."""
+    return replace(
+        period,
+        ssnit_rate=period.ssnit_rate if payslip.ssnit_rate is None else payslip.ssnit_rate,
+        tier2_rate=period.tier2_rate if payslip.tier2_rate is None else payslip.tier2_rate,
+    )
+
+
+def apply_adjustments(batch, user, reason):
+    """
+    Apply a validated batch to its payslips.
+
+    An uploaded type replaces any existing line of that type on the payslip,
+    so a corrected sheet can be uploaded again. Totals are recomputed with
+    the batch calculator at the payslip's own SSNIT and Tier 2 rates and the
+    period's tax table, and rule deductions charged as a percentage of gross
+    follow the new gross; payslips and rule lines are written with
+    ``bulk_update``, new line items and audit entries bulk inserted.
+    Returns the number of payslips changed.
+    """
+    payslip_ids = set(batch.payslip_ids.values())
+    if not payslip_ids:
+        return 0
+
+    period = resolve_period_settings(batch.month_year)
+    now = timezone.now()
+    with transaction.atomic():
+        payslips = {
+            p.id: p for p in Payslip.objects.select_for_update().filter(
+                id__in=payslip_ids, approval_status='pending'
+            )
+        }
+        replaced = [
+            line for line in PayslipLineItem.objects.filter(payslip_id__in=payslips).filter(
+                _line_type_filter(batch)
+            ).select_related('payment_type', 'deduction_type')
+            if (line.payslip_id, line.item_type, line.payment_type or line.deduction_type) in batch.amounts
+        ]
+        rule_deductions = list(
+            PayslipLineItem.objects.filter(payslip_id__in=payslips, item_type='deduction', rate_percent__gt=0)
+            .exclude(id__in=[line.id for line in replaced])
+        )
+        non_taxable = dict(
+            PayslipLineItem.objects.filter(
+                payslip_id__in=payslips, item_type='payment', payment_type__is_taxable=False
+            ).values('payslip_id').annotate(total=Sum('balance')).values_list('payslip_id', 'total')
+        )
+
+        allowance_delta = defaultdict(Decimal)
+        deduction_delta = defaultdict(Decimal)
+        non_taxable_delta = defaultdict(Decimal)
+        for line in replaced:
+            if line.item_type == 'payment':
+                allowance_delta[line.payslip_id] -= line.balance
+                if not line.payment_type.is_taxable:
+                    non_taxable_delta[line.payslip_id] -= line.balance
+            else:
+                deduction_delta[line.payslip_id] -= line.balance
+
+        line_items = []
+        for order, ((payslip_id, kind, adjustment_type), amount) in enumerate(batch.amounts.items(), start=100):
+            if payslip_id not in payslips:
+                continue
+            if kind == 'payment':
+                allowance_delta[payslip_id] += amount
+                if not adjustment_type.is_taxable:
+                    non_taxable_delta[payslip_id] += amount
+            else:
+                deduction_delta[payslip_id] += amount
+            line_items.append(PayslipLineItem(
+                payslip_id=payslip_id,
+                item_type=kind,
+                payment_type=adjustment_type if kind == 'payment' else None,
+                deduction_type=adjustment_type if kind == 'deduction' else None,
+                nature=adjustment_type.name,
+                hours_or_amount=amount,
+                balance=amount,
+                order=order,
+            ))
+
+        for line in rule_deductions:
+            payslip = payslips[line.payslip_id]
+            gross_salary = payslip.basic_salary + payslip.allowances + allowance_delta[payslip.id]
+            amount = rule_amount(gross_salary, line.rate_percent)
+            deduction_delta[payslip.id] += amount - line.balance
+            line.hours_or_amount = gross_salary
+            line.balance = amount
+
+        audits = []
+        for payslip in payslips.values():
+            allowances = payslip.allowances + allowance_delta[payslip.id]
+            figures = calculate_payslip_figures(
+                payslip.basic_salary,
+                _payslip_rates(payslip, period),
+                allowances=allowances,
+                other_deductions=payslip.other_deductions + deduction_delta[payslip.id],
+                taxable_income=payslip.basic_salary + allowances
+                - non_taxable.get(payslip.id, Decimal(0)) - non_taxable_delta[payslip.id],
+            )
+            for name, value in figures.items():
+                setattr(payslip, name, value)
+            payslip.last_modified_by = user
+            # bulk_update skips auto_now, so the timestamp is set explicitly.
+            payslip.last_modified_at = now
+            payslip.version = F('version') + 1
+            audits.append(PayslipAudit(
+                payslip=payslip,
+                action='adjust',
+                old_status=payslip.approval_status,
+                new_status=payslip.approval_status,
+                reason=reason,
+                performed_by=user,
+            ))
+
+        PayslipLineItem.objects.filter(id__in=[line.id for line in replaced]).delete()
+        PayslipLineItem.objects.bulk_create(line_items)
+        PayslipLineItem.objects.bulk_update(rule_deductions, ['hours_or_amount', 'balance'], batch_size=500)
+        Payslip.objects.bulk_update(payslips.values(), PAYSLIP_ADJUSTMENT_FIELDS, batch_size=500)
+        PayslipAudit.objects.bulk_create(audits)
+    return len(payslips)
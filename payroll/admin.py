@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Payslip, PayslipLineItem, SystemConfiguration
+from .models import Payslip, PayslipLineItem, PayrollPeriod, SystemConfiguration
 
 
 class PayslipLineItemInline(admin.TabularInline):
@@ -32,7 +32,7 @@ class PayslipAdmin(admin.ModelAdmin):
             'fields': ('basic_salary', 'allowances', 'gross_salary')
         }),
         ('Deductions', {
-            'fields': ('ssnit_deduction', 'tier2_deduction', 'income_tax', 'other_deductions')
+            'fields': ('ssnit_deduction', 'tier2_deduction', 'income_tax', 'other_deductions', 'ssnit_rate', 'tier2_rate')
         }),
         ('Net Salary', {
             'fields': ('net_salary', 'payment_mode')
@@ -54,6 +54,15 @@ class PayslipLineItemAdmin(admin.ModelAdmin):
     search_fields = ['payslip__employee__name', 'nature']
 
 
+@admin.register(PayrollPeriod)
+class PayrollPeriodAdmin(admin.ModelAdmin):
+    """Admin interface for PayrollPeriod"""
+    list_display = ['month_year', 'status', 'ssnit_rate', 'tier2_rate', 'closed_at', 'closed_by', 'locked_at']
+    list_filter = ['status']
+    search_fields = ['month_year']
+    readonly_fields = ['created_at', 'updated_at']
+
+
 @admin.register(SystemConfiguration)
 class SystemConfigurationAdmin(admin.ModelAdmin):
     """Admin interface for SystemConfiguration"""
@@ -0,0 +1,142 @@
+"""
+Bank payment files
+
+Approved payslips of a period as a bank transfer list, grouped per bank
+with a control total after each bank and for the whole file. Lines are
+generated from one select_related iterator, so the file can be streamed
+straight to the client or to disk.
+"""
+import csv
+import unicodedata
+from decimal import Decimal
+
+from django.utils import timezone
+
+from .models import Payslip, SystemConfiguration
+from .utils import EchoBuffer
+
+BANK_FILE_CHUNK_SIZE = 2000
+
+CSV_HEADER = ['Record', 'Bank', 'Branch', 'Account Number', 'Staff ID', 'Name', 'Amount', 'Reference']
+
+# Fixed-width record layouts: (field, width). Text is left-aligned and
+# space-padded; counts and amounts (in pesewas) are zero-padded.
+FIXED_WIDTH_LAYOUTS = {
+    'H': [('agency', 40), ('period', 8), ('created', 8)],
+    'D': [('bank', 30), ('branch', 30), ('account', 20), ('staff_id', 12), ('name', 40),
+          ('amount', 13), ('reference', 20)],
+    'T': [('bank', 30), ('count', 7), ('amount', 15)],
+    'F': [('banks', 4), ('count', 7), ('amount', 15)],
+}
+NUMERIC_FIELDS = {'count', 'amount', 'banks'}
+# Every record is padded to the longest layout plus its type letter.
+RECORD_LENGTH = 1 + max(sum(width for _, width in layout) for layout in FIXED_WIDTH_LAYOUTS.values())
+
+
+def bank_payment_queryset(month_year):
+    """Approved payslips with money to pay into a bank account, in file order."""
+    return (
+        Payslip.objects.filter(month_year=month_year, approval_status='approved', net_salary__gt=0)
+        .exclude(employee__bank_account='')
+        .select_related('employee')
+        .only(
+            'id', 'month_year', 'net_salary', 'employee__staff_id', 'employee__name',
+            'employee__bank_name', 'employee__bank_branch', 'employee__bank_account',
+        )
+        .order_by('employee__bank_name', 'employee__bank_branch', 'employee__name', 'id')
+    )
+
+
+def payslips_without_bank_details(month_year):
+    """Approved payslips left out of the bank file because the employee has no account number."""
+    return Payslip.objects.filter(
+        month_year=month_year, approval_status='approved', net_salary__gt=0, employee__bank_account='',
+    )
+
+
+def payment_reference(payslip):
+    return f"SAL {payslip.month_year} {payslip.employee.staff_id}"
+
+
+def bank_payment_records(month_year, chunk_size=BANK_FILE_CHUNK_SIZE):
+    """
+    The file as a stream of records:
+    ('H', {...}), then per bank ('D', {...}) rows and a ('T', {...}) control
+    total, and finally ('F', {...}) with the file totals.
+    """
+    yield ('H', {
+        'agency': SystemConfiguration.get_settings().agency_name,
+        'period': month_year,
+        'created': timezone.localdate().strftime('%Y%m%d'),
+    })
+    bank = None
+    bank_count = banks = count = 0
+    bank_total = total = Decimal('0')
+    for payslip in bank_payment_queryset(month_year).iterator(chunk_size=chunk_size):
+        employee = payslip.employee
+        name = employee.bank_name or 'UNSPECIFIED BANK'
+        if name != bank:
+            if bank is not None:
+                yield ('T', {'bank': bank, 'count': bank_count, 'amount': bank_total})
+            bank, bank_count, bank_total = name, 0, Decimal('0')
+            banks += 1
+        bank_count += 1
+        count += 1
+        bank_total += payslip.net_salary
+        total += payslip.net_salary
+        yield ('D', {
+            'bank': name,
+            'branch': employee.bank_branch,
+            'account': employee.bank_account,
+            'staff_id': employee.staff_id,
+            'name': employee.name,
+            'amount': payslip.net_salary,
+            'reference': payment_reference(payslip),
+        })
+    if bank is not None:
+        yield ('T', {'bank': bank, 'count': bank_count, 'amount': bank_total})
+    yield ('F', {'banks': banks, 'count': count, 'amount': total})
+
+
+def csv_lines(month_year):
+    """The bank file as CSV lines; control totals use the Count and Amount columns."""
+    writer = csv.writer(EchoBuffer())
+    yield writer.writerow(CSV_HEADER)
+    for record, values in bank_payment_records(month_year):
+        if record == 'D':
+            row = ['D', values['bank'], values['branch'], values['account'], values['staff_id'],
+                   values['name'], f"{values['amount']:.2f}", values['reference']]
+        elif record == 'T':
+            row = ['T', values['bank'], '', '', '', f"{values['count']} payments", f"{values['amount']:.2f}", '']
+        elif record == 'F':
+            row = ['F', f"{values['banks']} banks", '', '', '', f"{values['count']} payments",
+                   f"{values['amount']:.2f}", '']
+        else:
+            continue
+        yield writer.writerow(row)
+
+
+def _fixed(value, field, width):
+    if field == 'amount':
+        return str(int(value * 100)).zfill(width)[-width:]
+    if field in NUMERIC_FIELDS:
+        return str(value).zfill(width)[-width:]
+    text = unicodedata.normalize('NFKD', str(value or '')).encode('ascii', 'ignore').decode('ascii')
+    return text.upper()[:width].ljust(width)
+
+
+def fixed_width_lines(month_year):
+    """The bank file as fixed-width records, one per line."""
+    for record, values in bank_payment_records(month_year):
+        fields = ''.join(_fixed(values[field], field, width) for field, width in FIXED_WIDTH_LAYOUTS[record])
+        yield f"{record}{fields}".ljust(RECORD_LENGTH) + '\r\n'
+
+
+BANK_FILE_FORMATS = {
+    'csv': (csv_lines, 'text/csv'),
+    'txt': (fixed_width_lines, 'text/plain'),
+}
+
+
+def bank_file_name(month_year, fmt):
+    return f"bank_payments_{month_year.replace('-', '_')}.{fmt}"
@@ -0,0 +1,142 @@
+"""
+Annual income and PAYE certificates
+
+One certificate per employee with approved pay in a tax year, built from
+the EmployeeYTD ledger (one query for the whole year) and drawn with the
+payslip canvas layout across a process pool. A certificate whose file is
+newer than its ledger row is skipped, so an interrupted run picks up
+where it stopped.
+"""
+import multiprocessing
+import os
+from collections import deque
+from dataclasses import dataclass, field
+
+from django.db import connections
+from django.utils import timezone
+
+from .models import EmployeeYTD, SystemConfiguration
+from .pdf_canvas import draw_tax_certificate
+from .pdf_storage import absolute_path, atomic_write, certificate_relative_path
+from .utils import agency_logo_path, employee_identifier
+
+CERTIFICATE_TASK_SIZE = 50
+MAX_BATCHES_PER_WORKER = 4
+
+
+@dataclass
+class CertificateRun:
+    total: int = 0
+    skipped: int = 0
+    written: int = 0
+    errors: dict = field(default_factory=dict)
+
+
+def certificate_fields(ytd, config, logo_path, issued):
+    """Plain values printed on one certificate; picklable for the pool."""
+    employee = ytd.employee
+    other_deductions = (
+        ytd.gross_salary - ytd.ssnit_deduction - ytd.tier2_deduction - ytd.income_tax - ytd.net_salary
+    )
+    return {
+        'filepath': absolute_path(certificate_relative_path(employee.staff_id, ytd.tax_year)[0]),
+        'logo_path': logo_path,
+        'tax_year': ytd.tax_year,
+        'period_display': f"01-JAN-{ytd.tax_year} TO 31-DEC-{ytd.tax_year}",
+        'name': employee.name or '',
+        'staff_id': employee.staff_id,
+        'staff_identifier': employee_identifier(employee),
+        'department': employee.department or '',
+        'agency': config.agency_name,
+        'payslip_count': ytd.payslip_count,
+        'basic_salary': ytd.basic_salary,
+        'allowances': ytd.gross_salary - ytd.basic_salary,
+        'gross_salary': ytd.gross_salary,
+        'ssnit_deduction': ytd.ssnit_deduction,
+        'tier2_deduction': ytd.tier2_deduction,
+        'income_tax': ytd.income_tax,
+        'other_deductions': other_deductions,
+        'total_deductions': ytd.gross_salary - ytd.net_salary,
+        'net_salary': ytd.net_salary,
+        'issued_line': f"Issued on {issued} | Staff ID: {employee.staff_id} | Tax year {ytd.tax_year}",
+    }
+
+
+def certificate_is_current(filepath, ytd):
+    """True if the certificate on disk was written after the ledger row last changed."""
+    try:
+        return os.path.getmtime(filepath) >= ytd.updated_at.timestamp()
+    except OSError:
+        return False
+
+
+def render_certificates(batch):
+    """Draw a batch of certificates in a pool process; no database access. Returns {staff_id: error}."""
+    errors = {}
+    for fields in batch:
+        try:
+            with atomic_write(fields['filepath']) as tmp_path:
+                draw_tax_certificate(tmp_path, fields)
+        except (OSError, ValueError, TypeError) as exc:
+            errors[fields['staff_id']] = str(exc)
+    return errors
+
+
+def _pending_batches(run, tax_year, force, task_size):
+    """Field batches for the certificates that need writing; counts the rest as skipped."""
+    config = SystemConfiguration.get_settings()
+    logo_path = agency_logo_path(config)
+    issued = timezone.localdate().strftime('%d %b %Y')
+    ledger = (
+        EmployeeYTD.objects.filter(tax_year=tax_year, payslip_count__gt=0)
+        .select_related('employee')
+        .order_by('employee_id')
+        .iterator(chunk_size=2000)
+    )
+    batch = []
+    for ytd in ledger:
+        run.total += 1
+        fields = certificate_fields(ytd, config, logo_path, issued)
+        if not force and certificate_is_current(fields['filepath'], ytd):
+            run.skipped += 1
+            continue
+        batch.append(fields)
+        if len(batch) >= task_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def generate_certificates(tax_year, workers=None, task_size=CERTIFICATE_TASK_SIZE, force=False, progress=None):
+    """
+    Write the certificates of ``tax_year``; returns a CertificateRun.
+
+    The pool is forked before the ledger is read, with no database
+    connection open, and is handed plain field dicts so children never touch
+    the database. At most a few batches per worker are in flight, so memory
+    stays flat however many employees there are. ``progress`` is called
+    with (processed, seen so far) as batches finish.
+    """
+    run = CertificateRun()
+    workers = workers or os.cpu_count() or 1
+    in_flight = deque()
+
+    def collect():
+        result, size = in_flight.popleft()
+        errors = result.get()
+        run.errors.update(errors)
+        run.written += size - len(errors)
+        if progress is not None:
+            progress(run.skipped + run.written + len(run.errors), run.total)
+
+    connections.close_all()
+    context = multiprocessing.get_context('fork')
+    with context.Pool(workers) as pool:
+        for batch in _pending_batches(run, tax_year, force, task_size):
+            in_flight.append((pool.apply_async(render_certificates, (batch,)), len(batch)))
+            if len(in_flight) >= workers * MAX_BATCHES_PER_WORKER:
+                collect()
+        while in_flight:
+            collect()
+    return run
@@ -4,6 +4,7 @@ from datetime import date
 from .models import Payslip, SystemConfiguration
 from staff.models import Employee
 from accounts.models import CustomUser
+from payslip.date_utils import month_year_range
 
 MONTH_YEAR_FORMAT = '%b-%Y'
 
@@ -100,11 +101,26 @@ class PayslipGenerateForm(forms.Form):
 
 class BulkPayslipGenerateForm(forms.Form):
     """Form for bulk generating payslips for all active employees"""
+    MAX_PERIODS = 24
+
     month_year = forms.ChoiceField(
         choices=[],
         widget=forms.Select(attrs={'class': 'form-select'}),
         label="Month/Year"
     )
+    end_month_year = forms.ChoiceField(
+        choices=[],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label="Through Month/Year",
+        help_text="Optional. Generate every month from Month/Year through this month in one run."
+    )
+    include_arrears = forms.BooleanField(
+        required=False,
+        label="Show arrears summary",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'}),
+        help_text="Summarize payslips for the earlier months of the range as arrears"
+    )
     district = forms.CharField(
         max_length=200,
         widget=forms.TextInput(attrs={'class': 'form-control'}),
@@ -127,6 +143,7 @@ class BulkPayslipGenerateForm(forms.Form):
         month_year_choices = build_month_year_choices()
         self.fields['month_year'].choices = month_year_choices
         self.fields['month_year'].initial = date.today().strftime(MONTH_YEAR_FORMAT)
+        self.fields['end_month_year'].choices = [('', '-- Single month --')] + month_year_choices
         self.fields['district'].initial = config.default_district
         self.fields['ssnit_rate'].initial = config.ssnit_rate
         self.fields['tier2_rate'].initial = config.tier2_rate
@@ -135,6 +152,79 @@ class BulkPayslipGenerateForm(forms.Form):
         month_year = self.cleaned_data['month_year']
         return month_year
 
+    def clean(self):
+        cleaned_data = super().clean()
+        start = cleaned_data.get('month_year')
+        end = cleaned_data.get('end_month_year') or start
+        if not start:
+            return cleaned_data
+
+        periods = month_year_range(start, end)
+        if not periods:
+            self.add_error('end_month_year', "Through Month/Year must not be before Month/Year.")
+        elif len(periods) > self.MAX_PERIODS:
+            self.add_error('end_month_year', f"A single run can cover at most {self.MAX_PERIODS} months.")
+        cleaned_data['periods'] = periods
+        return cleaned_data
+
+
+class BulkAdjustmentForm(forms.Form):
+    """Upload of allowances and deductions to apply to a pay period"""
+    month_year = forms.ChoiceField(
+        choices=[],
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label="Month/Year"
+    )
+    file = forms.FileField(
+        label="Adjustments File",
+        widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.csv,.xlsx,.xls'}),
+        help_text="CSV or Excel with staff_id, type and amount columns"
+    )
+    reason = forms.CharField(
+        max_length=200,
+        widget=forms.TextInput(attrs={'class': 'form-control'}),
+        label="Reason",
+        help_text="Recorded in the audit trail of every adjusted payslip"
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['month_year'].choices = build_month_year_choices()
+        self.fields['month_year'].initial = date.today().strftime(MONTH_YEAR_FORMAT)
+
+    def clean_file(self):
+        uploaded = self.cleaned_data['file']
+        if not uploaded.name.lower().endswith(('.csv', '.xlsx', '.xls')):
+            raise ValidationError("Upload a .csv, .xlsx or .xls file.")
+        return uploaded
+
+
+class PayslipRecomputeForm(forms.Form):
+    """Recompute unapproved payslips after a rate or tax table change"""
+    STATUS_CHOICES = [
+        ('pending', 'Pending only'),
+        ('pending,rejected', 'Pending and rejected'),
+    ]
+
+    month_year = forms.ChoiceField(
+        choices=[],
+        required=False,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label="Month/Year"
+    )
+    status = forms.ChoiceField(
+        choices=STATUS_CHOICES,
+        widget=forms.Select(attrs={'class': 'form-select'}),
+        label="Payslips"
+    )
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['month_year'].choices = [('', '-- All periods --')] + build_month_year_choices()
+
+    def clean_status(self):
+        return self.cleaned_data['status'].split(',')
+
 
 class SystemConfigurationForm(forms.ModelForm):
     """Form for updating system settings"""
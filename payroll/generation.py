@@ -0,0 +1,242 @@
+"""
+Batch payslip generation
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from django.db import transaction
+
+from payslip.date_utils import parse_month_year
+from staff.models import Employee
+from staff.salaries import salary_as_of_expression
+from .models import Payslip, PayslipLineItem, PayrollPeriod, SystemConfiguration
+from .rules import PayRuleSet
+from .utils import calculate_ssnit, calculate_tier2, calculate_income_tax, tax_brackets_for
+
+GENERATION_CHUNK_SIZE = 500
+
+EMPLOYEE_SNAPSHOT_FIELDS = [
+    'staff_id', 'department', 'unit', 'grade', 'level', 'bank_name', 'bank_branch',
+]
+
+
+@dataclass
+class PeriodSettings:
+    """Rates and tax table resolved once for a pay period"""
+    month_year: str
+    ssnit_rate: Decimal
+    tier2_rate: Decimal
+    tax_brackets: list
+    agency: str
+    district: str
+
+
+@dataclass
+class PeriodSummary:
+    month_year: str
+    created: int = 0
+    skipped: int = 0
+    gross_total: Decimal = Decimal(0)
+    net_total: Decimal = Decimal(0)
+
+
+@dataclass
+class GenerationSummary:
+    periods: list = field(default_factory=list)
+    arrears_periods: list = field(default_factory=list)
+    closed_periods: list = field(default_factory=list)
+
+    @property
+    def created(self):
+        return sum(p.created for p in self.periods)
+
+    @property
+    def skipped(self):
+        return sum(p.skipped for p in self.periods)
+
+    @property
+    def arrears_count(self):
+        return sum(p.created for p in self.arrears_periods)
+
+    @property
+    def arrears_net_total(self):
+        return sum((p.net_total for p in self.arrears_periods), Decimal(0))
+
+
+def resolve_period_settings(month_year, ssnit_rate=None, tier2_rate=None, district=None, config=None):
+    """
+    Resolve the rates and tax table that apply to one period: rates passed
+    in explicitly, else those frozen on the period when it was closed (it
+    keeps them if reopened), else the current configuration.
+    """
+    config = config or SystemConfiguration.get_settings()
+    period_dt = parse_month_year(month_year)
+    frozen = PayrollPeriod.objects.filter(month_year=month_year).first()
+    if ssnit_rate is None:
+        ssnit_rate = config.ssnit_rate if frozen is None or frozen.ssnit_rate is None else frozen.ssnit_rate
+    if tier2_rate is None:
+        tier2_rate = config.tier2_rate if frozen is None or frozen.tier2_rate is None else frozen.tier2_rate
+    return PeriodSettings(
+        month_year=month_year,
+        ssnit_rate=ssnit_rate,
+        tier2_rate=tier2_rate,
+        tax_brackets=frozen.tax_brackets() if frozen and frozen.tax_table else tax_brackets_for(period_dt.year),
+        agency=config.agency_name,
+        district=district or config.default_district,
+    )
+
+
+def calculate_payslip_figures(basic_salary, period, allowances=Decimal(0), other_deductions=Decimal(0),
+                              taxable_income=None):
+    """
+    Compute gross, statutory deductions and net for one payslip, with the
+    SSNIT and Tier 2 rates they were worked out with.
+
+    PAYE is charged on ``taxable_income`` when given (basic plus taxable
+    allowances), otherwise on the full gross.
+    """
+    gross_salary = basic_salary + allowances
+    if taxable_income is None:
+        taxable_income = gross_salary
+    ssnit = calculate_ssnit(gross_salary, period.ssnit_rate)
+    tier2 = calculate_tier2(gross_salary, period.tier2_rate)
+    income_tax = calculate_income_tax(taxable_income, period.tax_brackets)
+    return {
+        'basic_salary': basic_salary,
+        'allowances': allowances,
+        'gross_salary': gross_salary,
+        'ssnit_deduction': ssnit,
+        'tier2_deduction': tier2,
+        'income_tax': income_tax,
+        'other_deductions': other_deductions,
+        'net_salary': gross_salary - ssnit - tier2 - income_tax - other_deductions,
+        'ssnit_rate': period.ssnit_rate,
+        'tier2_rate': period.tier2_rate,
+    }
+
+
+def _payment_mode(employee):
+    if not employee['bank_name']:
+        return ""
+    return f"{employee['bank_name']}, {employee['bank_branch']}"
+
+
+def calculate_with_rules(basic_salary, period, rules):
+    """Apply the pay rules and compute the payslip figures for one salary."""
+    applied = rules.apply(basic_salary)
+    figures = calculate_payslip_figures(
+        basic_salary,
+        period,
+        allowances=applied.allowances,
+        other_deductions=applied.other_deductions,
+        taxable_income=basic_salary + applied.taxable_allowances,
+    )
+    return figures, applied
+
+
+def _insert_chunk(pending):
+    """
+    Insert a chunk of payslips and their line items.
+
+    ``bulk_create`` does not return primary keys on MySQL, so the new ids are
+    read back in one query before the line items are bulk inserted. Payslips
+    that already carry lines were created by a concurrent run and are left
+    alone.
+    """
+    payslips = [payslip for payslip, _ in pending]
+    with transaction.atomic():
+        # ignore_conflicts: a concurrent run may have created the same employee/period.
+        Payslip.objects.bulk_create(payslips, ignore_conflicts=True)
+        if not any(applied.lines for _, applied in pending):
+            return
+
+        ids = {
+            (employee_id, month_year): pk
+            for pk, employee_id, month_year in Payslip.objects.filter(
+                employee_id__in={p.employee_id for p in payslips},
+                month_year__in={p.month_year for p in payslips},
+                line_items__isnull=True,
+            ).values_list('id', 'employee_id', 'month_year')
+        }
+        line_items = []
+        for payslip, applied in pending:
+            payslip_id = ids.get((payslip.employee_id, payslip.month_year))
+            if payslip_id is not None:
+                line_items.extend(applied.build_line_items(payslip_id))
+        PayslipLineItem.objects.bulk_create(line_items)
+
+
+def generate_payslips(month_years, user, ssnit_rate=None, tier2_rate=None, district=None,
+                      include_arrears=False, chunk_size=GENERATION_CHUNK_SIZE):
+    """
+    Generate pending payslips for every active employee across one or more
+    periods in a single pass.
+
+    Employees are loaded once, with the salary in force for every period
+    resolved in the same query. Existing payslips for all periods are
+    fetched in one query and skipped. New payslips are inserted with
+    chunked ``bulk_create``, with their line items inserted per chunk from
+    pay rules loaded once for the run. With ``include_arrears``, every period
+    before the latest one is also reported as arrears.
+    """
+    config = SystemConfiguration.get_settings()
+    rules = PayRuleSet.load()
+    summary = GenerationSummary()
+    summary.closed_periods = list(
+        PayrollPeriod.final_month_years().filter(month_year__in=month_years).values_list('month_year', flat=True)
+    )
+    month_years = [m for m in month_years if m not in summary.closed_periods]
+    periods = [
+        resolve_period_settings(month_year, ssnit_rate, tier2_rate, district, config)
+        for month_year in month_years
+    ]
+    salary_annotations = {
+        f'salary_{index}': salary_as_of_expression(parse_month_year(period.month_year).date())
+        for index, period in enumerate(periods)
+    }
+    employees = list(
+        Employee.objects.filter(is_active=True)
+        .annotate(**salary_annotations)
+        .values(*EMPLOYEE_SNAPSHOT_FIELDS, *salary_annotations)
+    )
+    existing = set(
+        Payslip.objects.filter(month_year__in=month_years).values_list('employee_id', 'month_year')
+    )
+
+    pending = []
+    for index, period in enumerate(periods):
+        period_summary = PeriodSummary(month_year=period.month_year)
+        summary.periods.append(period_summary)
+        for employee in employees:
+            if (employee['staff_id'], period.month_year) in existing:
+                period_summary.skipped += 1
+                continue
+
+            figures, applied = calculate_with_rules(employee[f'salary_{index}'], period, rules)
+            pending.append((Payslip(
+                employee_id=employee['staff_id'],
+                month_year=period.month_year,
+                agency=period.agency,
+                district=period.district,
+                department=employee['department'],
+                unit=employee['unit'],
+                grade=employee['grade'],
+                level=employee['level'],
+                payment_mode=_payment_mode(employee),
+                approval_status='pending',
+                generated_by=user,
+                **figures
+            ), applied))
+            period_summary.created += 1
+            period_summary.gross_total += figures['gross_salary']
+            period_summary.net_total += figures['net_salary']
+
+            if len(pending) >= chunk_size:
+                _insert_chunk(pending)
+                pending = []
+    if pending:
+        _insert_chunk(pending)
+
+    if include_arrears and len(summary.periods) > 1:
+        summary.arrears_periods = summary.periods[:-1]
+    return summary
@@ -0,0 +1,95 @@
+"""
+Work-partitioned approval queue: approvers lease disjoint batches of pending payslips
+"""
+from datetime import timedelta
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Payslip, PayslipLease
+
+LEASE_BATCH_SIZE = 25
+LEASE_DURATION = timedelta(minutes=15)
+
+
+def reclaim_leases():
+    """Drop expired leases and leases on payslips that are no longer pending."""
+    return PayslipLease.objects.filter(
+        Q(expires_at__lte=timezone.now()) | ~Q(payslip__approval_status='pending')
+    ).delete()[0]
+
+
+def active_leases(user):
+    return PayslipLease.objects.filter(
+        holder=user, expires_at__gt=timezone.now(), payslip__approval_status='pending'
+    )
+
+
+def leased_by_others(user):
+    """Q matching payslips under an unexpired lease held by someone else."""
+    return Q(id__in=PayslipLease.objects.filter(
+        expires_at__gt=timezone.now()
+    ).exclude(holder=user).values('payslip_id'))
+
+
+def lease_holder(payslip_id, user):
+    """Another user currently holding a lease on the payslip, if any."""
+    lease = PayslipLease.objects.filter(
+        payslip_id=payslip_id, expires_at__gt=timezone.now()
+    ).exclude(holder=user).select_related('holder').first()
+    return lease.holder if lease else None
+
+
+def _claim_skip_locked(candidates, user, count, expires_at):
+    # Rows another approver is claiming right now are skipped, not waited on.
+    with transaction.atomic():
+        ids = list(candidates.select_for_update(skip_locked=True).values_list('id', flat=True)[:count])
+        PayslipLease.objects.bulk_create(
+            [PayslipLease(payslip_id=payslip_id, holder=user, expires_at=expires_at) for payslip_id in ids],
+            ignore_conflicts=True,
+        )
+
+
+def _claim_with_lease_table(candidates, user, count, expires_at):
+    # No SKIP LOCKED (SQLite): the unique payslip column on the lease table
+    # decides races, and losers simply do not get those rows.
+    ids = list(candidates.values_list('id', flat=True)[:count])
+    PayslipLease.objects.bulk_create(
+        [PayslipLease(payslip_id=payslip_id, holder=user, expires_at=expires_at) for payslip_id in ids],
+        ignore_conflicts=True,
+    )
+
+
+def claim_batch(user, queryset=None, size=LEASE_BATCH_SIZE, duration=LEASE_DURATION):
+    """
+    Lease up to ``size`` pending payslips from ``queryset`` to ``user``.
+
+    Expired leases are reclaimed first. Existing leases held by the user are
+    renewed and count towards the batch, so each approver always has one
+    disjoint batch. Returns the user's active leases.
+    """
+    reclaim_leases()
+    expires_at = timezone.now() + duration
+    mine = active_leases(user)
+    mine.update(expires_at=expires_at)
+
+    needed = size - mine.count()
+    if needed > 0:
+        queryset = Payslip.objects.all() if queryset is None else queryset
+        candidates = queryset.filter(approval_status='pending').exclude(
+            id__in=PayslipLease.objects.values('payslip_id')
+        ).order_by('id')
+        if connection.features.has_select_for_update_skip_locked:
+            _claim_skip_locked(candidates, user, needed, expires_at)
+        else:
+            _claim_with_lease_table(candidates, user, needed, expires_at)
+    return active_leases(user)
+
+
+def release_leases(user, payslip_ids=None):
+    """Give up the user's leases (all, or only on ``payslip_ids``)."""
+    leases = PayslipLease.objects.filter(holder=user)
+    if payslip_ids is not None:
+        leases = leases.filter(payslip_id__in=payslip_ids)
+    return leases.delete()[0]
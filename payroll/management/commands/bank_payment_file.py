@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.bank_files import BANK_FILE_FORMATS, bank_file_name, payslips_without_bank_details
+from payslip.date_utils import parse_month_year
+
+
+class Command(BaseCommand):
+    help = "Write the bank transfer file for a period's approved payslips, grouped per bank with control totals"
+
+    def add_arguments(self, parser):
+        parser.add_argument('month_year', help="Period to pay (e.g. Jan-2026)")
+        parser.add_argument('--format', choices=sorted(BANK_FILE_FORMATS), default='csv',
+                            help="csv, or txt for fixed-width records")
+        parser.add_argument('--output', help="File to write (defaults to bank_payments_<Mon_YYYY>.<format>)")
+
+    def handle(self, *args, **options):
+        month_year = options['month_year']
+        if parse_month_year(month_year) is None:
+            raise CommandError(f"Invalid period {month_year!r}; expected e.g. Jan-2026.")
+        fmt = options['format']
+        lines, _ = BANK_FILE_FORMATS[fmt]
+        output = options['output'] or bank_file_name(month_year, fmt)
+
+        with open(output, 'w', encoding='utf-8', newline='') as handle:
+            handle.writelines(lines(month_year))
+        self.stdout.write(self.style.SUCCESS(f"Wrote the {month_year} bank file to {output}."))
+
+        missing = payslips_without_bank_details(month_year).count()
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f"{missing} approved payslips were left out because the employee has no bank account number."
+            ))
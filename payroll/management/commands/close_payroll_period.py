@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.models import PayrollPeriod
+from payroll.periods import close_period, lock_period
+from payroll.render_queue import process_render_jobs
+
+
+class Command(BaseCommand):
+    help = "Close a pay period, freeze its rates and snapshots, and pre-render its payslip PDFs"
+
+    def add_arguments(self, parser):
+        parser.add_argument('month_year', help="Period to close (e.g. Jan-2026)")
+        parser.add_argument('--lock', action='store_true', help="Also lock the period permanently")
+        parser.add_argument('--skip-pdfs', action='store_true', help="Leave the queued PDFs to the process_pdf_jobs worker")
+
+    def handle(self, *args, **options):
+        month_year = options['month_year']
+        period = PayrollPeriod.objects.filter(month_year=month_year).first()
+        try:
+            if period is None or not period.is_final():
+                period = close_period(month_year, user=None)
+            if options['lock'] and period.status != 'locked':
+                period = lock_period(month_year, user=None)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"{month_year} is {period.get_status_display().lower()}."))
+
+        if not options['skip_pdfs']:
+            # Closing queued the period's PDFs; render them now through the same queue.
+            rendered, failed = process_render_jobs()
+            self.stdout.write(self.style.SUCCESS(f"Pre-rendered {rendered} payslip PDFs."))
+            if failed:
+                self.stdout.write(self.style.WARNING(f"{failed} renders failed and will be retried by process_pdf_jobs."))
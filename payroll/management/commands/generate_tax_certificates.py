@@ -0,0 +1,40 @@
+from django.core.management.base import BaseCommand
+
+from payroll.certificates import CERTIFICATE_TASK_SIZE, generate_certificates
+from payroll.ytd import rebuild_ytd
+
+
+class Command(BaseCommand):
+    help = (
+        "Write annual income and PAYE certificates for a tax year from the year-to-date ledger. "
+        "Certificates already written since the ledger last changed are skipped, so an interrupted run can be resumed."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('tax_year', type=int)
+        parser.add_argument('--workers', type=int, help="Render processes (defaults to the CPU count)")
+        parser.add_argument('--batch-size', type=int, default=CERTIFICATE_TASK_SIZE,
+                            help="Certificates per task handed to a worker")
+        parser.add_argument('--force', action='store_true', help="Rewrite certificates that are already current")
+        parser.add_argument('--rebuild-ytd', action='store_true',
+                            help="Recompute the year's ledger from approved payslips first")
+
+    def handle(self, *args, **options):
+        tax_year = options['tax_year']
+        if options['rebuild_ytd']:
+            rows = rebuild_ytd(tax_year)
+            self.stdout.write(f"Rebuilt {rows} year-to-date rows for {tax_year}.")
+
+        def progress(done, seen):
+            self.stdout.write(f"  {done} of {seen} certificates processed")
+
+        run = generate_certificates(
+            tax_year, workers=options['workers'], task_size=options['batch_size'],
+            force=options['force'], progress=progress,
+        )
+        self.stdout.write(self.style.SUCCESS(
+            f"{tax_year}: {run.written} certificates written, {run.skipped} already current, "
+            f"{len(run.errors)} failed (of {run.total})."
+        ))
+        for staff_id, error in sorted(run.errors.items()):
+            self.stdout.write(self.style.ERROR(f"  {staff_id}: {error}"))
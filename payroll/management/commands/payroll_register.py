@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.register import REGISTER_WRITERS, register_filename
+from payslip.date_utils import parse_month_year
+
+
+class Command(BaseCommand):
+    help = "Write the payroll register of a period, grouped by department and district, as XLSX or PDF"
+
+    def add_arguments(self, parser):
+        parser.add_argument('month_year', help="Period to report (e.g. Jan-2026)")
+        parser.add_argument('--format', choices=sorted(REGISTER_WRITERS), default='xlsx')
+        parser.add_argument('--output', help="File to write (defaults to payroll_register_<Mon_YYYY>.<format>)")
+
+    def handle(self, *args, **options):
+        month_year = options['month_year']
+        if parse_month_year(month_year) is None:
+            raise CommandError(f"Invalid period {month_year!r}; expected e.g. Jan-2026.")
+        fmt = options['format']
+        output = options['output'] or register_filename(month_year, fmt)
+        REGISTER_WRITERS[fmt](month_year, output)
+        self.stdout.write(self.style.SUCCESS(f"Wrote the {month_year} register to {output}."))
@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from payroll.render_queue import RENDER_BATCH_SIZE, process_render_jobs
+
+
+class Command(BaseCommand):
+    help = "Render queued payslip PDFs with a process pool (run continuously or with --once)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+        parser.add_argument('--sleep', type=float, default=5.0, help="Seconds to wait between polls")
+        parser.add_argument('--workers', type=int, default=None, help="Render processes (default: CPU count)")
+        parser.add_argument('--batch-size', type=int, default=RENDER_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        while True:
+            rendered, failed = process_render_jobs(workers=options['workers'], batch_size=options['batch_size'])
+            if rendered or failed:
+                self.stdout.write(self.style.SUCCESS(f"Rendered {rendered} payslip PDFs."))
+                if failed:
+                    self.stdout.write(self.style.WARNING(f"{failed} renders failed and will be retried."))
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
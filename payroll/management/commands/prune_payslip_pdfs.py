@@ -0,0 +1,37 @@
+import os
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from payroll.pdf_storage import PRUNE_BATCH_SIZE, legacy_pdfs, prune_pdfs
+
+
+class Command(BaseCommand):
+    help = "Delete cached payslip PDFs that are orphaned, superseded by edits, or past a retention age"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than', type=int, metavar='DAYS',
+                            help="Also prune PDFs rendered more than DAYS days ago")
+        parser.add_argument('--legacy', action='store_true',
+                            help="Also delete PDFs left in the old flat media/payslips/ directory")
+        parser.add_argument('--batch-size', type=int, default=PRUNE_BATCH_SIZE)
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be deleted")
+
+    def handle(self, *args, **options):
+        older_than = None
+        if options['older_than'] is not None:
+            older_than = timezone.now() - timedelta(days=options['older_than'])
+        dry_run = options['dry_run']
+
+        removed, freed = prune_pdfs(older_than, dry_run=dry_run, batch_size=options['batch_size'])
+        verb = "Would prune" if dry_run else "Pruned"
+        self.stdout.write(self.style.SUCCESS(f"{verb} {removed} PDFs ({freed / 1048576:.1f} MB)."))
+
+        if options['legacy']:
+            legacy = legacy_pdfs()
+            if not dry_run:
+                for path in legacy:
+                    os.unlink(path)
+            verb = "Would delete" if dry_run else "Deleted"
+            self.stdout.write(self.style.SUCCESS(f"{verb} {len(legacy)} legacy flat-layout PDFs."))
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from payroll.ytd import YTD_BATCH_SIZE, rebuild_ytd
+
+
+class Command(BaseCommand):
+    help = "Recompute the employee year-to-date ledger from approved payslips"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, help="Only rebuild this tax year")
+        parser.add_argument('--batch-size', type=int, default=YTD_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        written = rebuild_ytd(options['year'], batch_size=options['batch_size'])
+        scope = options['year'] or 'all tax years'
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {written} year-to-date rows for {scope}."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand
+
+from payroll.recompute import RECOMPUTABLE_STATUSES, recompute_payslips
+
+
+class Command(BaseCommand):
+    help = "Recompute SSNIT, Tier 2, PAYE and net on unapproved payslips using the current rates"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--month-year', help="Only recompute this period (e.g. Jan-2026)")
+        parser.add_argument(
+            '--status', action='append', choices=RECOMPUTABLE_STATUSES,
+            help="Status to include (repeatable, default: pending)"
+        )
+        parser.add_argument('--dry-run', action='store_true', help="Report changes without saving")
+
+    def handle(self, *args, **options):
+        summary = recompute_payslips(
+            month_year=options['month_year'],
+            statuses=options['status'],
+            dry_run=options['dry_run'],
+        )
+        verb = "would change" if options['dry_run'] else "changed"
+        self.stdout.write(self.style.SUCCESS(
+            f"Examined {summary.examined} payslips, {verb} {summary.changed}; "
+            f"net pay change GHS {summary.net_change:,.2f}."
+        ))
+        if summary.skipped:
+            self.stdout.write(self.style.WARNING(
+                f"Skipped {summary.skipped} payslips changed by someone else during the run."
+            ))
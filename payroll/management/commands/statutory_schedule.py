@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from payroll.models import PayrollPeriod
+from payroll.statutory import SCHEDULE_WRITERS, SCHEDULES, schedule_filename
+from payslip.date_utils import parse_month_year
+
+
+class Command(BaseCommand):
+    help = "Write the SSNIT, Tier 2 or PAYE remittance schedule of a period as CSV or XLSX"
+
+    def add_arguments(self, parser):
+        parser.add_argument('month_year', help="Period to report (e.g. Jan-2026)")
+        parser.add_argument('schedule', choices=sorted(SCHEDULES))
+        parser.add_argument('--format', choices=sorted(SCHEDULE_WRITERS), default='xlsx')
+        parser.add_argument('--output', help="File to write (defaults to <schedule>_schedule_<Mon_YYYY>.<format>)")
+
+    def handle(self, *args, **options):
+        month_year = options['month_year']
+        if parse_month_year(month_year) is None:
+            raise CommandError(f"Invalid period {month_year!r}; expected e.g. Jan-2026.")
+        kind, fmt = options['schedule'], options['format']
+        output = options['output'] or schedule_filename(month_year, kind, fmt)
+        period = PayrollPeriod.objects.filter(month_year=month_year).first()
+        SCHEDULE_WRITERS[fmt](month_year, kind, output, period)
+        self.stdout.write(self.style.SUCCESS(f"Wrote the {month_year} {kind.upper()} schedule to {output}."))
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0006_alter_payslipaudit_id'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payslipaudit',
+            name='action',
+            field=models.CharField(choices=[('edit', 'Edit'), ('revert', 'Revert'), ('adjust', 'Bulk Adjustment')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0007_payslipaudit_adjust_action'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payslipaudit',
+            name='action',
+            field=models.CharField(choices=[('edit', 'Edit'), ('revert', 'Revert'), ('adjust', 'Bulk Adjustment'), ('recompute', 'Recompute')], max_length=20),
+        ),
+    ]
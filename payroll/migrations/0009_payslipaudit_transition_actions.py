@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0008_payslipaudit_recompute_action'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='payslipaudit',
+            name='action',
+            field=models.CharField(choices=[('edit', 'Edit'), ('approve', 'Approve'), ('reject', 'Reject'), ('revert', 'Revert'), ('adjust', 'Bulk Adjustment'), ('recompute', 'Recompute')], max_length=20),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:17
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0009_payslipaudit_transition_actions'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayslipLease',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('leased_at', models.DateTimeField(auto_now_add=True)),
+                ('expires_at', models.DateTimeField(db_index=True)),
+                ('holder', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payslip_leases', to=settings.AUTH_USER_MODEL)),
+                ('payslip', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='lease', to='payroll.payslip')),
+            ],
+            options={
+                'verbose_name': 'Payslip Lease',
+                'verbose_name_plural': 'Payslip Leases',
+                'ordering': ['payslip_id'],
+            },
+        ),
+    ]
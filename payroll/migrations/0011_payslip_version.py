@@ -0,0 +1,18 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0010_paysliplease'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payslip',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Incremented on every change; used to detect concurrent edits'),
+        ),
+    ]
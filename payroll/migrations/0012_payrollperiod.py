@@ -0,0 +1,43 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0011_payslip_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='systemconfiguration',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.CreateModel(
+            name='PayrollPeriod',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month_year', models.CharField(max_length=20, unique=True, verbose_name='Month/Year')),
+                ('status', models.CharField(choices=[('open', 'Open'), ('closed', 'Closed'), ('locked', 'Locked')], default='open', max_length=10)),
+                ('ssnit_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('tier2_rate', models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True)),
+                ('tax_table', models.JSONField(blank=True, default=list, help_text='PAYE bands as [band width, rate %] pairs')),
+                ('closed_at', models.DateTimeField(blank=True, null=True)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('closed_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='closed_payroll_periods', to=settings.AUTH_USER_MODEL)),
+                ('locked_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='locked_payroll_periods', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Payroll Period',
+                'verbose_name_plural': 'Payroll Periods',
+                'ordering': ['-created_at'],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:25
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0012_payrollperiod'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PayslipPdf',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='Relative to MEDIA_ROOT', max_length=255, unique=True)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('payslip_version', models.PositiveIntegerField(default=0)),
+                ('rendered_at', models.DateTimeField(db_index=True)),
+                ('payslip', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='pdf_files', to='payroll.payslip')),
+            ],
+            options={
+                'verbose_name': 'Payslip PDF',
+                'verbose_name_plural': 'Payslip PDFs',
+                'ordering': ['id'],
+            },
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0013_payslippdf'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='PdfRenderJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('failed', 'Failed')], db_index=True, default='queued', max_length=10)),
+                ('claim_token', models.CharField(blank=True, db_index=True, max_length=32)),
+                ('claimed_at', models.DateTimeField(blank=True, null=True)),
+                ('attempts', models.PositiveIntegerField(default=0)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('payslip', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='render_job', to='payroll.payslip')),
+            ],
+            options={
+                'verbose_name': 'PDF Render Job',
+                'verbose_name_plural': 'PDF Render Jobs',
+                'ordering': ['id'],
+            },
+        ),
+    ]
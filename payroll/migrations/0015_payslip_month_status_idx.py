@@ -0,0 +1,21 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core_config', '0002_delete_bmc'),
+        ('payroll', '0014_pdfrenderjob'),
+        ('staff', '0009_seed_salary_history'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='payslip',
+            index=models.Index(fields=['month_year', 'approval_status'], name='payslip_month_status_idx'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:42
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0015_payslip_month_status_idx'),
+        ('staff', '0009_seed_salary_history'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeYTD',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tax_year', models.PositiveSmallIntegerField()),
+                ('payslip_count', models.PositiveIntegerField(default=0)),
+                ('basic_salary', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('gross_salary', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('ssnit_deduction', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('tier2_deduction', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('income_tax', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('net_salary', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ytd_totals', to='staff.employee')),
+            ],
+            options={
+                'verbose_name': 'Employee Year-to-Date',
+                'verbose_name_plural': 'Employee Year-to-Date Totals',
+                'ordering': ['-tax_year', 'employee_id'],
+                'unique_together': {('employee', 'tax_year')},
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:45
+
+from datetime import datetime
+from decimal import Decimal
+
+from django.db import migrations
+from django.db.models import Count, Sum
+
+YTD_FIELDS = ['basic_salary', 'gross_salary', 'ssnit_deduction', 'tier2_deduction', 'income_tax', 'net_salary']
+
+
+def seed_employee_ytd(apps, schema_editor):
+    """Sum existing approved payslips into the year-to-date ledger."""
+    Payslip = apps.get_model('payroll', 'Payslip')
+    EmployeeYTD = apps.get_model('payroll', 'EmployeeYTD')
+
+    totals = {}
+    rows = (
+        Payslip.objects.filter(approval_status='approved')
+        .values('employee_id', 'month_year')
+        .annotate(payslip_count=Count('id'), **{field: Sum(field) for field in YTD_FIELDS})
+        .order_by()
+    )
+    for row in rows.iterator():
+        try:
+            tax_year = datetime.strptime(row['month_year'], '%b-%Y').year
+        except (TypeError, ValueError):
+            continue
+        entry = totals.setdefault(
+            (row['employee_id'], tax_year), dict({field: Decimal(0) for field in YTD_FIELDS}, payslip_count=0)
+        )
+        for field in ['payslip_count', *YTD_FIELDS]:
+            entry[field] += row[field] or 0
+
+    batch = [
+        EmployeeYTD(employee_id=employee_id, tax_year=tax_year, **entry)
+        for (employee_id, tax_year), entry in totals.items()
+    ]
+    EmployeeYTD.objects.bulk_create(batch, batch_size=1000, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0016_employeeytd'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_employee_ytd, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.14 on 2026-10-19 11:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('payroll', '0017_seed_employee_ytd'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payslip',
+            name='ssnit_rate',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='SSNIT Rate (%)'),
+        ),
+        migrations.AddField(
+            model_name='payslip',
+            name='tier2_rate',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=5, null=True, verbose_name='Tier 2 Rate (%)'),
+        ),
+    ]
@@ -1,3 +1,5 @@
+from decimal import Decimal
+
 from django.db import models
 from django.conf import settings
 from staff.models import Employee
@@ -43,6 +45,10 @@ class Payslip(models.Model):
     tier2_deduction = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Tier 2 (3.5%)")
     income_tax = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Income Tax")
     other_deductions = models.DecimalField(max_digits=10, decimal_places=2, default=0, verbose_name="Other Deductions")
+
+    # Rates the statutory deductions were worked out with (empty on payslips generated before they were kept)
+    ssnit_rate = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, verbose_name="SSNIT Rate (%)")
+    tier2_rate = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True, verbose_name="Tier 2 Rate (%)")
     
     # Net salary
     net_salary = models.DecimalField(max_digits=10, decimal_places=2, verbose_name="Net Salary")
@@ -74,6 +80,11 @@ class Payslip(models.Model):
     approved_at = models.DateTimeField(null=True, blank=True, verbose_name="Approved At")
     
     # Metadata
+    version = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        help_text="Incremented on every change; used to detect concurrent edits"
+    )
     generated_at = models.DateTimeField(auto_now_add=True, verbose_name="Generated At")
     last_modified_at = models.DateTimeField(auto_now=True, verbose_name="Last Modified At")
     last_modified_by = models.ForeignKey(
@@ -90,6 +101,10 @@ class Payslip(models.Model):
         verbose_name = "Payslip"
         verbose_name_plural = "Payslips"
         unique_together = ['employee', 'month_year']
+        indexes = [
+            # Period reports and schedules filter on month and status
+            models.Index(fields=['month_year', 'approval_status'], name='payslip_month_status_idx'),
+        ]
     
     def __str__(self):
         if self.status_config:
@@ -192,11 +207,118 @@ class PayslipLineItem(models.Model):
             return f"{self.get_item_type_display()}: {self.nature} - GHS {self.balance}"
 
 
+class PayslipLease(models.Model):
+    """Claim on a pending payslip by one approver until the lease expires"""
+    payslip = models.OneToOneField(Payslip, on_delete=models.CASCADE, related_name='lease')
+    holder = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='payslip_leases'
+    )
+    leased_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['payslip_id']
+        verbose_name = "Payslip Lease"
+        verbose_name_plural = "Payslip Leases"
+
+    def __str__(self):
+        return f"Payslip {self.payslip_id} leased to {self.holder_id} until {self.expires_at}"
+
+
+class PayslipPdf(models.Model):
+    """Manifest entry for a rendered payslip PDF on disk, used for retention"""
+    payslip = models.ForeignKey(
+        Payslip,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='pdf_files'
+    )
+    path = models.CharField(max_length=255, unique=True, help_text="Relative to MEDIA_ROOT")
+    size = models.PositiveIntegerField(default=0)
+    payslip_version = models.PositiveIntegerField(default=0)
+    rendered_at = models.DateTimeField(db_index=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "Payslip PDF"
+        verbose_name_plural = "Payslip PDFs"
+
+    def __str__(self):
+        return self.path
+
+
+class PdfRenderJob(models.Model):
+    """
+    Payslip whose PDF should be rendered ahead of the first request.
+
+    Approval and period close enqueue jobs; the ``process_pdf_jobs``
+    management command drains them with a process pool. A payslip has at
+    most one job, and finished jobs are deleted.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+
+    payslip = models.OneToOneField(Payslip, on_delete=models.CASCADE, related_name='render_job')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued', db_index=True)
+    claim_token = models.CharField(max_length=32, blank=True, db_index=True)
+    claimed_at = models.DateTimeField(null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['id']
+        verbose_name = "PDF Render Job"
+        verbose_name_plural = "PDF Render Jobs"
+
+    def __str__(self):
+        return f"Render payslip {self.payslip_id} ({self.status})"
+
+
+class EmployeeYTD(models.Model):
+    """
+    Running totals of an employee's approved payslips for one tax year.
+
+    Kept up to date incrementally by approval transitions, edits and
+    deletes (see ``payroll.ytd``); ``rebuild_ytd`` recomputes it from the
+    payslips.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='ytd_totals')
+    tax_year = models.PositiveSmallIntegerField()
+    payslip_count = models.PositiveIntegerField(default=0)
+    basic_salary = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    gross_salary = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    ssnit_deduction = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    tier2_deduction = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    income_tax = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    net_salary = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-tax_year', 'employee_id']
+        unique_together = ['employee', 'tax_year']
+        verbose_name = "Employee Year-to-Date"
+        verbose_name_plural = "Employee Year-to-Date Totals"
+
+    def __str__(self):
+        return f"{self.employee_id} {self.tax_year}"
+
+
 class PayslipAudit(models.Model):
     """Audit trail for payslip edits and reverts"""
     ACTION_CHOICES = [
         ('edit', 'Edit'),
+        ('approve', 'Approve'),
+        ('reject', 'Reject'),
         ('revert', 'Revert'),
+        ('adjust', 'Bulk Adjustment'),
+        ('recompute', 'Recompute'),
     ]
 
     payslip = models.ForeignKey(Payslip, on_delete=models.CASCADE, related_name='audit_entries')
@@ -223,6 +345,69 @@ class PayslipAudit(models.Model):
 
 
 
+class PayrollPeriod(models.Model):
+    """
+    Lifecycle of a pay month. Closed and locked periods are final: their
+    payslips no longer change, so their PDFs and reports can be cached.
+    """
+    STATUS_CHOICES = [
+        ('open', 'Open'),
+        ('closed', 'Closed'),
+        ('locked', 'Locked'),
+    ]
+    FINAL_STATUSES = ['closed', 'locked']
+
+    month_year = models.CharField(max_length=20, unique=True, verbose_name="Month/Year")
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='open')
+
+    # Frozen at close
+    ssnit_rate = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    tier2_rate = models.DecimalField(max_digits=5, decimal_places=2, null=True, blank=True)
+    tax_table = models.JSONField(default=list, blank=True, help_text="PAYE bands as [band width, rate %] pairs")
+
+    closed_at = models.DateTimeField(null=True, blank=True)
+    closed_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='closed_payroll_periods'
+    )
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='locked_payroll_periods'
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Payroll Period"
+        verbose_name_plural = "Payroll Periods"
+
+    def __str__(self):
+        return f"{self.month_year} ({self.get_status_display()})"
+
+    def is_final(self):
+        return self.status in self.FINAL_STATUSES
+
+    def tax_brackets(self):
+        return [(Decimal(band), Decimal(rate)) for band, rate in self.tax_table]
+
+    @classmethod
+    def final_month_years(cls):
+        """Queryset of month_year values whose payslips must not change."""
+        return cls.objects.filter(status__in=cls.FINAL_STATUSES).values('month_year')
+
+    @classmethod
+    def is_month_final(cls, month_year):
+        return cls.objects.filter(month_year=month_year, status__in=cls.FINAL_STATUSES).exists()
+
+
 class SystemConfiguration(models.Model):
     """Global system settings stored in the database"""
     agency_name = models.CharField(max_length=200, default="National Ambulance Service")
@@ -240,6 +425,9 @@ class SystemConfiguration(models.Model):
     phone = models.CharField(max_length=50, blank=True)
     email = models.EmailField(blank=True)
 
+    # Cached payslip PDFs rendered before this are stale
+    updated_at = models.DateTimeField(auto_now=True)
+
     class Meta:
         verbose_name = SYSTEM_CONFIGURATION_LABEL
         verbose_name_plural = SYSTEM_CONFIGURATION_LABEL
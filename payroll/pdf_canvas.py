@@ -0,0 +1,376 @@
+"""
+Canvas renderer for the standard payslip layout
+
+Draws the same page as the platypus renderer in ``utils`` straight onto a
+``reportlab.pdfgen.canvas``. The form is fixed, so the positions platypus
+would compute (frame origin, padding, row heights, centring offsets) are
+reproduced with plain arithmetic instead of flowable wrap/split passes.
+Keep the two in step when the layout changes; the parity test in
+``payroll/tests.py`` compares their text.
+
+The annual tax certificate reuses the same page, tables and styles.
+"""
+from contextlib import contextmanager
+
+from reportlab import rl_config
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import inch
+from reportlab.lib.utils import ImageReader
+from reportlab.pdfbase.pdfmetrics import stringWidth
+from reportlab.pdfgen import canvas
+
+PAGE_WIDTH, PAGE_HEIGHT = landscape(A4)
+# SimpleDocTemplate margins plus the frame's own 6pt padding
+FRAME_X = 0.5 * inch + 6
+FRAME_TOP = PAGE_HEIGHT - 0.25 * inch - 6
+FRAME_WIDTH = PAGE_WIDTH - 2 * FRAME_X
+
+LEADING = 12
+PADDING = 3
+CELL_INDENT = 6
+BOX_WIDTH = 2
+GRID_WIDTH = 1
+LOGO_WIDTH, LOGO_HEIGHT = 1.2 * inch, 0.6 * inch
+
+LABEL_FILL = colors.HexColor('#f5f5f5')
+SECTION_FILL = colors.HexColor('#e0e0e0')
+TOTAL_FILL = colors.HexColor('#f0f0f0')
+NET_FILL = colors.HexColor('#e8e8e8')
+
+INFO_COLUMNS = [1.1 * inch, 2.5 * inch, 1.3 * inch, 2.6 * inch]
+FINANCIAL_COLUMNS = [5.5 * inch, 2 * inch]
+PAYMENT_COLUMNS = [1.3 * inch, 6.2 * inch]
+
+_logo_sizes = {}
+
+
+def _wrap(text, font, size, width):
+    """Greedy word wrap, as platypus Paragraph does for plain words."""
+    space = stringWidth(' ', font, size)
+    lines, current, current_width = [], [], 0
+    for word in text.split():
+        word_width = stringWidth(word, font, size)
+        if current and current_width + space + word_width > width + 1e-6:
+            lines.append(' '.join(current))
+            current, current_width = [word], word_width
+        else:
+            current_width += (space if current else 0) + word_width
+            current.append(word)
+    if current:
+        lines.append(' '.join(current))
+    return lines or ['']
+
+
+class Cell:
+    """One table cell: a paragraph (wraps, bold) or a plain string (one line)."""
+
+    def __init__(self, text, paragraph=False, size=None, font='Helvetica', align='LEFT', span=1):
+        self.text = text
+        self.paragraph = paragraph
+        self.size = size
+        self.font = font
+        self.align = align
+        self.span = span
+        self.lines = None
+
+    def content_height(self, width, default_size):
+        if self.paragraph:
+            self.lines = _wrap(self.text, 'Helvetica-Bold', self.size, width - 2 * CELL_INDENT)
+            return len(self.lines) * LEADING
+        return LEADING
+
+    def draw(self, c, x, y, width, height, default_size):
+        if self.paragraph:
+            para_height = len(self.lines) * LEADING
+            top = y + (height + para_height) / 2.0
+            inner = width - 2 * CELL_INDENT
+            c.setFont('Helvetica-Bold', self.size)
+            for index, line in enumerate(self.lines):
+                baseline = top - self.size - index * LEADING
+                offset = 0
+                if self.align == 'CENTER':
+                    offset = (inner - stringWidth(line, 'Helvetica-Bold', self.size)) / 2.0
+                c.drawString(x + CELL_INDENT + offset, baseline, line)
+        elif self.text != '':
+            size = self.size or default_size
+            c.setFont(self.font, size)
+            baseline = y + (height + LEADING) / 2.0 - size
+            if self.align == 'RIGHT':
+                c.drawRightString(x + width - CELL_INDENT, baseline, self.text)
+            else:
+                c.drawString(x + CELL_INDENT, baseline, self.text)
+
+
+def _draw_table(c, top, columns, rows, fills, default_size=9):
+    """
+    Draw a bordered table whose top edge is at ``top``, centred in the frame.
+
+    ``rows`` are lists of Cell (a spanning cell is followed by None
+    placeholders); ``fills`` are (first_row, last_row, first_col, last_col,
+    colour) rectangles. Returns the table height.
+    """
+    table_width = sum(columns)
+    left = FRAME_X + (FRAME_WIDTH - table_width) / 2.0
+    offsets = [left]
+    for width in columns:
+        offsets.append(offsets[-1] + width)
+
+    heights = []
+    for row in rows:
+        tallest = 0
+        for col, cell in enumerate(row):
+            if cell is not None:
+                width = offsets[col + cell.span] - offsets[col]
+                tallest = max(tallest, cell.content_height(width, default_size))
+        heights.append(tallest + 2 * PADDING)
+    tops = [top]
+    for height in heights:
+        tops.append(tops[-1] - height)
+    bottom = tops[-1]
+
+    for first_row, last_row, first_col, last_col, colour in fills:
+        c.setFillColor(colour)
+        last_row = last_row % len(rows)
+        c.rect(offsets[first_col], tops[last_row + 1], offsets[last_col + 1] - offsets[first_col],
+               tops[first_row] - tops[last_row + 1], stroke=0, fill=1)
+    c.setFillColor(colors.black)
+
+    for index, row in enumerate(rows):
+        for col, cell in enumerate(row):
+            if cell is not None:
+                width = offsets[col + cell.span] - offsets[col]
+                cell.draw(c, offsets[col], tops[index + 1], width, heights[index], default_size)
+
+    c.setLineCap(1)
+    c.setLineJoin(1)
+    c.setLineWidth(BOX_WIDTH)
+    c.line(left, top, offsets[-1], top)
+    c.line(left, bottom, offsets[-1], bottom)
+    c.line(left, bottom, left, top)
+    c.line(offsets[-1], bottom, offsets[-1], top)
+    c.setLineWidth(GRID_WIDTH)
+    for y in tops[1:-1]:
+        c.line(left, y, offsets[-1], y)
+    for col in range(1, len(columns)):
+        # Vertical rules stop at cells spanning across this column.
+        segment_top = None
+        for index, row in enumerate(rows):
+            spanned = any(
+                cell is not None and start < col < start + cell.span
+                for start, cell in enumerate(row)
+            )
+            if not spanned and segment_top is None:
+                segment_top = tops[index]
+            elif spanned and segment_top is not None:
+                c.line(offsets[col], tops[index], offsets[col], segment_top)
+                segment_top = None
+        if segment_top is not None:
+            c.line(offsets[col], bottom, offsets[col], segment_top)
+    return top - bottom
+
+
+@contextmanager
+def _binary_streams():
+    """
+    Write streams as plain Flate data instead of ASCII85 text. Without
+    reportlab's optional C accelerator, ASCII85-encoding the logo on every
+    payslip costs more than drawing the rest of the page.
+    """
+    previous = rl_config.useA85
+    rl_config.useA85 = 0
+    try:
+        yield
+    finally:
+        rl_config.useA85 = previous
+
+
+def _logo(path):
+    """Logo reader and drawn size, scaled proportionally into 1.2in x 0.6in."""
+    if path not in _logo_sizes:
+        reader = ImageReader(path)
+        image_width, image_height = reader.getSize()
+        scale = min(LOGO_WIDTH / image_width, LOGO_HEIGHT / image_height)
+        _logo_sizes[path] = (reader, image_width * scale, image_height * scale)
+    return _logo_sizes[path]
+
+
+def _draw_header(c, logo_path, subtitle=None):
+    """Logo, agency title and an optional subtitle; returns the y below them."""
+    y = FRAME_TOP
+    if logo_path:
+        try:
+            reader, width, height = _logo(logo_path)
+        except (OSError, ValueError, TypeError):
+            reader = None  # If logo fails to load, continue without it
+        if reader is not None:
+            c.drawImage(reader, FRAME_X + (FRAME_WIDTH - width) / 2.0, y - height, width, height, mask='auto')
+            y -= height + 0.03 * inch
+
+    lines = [("NATIONAL AMBULANCE SERVICE", 14)]
+    if subtitle:
+        lines.append((subtitle, 11))
+    for text, size in lines:
+        c.setFont('Helvetica-Bold', size)
+        c.drawString(FRAME_X + (FRAME_WIDTH - stringWidth(text, 'Helvetica-Bold', size)) / 2.0, y - size, text)
+        y -= LEADING + 2 + 0.04 * inch
+    return y
+
+
+def draw_payslip(payslip, filepath, fields):
+    """Write the payslip PDF to ``filepath`` with fixed canvas coordinates."""
+    with _binary_streams():
+        _draw_payslip(payslip, filepath, fields)
+
+
+def _draw_payslip(payslip, filepath, fields):
+    c = canvas.Canvas(filepath, pagesize=(PAGE_WIDTH, PAGE_HEIGHT))
+    y = _draw_header(c, fields['logo_path'])
+
+    def label(text):
+        return Cell(text, paragraph=True, size=10)
+
+    info_rows = [
+        [Cell("EMPLOYEE INFORMATION", paragraph=True, size=9, align='CENTER', span=2), None,
+         Cell("ORGANIZATION INFORMATION", paragraph=True, size=9, align='CENTER', span=2), None],
+        [label("Name:"), Cell(payslip.employee.name or ''), label("Agency:"), Cell(fields['agency'])],
+        [label("Staff ID:"), Cell(payslip.employee.staff_id or ''), label("District:"), Cell(fields['district'])],
+        [label("SSNIT/Ghana Card #:"), Cell(fields['staff_identifier']),
+         label("Department:"), Cell(fields['department'])],
+        [label("Unit:"), Cell(fields['unit']), label("Grade:"), Cell(fields['grade'])],
+        [label("Level:"), Cell(fields['level']), Cell(''), Cell('')],
+        [label("Period:"), Cell(fields['period_display']), Cell(''), Cell('')],
+    ]
+    y -= _draw_table(c, y, INFO_COLUMNS, info_rows, [
+        (1, -1, 0, 0, LABEL_FILL),
+        (1, -1, 2, 2, LABEL_FILL),
+    ])
+    y -= 0.04 * inch
+
+    def section(text):
+        return [Cell(text, paragraph=True, size=9, align='CENTER', span=2), None]
+
+    def amount(text, size=None):
+        return Cell(text, font='Courier', size=size, align='RIGHT')
+
+    financial_rows = [
+        [Cell("DESCRIPTION", paragraph=True, size=9, align='CENTER'),
+         Cell("AMOUNT (GHS)", paragraph=True, size=9, align='CENTER')],
+        section("EARNINGS"),
+        [Cell('    Basic Salary'), amount(f'{payslip.basic_salary:.2f}')],
+    ]
+    if payslip.allowances > 0:
+        financial_rows.append([Cell('    Allowances'), amount(f'{payslip.allowances:.2f} ')])
+    gross_row = len(financial_rows)
+    financial_rows.extend([
+        [label("GROSS SALARY"), label(f"{payslip.gross_salary:.2f}")],
+        section("DEDUCTIONS"),
+        [Cell('    SSNIT Contribution (5.5%)'), amount(f'({payslip.ssnit_deduction:.2f})')],
+        [Cell('    Tier 2 Pension Contribution'), amount(f'({payslip.tier2_deduction:.2f})')],
+        [Cell('    Income Tax (PAYE)'), amount(f'({payslip.income_tax:.2f})')],
+    ])
+    if payslip.other_deductions > 0:
+        financial_rows.append([Cell('    Other Deductions'), amount(f'({payslip.other_deductions:.2f})')])
+    financial_rows.append([label("TOTAL DEDUCTIONS"), label(f"({fields['total_deductions']:.2f})")])
+    financial_rows.append([label("NET SALARY PAYABLE"), label(f"{payslip.net_salary:.2f}")])
+    y -= _draw_table(c, y, FINANCIAL_COLUMNS, financial_rows, [
+        (1, 1, 0, 1, SECTION_FILL),
+        (gross_row, gross_row, 0, 1, TOTAL_FILL),
+        (-2, -2, 0, 1, TOTAL_FILL),
+        (-1, -1, 0, 1, NET_FILL),
+        (gross_row + 1, gross_row + 1, 0, 1, SECTION_FILL),
+    ])
+    y -= 0.04 * inch
+
+    payment_rows = [[label("Payment Mode:"), Cell(fields['payment_mode'])]]
+    y -= _draw_table(c, y, PAYMENT_COLUMNS, payment_rows, [(0, 0, 0, 0, LABEL_FILL)])
+    y -= 0.05 * inch
+
+    footer = [('Helvetica-Bold', "This is a computer-generated payslip"), ('Helvetica', fields['generated_line'])]
+    baseline = y - 7
+    for font, text in footer:
+        for line in _wrap(text, font, 7, FRAME_WIDTH):
+            c.setFont(font, 7)
+            c.drawString(FRAME_X + (FRAME_WIDTH - stringWidth(line, font, 7)) / 2.0, baseline, line)
+            baseline -= LEADING
+
+    c.showPage()
+    c.save()
+
+
+def draw_tax_certificate(filepath, fields):
+    """Write an annual income and PAYE certificate in the payslip layout."""
+    with _binary_streams():
+        _draw_tax_certificate(filepath, fields)
+
+
+def _draw_tax_certificate(filepath, fields):
+    c = canvas.Canvas(filepath, pagesize=(PAGE_WIDTH, PAGE_HEIGHT))
+    y = _draw_header(c, fields['logo_path'], f"ANNUAL INCOME AND PAYE CERTIFICATE - {fields['tax_year']}")
+
+    def label(text):
+        return Cell(text, paragraph=True, size=10)
+
+    def amount(value):
+        return Cell(f'{value:.2f}', font='Courier', align='RIGHT')
+
+    def deduction(value):
+        return Cell(f'({value:.2f})', font='Courier', align='RIGHT')
+
+    info_rows = [
+        [Cell("EMPLOYEE INFORMATION", paragraph=True, size=9, align='CENTER', span=2), None,
+         Cell("ORGANIZATION INFORMATION", paragraph=True, size=9, align='CENTER', span=2), None],
+        [label("Name:"), Cell(fields['name']), label("Agency:"), Cell(fields['agency'])],
+        [label("Staff ID:"), Cell(fields['staff_id']), label("Department:"), Cell(fields['department'])],
+        [label("SSNIT/Ghana Card #:"), Cell(fields['staff_identifier']),
+         label("Months Paid:"), Cell(str(fields['payslip_count']))],
+        [label("Period:"), Cell(fields['period_display']), Cell(''), Cell('')],
+    ]
+    y -= _draw_table(c, y, INFO_COLUMNS, info_rows, [
+        (1, -1, 0, 0, LABEL_FILL),
+        (1, -1, 2, 2, LABEL_FILL),
+    ])
+    y -= 0.04 * inch
+
+    def section(text):
+        return [Cell(text, paragraph=True, size=9, align='CENTER', span=2), None]
+
+    rows = [
+        [Cell("DESCRIPTION", paragraph=True, size=9, align='CENTER'),
+         Cell("AMOUNT (GHS)", paragraph=True, size=9, align='CENTER')],
+        section("INCOME"),
+        [Cell('    Basic Salary'), amount(fields['basic_salary'])],
+    ]
+    if fields['allowances'] > 0:
+        rows.append([Cell('    Allowances'), amount(fields['allowances'])])
+    gross_row = len(rows)
+    rows.extend([
+        [label("GROSS INCOME"), label(f"{fields['gross_salary']:.2f}")],
+        section("DEDUCTIONS"),
+        [Cell('    SSNIT Contribution'), deduction(fields['ssnit_deduction'])],
+        [Cell('    Tier 2 Pension Contribution'), deduction(fields['tier2_deduction'])],
+        [Cell('    Income Tax (PAYE) Withheld'), deduction(fields['income_tax'])],
+    ])
+    if fields['other_deductions'] > 0:
+        rows.append([Cell('    Other Deductions'), deduction(fields['other_deductions'])])
+    rows.append([label("TOTAL DEDUCTIONS"), label(f"({fields['total_deductions']:.2f})")])
+    rows.append([label("NET PAY"), label(f"{fields['net_salary']:.2f}")])
+    y -= _draw_table(c, y, FINANCIAL_COLUMNS, rows, [
+        (1, 1, 0, 1, SECTION_FILL),
+        (gross_row, gross_row, 0, 1, TOTAL_FILL),
+        (-2, -2, 0, 1, TOTAL_FILL),
+        (-1, -1, 0, 1, NET_FILL),
+        (gross_row + 1, gross_row + 1, 0, 1, SECTION_FILL),
+    ])
+    y -= 0.05 * inch
+
+    footer = [('Helvetica-Bold', "This is a computer-generated certificate"), ('Helvetica', fields['issued_line'])]
+    baseline = y - 7
+    for font, text in footer:
+        for line in _wrap(text, font, 7, FRAME_WIDTH):
+            c.setFont(font, 7)
+            c.drawString(FRAME_X + (FRAME_WIDTH - stringWidth(line, font, 7)) / 2.0, baseline, line)
+            baseline -= LEADING
+
+    c.showPage()
+    c.save()
@@ -0,0 +1,141 @@
+"""
+On-disk layout, atomic writes and retention for rendered payslip PDFs
+
+Files live under MEDIA_ROOT/payslips/<YYYY-MM>/<staff ID prefix>/ so no
+directory grows past a few hundred entries, and every render is recorded
+in the PayslipPdf manifest so pruning never has to walk the tree. Annual
+tax certificates use the same sharding under certificates/<YYYY>/.
+"""
+import os
+import tempfile
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.utils import timezone
+
+from payslip.date_utils import parse_month_year
+from .models import PayslipPdf
+
+PDF_ROOT = 'payslips'
+CERTIFICATE_ROOT = 'certificates'
+STAFF_SHARD_LENGTH = 5
+PRUNE_BATCH_SIZE = 500
+
+
+def _staff_shard(staff_id):
+    return (staff_id[:STAFF_SHARD_LENGTH] or '_').upper()
+
+
+def pdf_relative_path(staff_id, month_year, prefix='payslip'):
+    """Sharded path, relative to MEDIA_ROOT, of a PDF for one employee and period."""
+    period = parse_month_year(month_year)
+    period_dir = period.strftime('%Y-%m') if period else 'undated'
+    filename = f"{prefix}_{staff_id}_{month_year.replace('-', '_')}.pdf"
+    return f"{PDF_ROOT}/{period_dir}/{_staff_shard(staff_id)}/{filename}", filename
+
+
+def certificate_relative_path(staff_id, tax_year):
+    """Sharded path, relative to MEDIA_ROOT, of an employee's annual tax certificate."""
+    filename = f"tax_certificate_{staff_id}_{tax_year}.pdf"
+    return f"{CERTIFICATE_ROOT}/{tax_year}/{_staff_shard(staff_id)}/{filename}", filename
+
+
+def absolute_path(relative):
+    return os.path.join(settings.MEDIA_ROOT, *relative.split('/'))
+
+
+def relative_path(filepath):
+    return os.path.relpath(filepath, settings.MEDIA_ROOT).replace(os.sep, '/')
+
+
+@contextmanager
+def atomic_write(filepath):
+    """
+    Yield a temporary path next to ``filepath``; on success it is renamed
+    over ``filepath`` so readers never see a half-written PDF.
+    """
+    directory = os.path.dirname(filepath)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.part')
+    os.close(fd)
+    try:
+        yield tmp_path
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+def manifest_entry(payslip, filepath):
+    """Unsaved manifest row describing a PDF just written for ``payslip``."""
+    return PayslipPdf(
+        payslip_id=payslip.id,
+        path=relative_path(filepath),
+        size=os.path.getsize(filepath),
+        payslip_version=payslip.version,
+        rendered_at=timezone.now(),
+    )
+
+
+def record_pdfs(entries):
+    """Insert manifest rows, refreshing any existing row for the same path."""
+    # MySQL upserts on any unique key and rejects an explicit conflict target.
+    unique_fields = ['path'] if connection.features.supports_update_conflicts_with_target else None
+    PayslipPdf.objects.bulk_create(
+        entries,
+        update_conflicts=True,
+        unique_fields=unique_fields,
+        update_fields=['payslip', 'size', 'payslip_version', 'rendered_at'],
+    )
+
+
+def record_pdf(payslip, filepath):
+    """Add or refresh the manifest entry for a PDF just written for ``payslip``."""
+    record_pdfs([manifest_entry(payslip, filepath)])
+
+
+def prunable_pdfs(older_than=None):
+    """
+    Manifest entries whose file can go: the payslip was deleted (orphaned),
+    edited since the render (superseded), or, with ``older_than``, the file
+    was rendered before that time. Anything pruned is re-rendered on demand.
+    """
+    condition = Q(payslip__isnull=True) | Q(payslip__version__gt=F('payslip_version'))
+    if older_than is not None:
+        condition |= Q(rendered_at__lt=older_than)
+    return PayslipPdf.objects.filter(condition)
+
+
+def prune_pdfs(older_than=None, dry_run=False, batch_size=PRUNE_BATCH_SIZE):
+    """Delete prunable PDFs and their manifest rows in id-ordered batches; returns (files, bytes)."""
+    queryset = prunable_pdfs(older_than)
+    removed = freed = 0
+    last_id = 0
+    while True:
+        batch = list(queryset.filter(id__gt=last_id).order_by('id').values_list('id', 'path', 'size')[:batch_size])
+        if not batch:
+            break
+        last_id = batch[-1][0]
+        removed += len(batch)
+        freed += sum(size for _, _, size in batch)
+        if dry_run:
+            continue
+        for _, path, _ in batch:
+            try:
+                os.unlink(absolute_path(path))
+            except FileNotFoundError:
+                pass
+        PayslipPdf.objects.filter(id__in=[pk for pk, _, _ in batch]).delete()
+    return removed, freed
+
+
+def legacy_pdfs():
+    """PDFs left in the old flat payslips/ directory (one directory listing, no walk)."""
+    root = absolute_path(PDF_ROOT)
+    if not os.path.isdir(root):
+        return []
+    with os.scandir(root) as entries:
+        return [entry.path for entry in entries if entry.is_file() and entry.name.endswith('.pdf')]
@@ -0,0 +1,100 @@
+"""
+Closing and locking pay periods
+"""
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from payslip.date_utils import parse_month_year
+from staff.models import Employee
+from .generation import resolve_period_settings
+from .models import Payslip, PayrollPeriod
+from .render_queue import enqueue_pdf_renders
+
+SNAPSHOT_FIELDS = ['department', 'unit', 'grade', 'level']
+
+
+def _locked_period(month_year):
+    period, _ = PayrollPeriod.objects.get_or_create(month_year=month_year)
+    return PayrollPeriod.objects.select_for_update().get(pk=period.pk)
+
+
+def _freeze_snapshots(month_year, now):
+    """Copy employee details into payslips whose snapshot fields are still empty."""
+    for name in SNAPSHOT_FIELDS:
+        current = Employee.objects.filter(staff_id=OuterRef('employee_id')).values(name)[:1]
+        Payslip.objects.filter(month_year=month_year, **{name: ''}).update(**{
+            name: Coalesce(Subquery(current), Value('')),
+            'last_modified_at': now,
+            'version': F('version') + 1,
+        })
+
+
+def close_period(month_year, user):
+    """
+    Mark a period final.
+
+    Every payslip must have been approved or rejected. The SSNIT and Tier 2
+    rates and the PAYE table in force are stored on the period (a period
+    closed before keeps the ones frozen then), and empty snapshot fields
+    are filled from the employee records so later HR edits no longer change
+    these payslips. Every payslip of the period is queued for PDF
+    pre-rendering.
+    """
+    period_dt = parse_month_year(month_year)
+    if period_dt is None:
+        raise ValueError(f"Invalid period '{month_year}'.")
+
+    with transaction.atomic():
+        period = _locked_period(month_year)
+        if period.is_final():
+            raise ValueError(f"{month_year} is already {period.get_status_display().lower()}.")
+        pending = Payslip.objects.filter(month_year=month_year, approval_status='pending').count()
+        if pending:
+            raise ValueError(f"{month_year} still has {pending} pending payslips.")
+
+        now = timezone.now()
+        rates = resolve_period_settings(month_year)
+        _freeze_snapshots(month_year, now)
+        period.ssnit_rate = rates.ssnit_rate
+        period.tier2_rate = rates.tier2_rate
+        period.tax_table = [[str(band), str(rate)] for band, rate in rates.tax_brackets]
+        period.status = 'closed'
+        period.closed_at = now
+        period.closed_by = user
+        period.save()
+        enqueue_pdf_renders(Payslip.objects.filter(month_year=month_year).values_list('id', flat=True))
+    return period
+
+
+def lock_period(month_year, user):
+    """Make a closed period permanently immutable."""
+    with transaction.atomic():
+        period = _locked_period(month_year)
+        if period.status != 'closed':
+            raise ValueError(f"Only a closed period can be locked; {month_year} is {period.get_status_display().lower()}.")
+        period.status = 'locked'
+        period.locked_at = timezone.now()
+        period.locked_by = user
+        period.save()
+    return period
+
+
+def reopen_period(month_year, user):
+    """
+    Return a closed (not locked) period to open so it can be corrected. Its
+    frozen rates and tax table stay in force for the corrections.
+    """
+    with transaction.atomic():
+        period = _locked_period(month_year)
+        if period.status == 'locked':
+            raise ValueError(f"{month_year} is locked and cannot be reopened.")
+        if period.status != 'closed':
+            raise ValueError(f"Only a closed period can be reopened; {month_year} is {period.get_status_display().lower()}.")
+        period.status = 'open'
+        period.closed_at = None
+        period.closed_by = None
+        period.save()
+    return period
+
@@ -0,0 +1,143 @@
+"""
+Recompute statutory deductions on unapproved payslips after rate changes
+"""
+from dataclasses import dataclass
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .generation import GENERATION_CHUNK_SIZE, calculate_payslip_figures, resolve_period_settings
+from .models import Payslip, PayslipAudit, PayslipLineItem, PayrollPeriod, SystemConfiguration
+
+RECOMPUTABLE_STATUSES = ['pending', 'rejected']
+RECOMPUTED_FIELDS = ['gross_salary', 'ssnit_deduction', 'tier2_deduction', 'income_tax', 'net_salary']
+RATE_FIELDS = ['ssnit_rate', 'tier2_rate']
+FIGURE_COLUMNS = ['basic_salary', 'allowances', 'other_deductions', *RECOMPUTED_FIELDS]
+
+
+@dataclass
+class RecomputeSummary:
+    examined: int = 0
+    changed: int = 0
+    skipped: int = 0
+    net_before: Decimal = Decimal(0)
+    net_after: Decimal = Decimal(0)
+
+    @property
+    def net_change(self):
+        return self.net_after - self.net_before
+
+
+def _non_taxable_totals(payslip_ids):
+    return dict(
+        PayslipLineItem.objects.filter(
+            payslip_id__in=payslip_ids, item_type='payment', payment_type__is_taxable=False
+        ).values('payslip_id').annotate(total=Sum('balance')).values_list('payslip_id', 'total')
+    )
+
+
+def recompute_payslips(user=None, month_year=None, statuses=None, dry_run=False,
+                       chunk_size=GENERATION_CHUNK_SIZE):
+    """
+    Recalculate gross, SSNIT, Tier 2, PAYE and net for unapproved payslips
+    with the current rates and the tax table of each payslip's year (or the
+    rates and table frozen on a period that was closed and reopened).
+    Payslips in closed or locked periods are never touched.
+
+    Payslips are read in id-ordered chunks as plain values and only rows
+    whose figures change are written, with one ``bulk_update`` and one audit
+    ``bulk_create`` per chunk. Figures are computed in Python rather than in
+    an ``UPDATE`` expression so they round exactly like newly generated
+    payslips (banker's rounding, progressive PAYE bands).
+
+    Before writing, the changed rows are locked and re-read; any payslip
+    edited, approved or reverted since it was read is left alone and
+    counted in ``skipped`` rather than overwritten.
+    """
+    statuses = [s for s in (statuses or ['pending']) if s in RECOMPUTABLE_STATUSES]
+    config = SystemConfiguration.get_settings()
+    queryset = Payslip.objects.filter(approval_status__in=statuses).exclude(
+        month_year__in=PayrollPeriod.final_month_years()
+    )
+    if month_year:
+        queryset = queryset.filter(month_year=month_year)
+
+    periods = {}
+    summary = RecomputeSummary()
+    last_id = 0
+    while True:
+        rows = list(
+            queryset.filter(id__gt=last_id).order_by('id')
+            .values('id', 'version', 'month_year', 'approval_status', *FIGURE_COLUMNS)[:chunk_size]
+        )
+        if not rows:
+            break
+        last_id = rows[-1]['id']
+        non_taxable = _non_taxable_totals([row['id'] for row in rows])
+
+        changed = []
+        for row in rows:
+            period = periods.get(row['month_year'])
+            if period is None:
+                period = periods[row['month_year']] = resolve_period_settings(row['month_year'], config=config)
+            figures = calculate_payslip_figures(
+                row['basic_salary'],
+                period,
+                allowances=row['allowances'],
+                other_deductions=row['other_deductions'],
+                taxable_income=row['basic_salary'] + row['allowances'] - non_taxable.get(row['id'], Decimal(0)),
+            )
+            summary.examined += 1
+            summary.net_before += row['net_salary']
+            summary.net_after += row['net_salary']
+            if all(figures[name] == row[name] for name in RECOMPUTED_FIELDS):
+                continue
+            changed.append((row, Payslip(id=row['id'], **{name: figures[name] for name in RECOMPUTED_FIELDS + RATE_FIELDS})))
+
+        if dry_run:
+            summary.changed += len(changed)
+            summary.net_after += sum(payslip.net_salary - row['net_salary'] for row, payslip in changed)
+            continue
+        if not changed:
+            continue
+
+        now = timezone.now()
+        with transaction.atomic():
+            # Rows changed by someone else since they were read keep their figures.
+            current = set(
+                Payslip.objects.select_for_update()
+                .filter(id__in=[row['id'] for row, _ in changed], approval_status__in=statuses)
+                .exclude(month_year__in=PayrollPeriod.final_month_years())
+                .values_list('id', 'version')
+            )
+            unchanged_since_read = [(row, payslip) for row, payslip in changed if (row['id'], row['version']) in current]
+            summary.skipped += len(changed) - len(unchanged_since_read)
+            changed = unchanged_since_read
+            summary.changed += len(changed)
+            summary.net_after += sum(payslip.net_salary - row['net_salary'] for row, payslip in changed)
+            if not changed:
+                continue
+            for _, payslip in changed:
+                # bulk_update skips auto_now, so the timestamp is set explicitly.
+                payslip.last_modified_at = now
+                payslip.last_modified_by = user
+                payslip.version = F('version') + 1
+            Payslip.objects.bulk_update(
+                [payslip for _, payslip in changed],
+                RECOMPUTED_FIELDS + RATE_FIELDS + ['last_modified_at', 'last_modified_by', 'version'],
+            )
+            PayslipAudit.objects.bulk_create([
+                PayslipAudit(
+                    payslip_id=row['id'],
+                    action='recompute',
+                    old_status=row['approval_status'],
+                    new_status=row['approval_status'],
+                    reason=f"Recomputed with SSNIT {periods[row['month_year']].ssnit_rate}% "
+                           f"and Tier 2 {periods[row['month_year']].tier2_rate}%",
+                    performed_by=user,
+                )
+                for row, _ in changed
+            ])
+    return summary
@@ -0,0 +1,305 @@
+"""
+Monthly payroll register
+
+Every payslip of a period with its gross, deductions and net, grouped by
+department and district. Rows come from one streaming ``values()``
+queryset and the department, district and grand subtotals are summed by
+the database, so neither writer ever holds the period in memory.
+"""
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.lib.units import inch
+from reportlab.pdfgen import canvas
+
+from django.db.models import CharField, Count, Sum, Value
+from django.db.models.functions import Coalesce, NullIf
+from django.utils import timezone
+
+from .models import Payslip, SystemConfiguration
+
+REGISTER_CHUNK_SIZE = 2000
+EXCLUDED_STATUSES = ['rejected']
+
+AMOUNT_FIELDS = [
+    'basic_salary', 'allowances', 'gross_salary', 'ssnit_deduction',
+    'tier2_deduction', 'income_tax', 'other_deductions', 'net_salary',
+]
+DEDUCTION_FIELDS = ['ssnit_deduction', 'tier2_deduction', 'income_tax', 'other_deductions']
+
+# (key, heading, PDF column width)
+COLUMNS = [
+    ('staff_id', 'Staff ID', 0.85 * inch),
+    ('name', 'Name', 2.0 * inch),
+    ('grade', 'Grade', 0.95 * inch),
+    ('basic_salary', 'Basic', 0.75 * inch),
+    ('allowances', 'Allowances', 0.7 * inch),
+    ('gross_salary', 'Gross', 0.75 * inch),
+    ('ssnit_deduction', 'SSNIT', 0.65 * inch),
+    ('tier2_deduction', 'Tier 2', 0.65 * inch),
+    ('income_tax', 'PAYE', 0.65 * inch),
+    ('other_deductions', 'Other', 0.6 * inch),
+    ('total_deductions', 'Total Ded.', 0.75 * inch),
+    ('net_salary', 'Net', 0.8 * inch),
+    ('approval_status', 'Status', 0.6 * inch),
+]
+TOTAL_COLUMNS = AMOUNT_FIELDS[:-1] + ['total_deductions', 'net_salary']
+
+
+def register_queryset(month_year):
+    """Payslips of the period with department and district resolved as the payslip PDF does."""
+    config = SystemConfiguration.get_settings()
+    return (
+        Payslip.objects.filter(month_year=month_year)
+        .exclude(approval_status__in=EXCLUDED_STATUSES)
+        .annotate(
+            register_department=Coalesce(
+                NullIf('department', Value('')), NullIf('employee__department', Value('')),
+                Value('Unassigned'), output_field=CharField(),
+            ),
+            register_district=Coalesce(
+                NullIf('district', Value('')), Value(config.default_district), output_field=CharField(),
+            ),
+        )
+    )
+
+
+def _with_total_deductions(totals):
+    totals['total_deductions'] = sum(totals[field] or 0 for field in DEDUCTION_FIELDS)
+    return totals
+
+
+def register_subtotals(month_year):
+    """
+    Database-summed totals: ({(department, district): totals},
+    {department: totals}, grand totals). Each totals dict has a ``count``
+    and one sum per amount column.
+    """
+    queryset = register_queryset(month_year)
+    sums = {field: Sum(field) for field in AMOUNT_FIELDS}
+    by_district = {
+        (row.pop('register_department'), row.pop('register_district')): _with_total_deductions(row)
+        for row in queryset.order_by().values('register_department', 'register_district')
+        .annotate(count=Count('id'), **sums)
+    }
+    by_department = {
+        row.pop('register_department'): _with_total_deductions(row)
+        for row in queryset.order_by().values('register_department').annotate(count=Count('id'), **sums)
+    }
+    grand = _with_total_deductions(queryset.aggregate(count=Count('id'), **sums))
+    return by_district, by_department, grand
+
+
+def register_rows(month_year, chunk_size=REGISTER_CHUNK_SIZE):
+    """Stream the register rows in department, district, name order."""
+    rows = (
+        register_queryset(month_year)
+        .order_by('register_department', 'register_district', 'employee__name', 'id')
+        .values(
+            'register_department', 'register_district', 'employee__staff_id', 'employee__name',
+            'grade', 'employee__grade', 'approval_status', *AMOUNT_FIELDS,
+        )
+        .iterator(chunk_size=chunk_size)
+    )
+    for row in rows:
+        row['staff_id'] = row.pop('employee__staff_id')
+        row['name'] = row.pop('employee__name')
+        employee_grade = row.pop('employee__grade')
+        row['grade'] = row['grade'] or employee_grade or ''
+        _with_total_deductions(row)
+        yield row
+
+
+def register_lines(month_year):
+    """
+    The register as a flat stream of lines for the writers:
+    ('group', department, district), ('row', row),
+    ('subtotal', label, totals) and finally ('total', label, totals).
+    """
+    by_district, by_department, grand = register_subtotals(month_year)
+    department = district = None
+    for row in register_rows(month_year):
+        row_department, row_district = row['register_department'], row['register_district']
+        if (row_department, row_district) != (department, district):
+            if district is not None:
+                yield ('subtotal', f"{district} subtotal", by_district[(department, district)])
+            if department is not None and row_department != department:
+                yield ('subtotal', f"{department} total", by_department[department])
+            department, district = row_department, row_district
+            yield ('group', department, district)
+        yield ('row', row)
+    if department is not None:
+        yield ('subtotal', f"{district} subtotal", by_district[(department, district)])
+        yield ('subtotal', f"{department} total", by_department[department])
+    yield ('total', f"{month_year} grand total", grand)
+
+
+def register_filename(month_year, fmt):
+    return f"payroll_register_{month_year.replace('-', '_')}.{fmt}"
+
+
+def write_register_xlsx(month_year, output):
+    """Write the register to ``output`` (a path or binary file) as a write-only workbook."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=f"Register {month_year}")
+    for index, (_, _, width) in enumerate(COLUMNS):
+        sheet.column_dimensions[get_column_letter(index + 1)].width = round(width / inch * 12)
+    sheet.freeze_panes = 'A3'
+
+    bold = Font(bold=True)
+    group_fill = PatternFill('solid', fgColor='E0E0E0')
+    total_fill = PatternFill('solid', fgColor='F0F0F0')
+
+    def styled(value, fill=None, number=False):
+        cell = WriteOnlyCell(sheet, value=value)
+        cell.font = bold
+        if fill is not None:
+            cell.fill = fill
+        if number:
+            cell.number_format = '#,##0.00'
+        return cell
+
+    def totals_row(label, totals):
+        cells = [styled(label, total_fill), styled(None, total_fill), styled(f"{totals['count']} payslips", total_fill)]
+        cells += [styled(totals[key] or 0, total_fill, number=True) for key in TOTAL_COLUMNS]
+        return cells + [styled(None, total_fill)]
+
+    sheet.append([styled(f"{SystemConfiguration.get_settings().agency_name} - Payroll Register {month_year}")])
+    sheet.append([styled(heading) for _, heading, _ in COLUMNS])
+    for line in register_lines(month_year):
+        kind = line[0]
+        if kind == 'row':
+            row = line[1]
+            cells = [row[key] for key, _, _ in COLUMNS]
+            for index in range(3, 12):
+                cell = WriteOnlyCell(sheet, value=cells[index])
+                cell.number_format = '#,##0.00'
+                cells[index] = cell
+            sheet.append(cells)
+        elif kind == 'group':
+            sheet.append([styled(f"{line[1]} / {line[2]}", group_fill)])
+        else:
+            sheet.append(totals_row(line[1], line[2]))
+    workbook.save(output)
+
+
+class _RegisterPdf:
+    """Paginated register table drawn line by line onto a canvas."""
+
+    PAGE_WIDTH, PAGE_HEIGHT = landscape(A4)
+    MARGIN = 0.5 * inch
+    ROW_HEIGHT = 11
+    FONT_SIZE = 7
+
+    def __init__(self, output, month_year):
+        self.canvas = canvas.Canvas(output, pagesize=(self.PAGE_WIDTH, self.PAGE_HEIGHT), pageCompression=1)
+        self.month_year = month_year
+        self.title = f"{SystemConfiguration.get_settings().agency_name} - Payroll Register {month_year}"
+        self.printed = timezone.localtime().strftime('%d %b %Y %H:%M')
+        self.page = 0
+        self.x = [self.MARGIN]
+        for _, _, width in COLUMNS:
+            self.x.append(self.x[-1] + width)
+        self.y = None
+
+    def new_page(self):
+        c = self.canvas
+        if self.page:
+            c.showPage()
+        self.page += 1
+        top = self.PAGE_HEIGHT - self.MARGIN
+        c.setFont('Helvetica-Bold', 11)
+        c.drawString(self.MARGIN, top - 11, self.title)
+        c.setFont('Helvetica', 7)
+        c.drawRightString(self.PAGE_WIDTH - self.MARGIN, top - 11, f"Printed {self.printed}")
+        c.drawRightString(self.PAGE_WIDTH - self.MARGIN, self.MARGIN - 12, f"Page {self.page}")
+        self.y = top - 24
+        self.fill_row(colors.HexColor('#e0e0e0'))
+        self.draw_cells([heading for _, heading, _ in COLUMNS], 'Helvetica-Bold')
+        c.setLineWidth(0.5)
+        c.line(self.x[0], self.y, self.x[-1], self.y)
+
+    def ensure_room(self):
+        if self.y is None or self.y - self.ROW_HEIGHT < self.MARGIN:
+            self.new_page()
+
+    def fill_row(self, colour):
+        self.canvas.setFillColor(colour)
+        self.canvas.rect(self.x[0], self.y - self.ROW_HEIGHT, self.x[-1] - self.x[0], self.ROW_HEIGHT, stroke=0, fill=1)
+        self.canvas.setFillColor(colors.black)
+
+    def label(self, text, width):
+        """Bold text from the left edge of the current row, cut to ``width``."""
+        self.canvas.setFont('Helvetica-Bold', self.FONT_SIZE)
+        self.canvas.drawString(self.x[0] + 3, self.y - self.ROW_HEIGHT + 3, self._fit(text, 'Helvetica-Bold', width - 6))
+
+    def _fit(self, text, font, width):
+        while text and self.canvas.stringWidth(text, font, self.FONT_SIZE) > width:
+            text = text[:-1]
+        return text
+
+    def draw_cells(self, values, font='Helvetica'):
+        c = self.canvas
+        c.setFont(font, self.FONT_SIZE)
+        baseline = self.y - self.ROW_HEIGHT + 3
+        for index, value in enumerate(values):
+            if value is None or value == '':
+                continue
+            if 3 <= index <= 11:
+                text = value if isinstance(value, str) else f"{value:,.2f}"
+                c.drawRightString(self.x[index + 1] - 3, baseline, text)
+            else:
+                width = self.x[index + 1] - self.x[index] - 6
+                c.drawString(self.x[index] + 3, baseline, self._fit(str(value), font, width))
+        self.y -= self.ROW_HEIGHT
+
+    def group(self, department, district):
+        # Keep a group heading with at least its first row.
+        if self.y is not None and self.y - 2 * self.ROW_HEIGHT < self.MARGIN:
+            self.new_page()
+        self.ensure_room()
+        self.fill_row(colors.HexColor('#f5f5f5'))
+        self.label(f"{department} / {district}", self.x[-1] - self.x[0])
+        self.y -= self.ROW_HEIGHT
+
+    def row(self, row):
+        self.ensure_room()
+        self.draw_cells([row[key] for key, _, _ in COLUMNS])
+
+    def totals(self, label, totals):
+        self.ensure_room()
+        self.fill_row(colors.HexColor('#f0f0f0'))
+        self.label(label, self.x[2] - self.x[0])
+        values = ['', '', f"{totals['count']} payslips"] + [totals[key] or 0 for key in TOTAL_COLUMNS] + ['']
+        self.draw_cells(values, 'Helvetica-Bold')
+
+    def save(self):
+        self.canvas.showPage()
+        self.canvas.save()
+
+
+def write_register_pdf(month_year, output):
+    """
+    Write the register to ``output`` (a path or binary file) as a paginated
+    landscape table. Rows are drawn as they stream in; only the finished
+    page streams are held until the file is saved.
+    """
+    pdf = _RegisterPdf(output, month_year)
+    for line in register_lines(month_year):
+        kind = line[0]
+        if kind == 'row':
+            pdf.row(line[1])
+        elif kind == 'group':
+            pdf.group(line[1], line[2])
+        else:
+            pdf.totals(line[1], line[2])
+    pdf.save()
+
+
+REGISTER_WRITERS = {
+    'xlsx': write_register_xlsx,
+    'pdf': write_register_pdf,
+}
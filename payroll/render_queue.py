@@ -0,0 +1,180 @@
+"""
+Background pre-rendering of payslip PDFs
+
+Approval and period close enqueue PdfRenderJob rows; a worker claims them
+in batches and renders them in a process pool so the PDF cache is warm
+before staff ask for their payslips.
+"""
+import multiprocessing
+import threading
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import timedelta
+
+from django.db import connections
+from django.db.models import Case, F, Q, Value, When
+from django.utils import timezone
+
+from .models import Payslip, PayrollPeriod, PdfRenderJob, SystemConfiguration
+from .pdf_storage import manifest_entry, record_pdfs
+from .utils import cached_pdf_is_fresh, generate_payslip_pdf
+
+RENDER_BATCH_SIZE = 200
+RENDER_TASK_SIZE = 25
+MAX_RENDER_ATTEMPTS = 3
+# A running job older than this is assumed to belong to a crashed worker.
+STALE_RENDER_AFTER = timedelta(minutes=10)
+
+
+def enqueue_pdf_renders(payslip_ids, batch_size=1000):
+    """Queue PDF renders for the given payslips; already queued payslips are left alone."""
+    payslip_ids = list(payslip_ids)
+    for start in range(0, len(payslip_ids), batch_size):
+        chunk = payslip_ids[start:start + batch_size]
+        PdfRenderJob.objects.bulk_create(
+            [PdfRenderJob(payslip_id=payslip_id) for payslip_id in chunk],
+            ignore_conflicts=True,
+        )
+        PdfRenderJob.objects.filter(payslip_id__in=chunk, status='failed').update(
+            status='queued', attempts=0, last_error=''
+        )
+    return len(payslip_ids)
+
+
+def claim_render_jobs(limit=RENDER_BATCH_SIZE):
+    """
+    Claim up to ``limit`` queued (or abandoned) jobs for this worker;
+    returns the claim token and the (job id, payslip id) pairs.
+
+    Candidates are stamped with a fresh claim token in one guarded UPDATE,
+    so concurrent workers never render the same payslip.
+    """
+    token = uuid.uuid4().hex
+    stale_before = timezone.now() - STALE_RENDER_AFTER
+    claimable = Q(status='queued') | Q(status='running', claimed_at__lt=stale_before)
+    ids = list(PdfRenderJob.objects.filter(claimable).order_by('id').values_list('id', flat=True)[:limit])
+    if not ids:
+        return token, []
+    PdfRenderJob.objects.filter(claimable, id__in=ids).update(
+        status='running', claim_token=token, claimed_at=timezone.now()
+    )
+    return token, list(PdfRenderJob.objects.filter(claim_token=token).values_list('id', 'payslip_id'))
+
+
+def refresh_render_claim(token):
+    """Heartbeat: keep a batch that is still rendering from being reclaimed as stale."""
+    return PdfRenderJob.objects.filter(claim_token=token, status='running').update(claimed_at=timezone.now())
+
+
+def render_payslip_pdfs(payslip_ids):
+    """
+    Render the stale or missing PDFs of ``payslip_ids`` in a pool process.
+
+    Only reads from the database; returns the manifest rows of the new
+    files and {payslip_id: error} for failures, for the parent to write.
+    """
+    config = SystemConfiguration.get_settings()
+    payslips = list(Payslip.objects.filter(id__in=payslip_ids).select_related('employee', 'generated_by'))
+    periods = {
+        period.month_year: period
+        for period in PayrollPeriod.objects.filter(month_year__in={p.month_year for p in payslips})
+    }
+    entries, errors = [], {}
+    for payslip in payslips:
+        if cached_pdf_is_fresh(payslip, periods.get(payslip.month_year), config):
+            continue
+        try:
+            filepath, _ = generate_payslip_pdf(payslip, record=False)
+        except Exception as exc:
+            errors[payslip.id] = _describe(exc)
+            continue
+        entries.append(manifest_entry(payslip, filepath))
+    return entries, errors
+
+
+def _describe(exc):
+    return f'{type(exc).__name__}: {exc}'
+
+
+def _render_pool(workers):
+    """
+    A forking process pool, or None to render in-process: where fork is
+    unavailable, or when other threads are running (forking a threaded
+    process, e.g. a web server, can copy locks held by those threads).
+    """
+    if 'fork' not in multiprocessing.get_all_start_methods() or threading.active_count() > 1:
+        return None
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('fork'))
+
+
+def _render_tasks(pool, tasks):
+    """
+    Yield each task's (entries, errors). A task that fails as a whole (a
+    broken pool, a database error before rendering) marks all its payslips
+    failed instead of aborting the batch.
+    """
+    submitted = []
+    for task in tasks:
+        try:
+            submitted.append((task, pool.submit(render_payslip_pdfs, task) if pool else None, None))
+        except Exception as exc:
+            submitted.append((task, None, exc))
+    for task, future, error in submitted:
+        try:
+            if error:
+                raise error
+            yield future.result() if future else render_payslip_pdfs(task)
+        except Exception as exc:
+            yield [], {payslip_id: _describe(exc) for payslip_id in task}
+
+
+def _finish(token, jobs, errors):
+    """Delete the batch's rendered jobs and requeue (or fail) the rest, in two statements."""
+    failed = {job_id: errors[payslip_id] for job_id, payslip_id in jobs if payslip_id in errors}
+    claimed = PdfRenderJob.objects.filter(claim_token=token, status='running')
+    claimed.filter(id__in=[job_id for job_id, _ in jobs]).exclude(id__in=list(failed)).delete()
+    if not failed:
+        return
+    # status is assigned before attempts: MySQL evaluates SET clauses left to right.
+    claimed.filter(id__in=list(failed)).update(
+        status=Case(When(attempts__gte=MAX_RENDER_ATTEMPTS - 1, then=Value('failed')), default=Value('queued')),
+        last_error=Case(*[When(id=job_id, then=Value(error)) for job_id, error in failed.items()]),
+        attempts=F('attempts') + 1,
+    )
+
+
+def process_render_jobs(workers=None, batch_size=RENDER_BATCH_SIZE, task_size=RENDER_TASK_SIZE):
+    """
+    Drain the render queue once; returns (rendered, failed).
+
+    Each claimed batch is split into small tasks for a pool of forked
+    processes, or rendered in this process where fork is unavailable.
+    Database connections are closed before tasks are handed out so no child
+    inherits the parent's connection; each opens its own. The
+    batch's claim is refreshed as each task finishes, so a long batch is
+    not mistaken for an abandoned one and rendered twice.
+    """
+    rendered = failed = 0
+    pool = _render_pool(workers)
+    try:
+        while True:
+            token, jobs = claim_render_jobs(batch_size)
+            if not jobs:
+                break
+            payslip_ids = [payslip_id for _, payslip_id in jobs]
+            tasks = [payslip_ids[start:start + task_size] for start in range(0, len(payslip_ids), task_size)]
+            entries, errors = [], {}
+            if pool:
+                connections.close_all()
+            for task_entries, task_errors in _render_tasks(pool, tasks):
+                entries.extend(task_entries)
+                errors.update(task_errors)
+                refresh_render_claim(token)
+            record_pdfs(entries)
+            _finish(token, jobs, errors)
+            rendered += len(jobs) - len(errors)
+            failed += len(errors)
+    finally:
+        if pool:
+            pool.shutdown()
+    return rendered, failed
@@ -0,0 +1,101 @@
+"""
+Earnings and deductions rules driven by the dynamic payment/deduction types
+"""
+from dataclasses import dataclass, field
+from decimal import Decimal
+
+from core_config.models import DeductionType, PaymentType
+from .models import PayslipLineItem
+
+HUNDRED = Decimal(100)
+
+
+def rule_amount(base, rate_percent):
+    """A rule's line amount: ``rate_percent`` of ``base``, to the cent."""
+    return round(base * rate_percent / HUNDRED, 2)
+
+
+@dataclass(frozen=True)
+class LineRule:
+    """One active payment or deduction type with a default rate"""
+    item_type: str
+    type_id: int
+    name: str
+    rate_percent: Decimal
+    is_taxable: bool = True
+
+
+@dataclass
+class AppliedLines:
+    """Line items computed for one payslip and their rolled-up totals"""
+    lines: list = field(default_factory=list)
+    allowances: Decimal = Decimal(0)
+    taxable_allowances: Decimal = Decimal(0)
+    other_deductions: Decimal = Decimal(0)
+
+    def build_line_items(self, payslip_id):
+        return [
+            PayslipLineItem(
+                payslip_id=payslip_id,
+                item_type=rule.item_type,
+                payment_type_id=rule.type_id if rule.item_type == 'payment' else None,
+                deduction_type_id=rule.type_id if rule.item_type == 'deduction' else None,
+                nature=rule.name,
+                hours_or_amount=base,
+                rate_percent=rule.rate_percent,
+                balance=amount,
+                order=order,
+            )
+            for order, (rule, base, amount) in enumerate(self.lines)
+        ]
+
+
+class PayRuleSet:
+    """
+    Active payment and deduction types, loaded once and reused for every
+    payslip in a run.
+
+    Payment types add ``default_rate_percent`` of basic salary as an
+    allowance; only ``is_taxable`` payments count towards PAYE. Deduction
+    types take ``default_rate_percent`` of gross salary. Types without a
+    default rate are left for manual adjustments, and statutory deduction
+    types are skipped because SSNIT, Tier 2 and PAYE have their own
+    calculators.
+    """
+
+    def __init__(self, payment_rules, deduction_rules):
+        self.payment_rules = payment_rules
+        self.deduction_rules = deduction_rules
+
+    @classmethod
+    def load(cls):
+        payment_rules = [
+            LineRule('payment', type_id, name, rate, is_taxable)
+            for type_id, name, rate, is_taxable in PaymentType.objects.filter(
+                is_active=True, default_rate_percent__gt=0
+            ).order_by('name').values_list('id', 'name', 'default_rate_percent', 'is_taxable')
+        ]
+        deduction_rules = [
+            LineRule('deduction', type_id, name, rate)
+            for type_id, name, rate in DeductionType.objects.filter(
+                is_active=True, is_statutory=False, default_rate_percent__gt=0
+            ).order_by('name').values_list('id', 'name', 'default_rate_percent')
+        ]
+        return cls(payment_rules, deduction_rules)
+
+    def apply(self, basic_salary):
+        """Compute the line items and totals for one basic salary."""
+        applied = AppliedLines()
+        for rule in self.payment_rules:
+            amount = rule_amount(basic_salary, rule.rate_percent)
+            applied.lines.append((rule, basic_salary, amount))
+            applied.allowances += amount
+            if rule.is_taxable:
+                applied.taxable_allowances += amount
+
+        gross_salary = basic_salary + applied.allowances
+        for rule in self.deduction_rules:
+            amount = rule_amount(gross_salary, rule.rate_percent)
+            applied.lines.append((rule, gross_salary, amount))
+            applied.other_deductions += amount
+        return applied
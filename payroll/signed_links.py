@@ -0,0 +1,78 @@
+"""
+Signed, expiring links to cached payslip PDFs
+
+A token carries everything needed to find the cached file, and the
+payslip version it was issued for. The link endpoint needs no login; it
+only checks that the payslip is still approved at that version and that
+the cached file was rendered from it, so a link dies as soon as the
+payslip is reverted or edited.
+"""
+import os
+
+from django.conf import settings
+from django.core import signing
+from django.urls import reverse
+
+from .models import Payslip, PayslipPdf
+from .utils import payslip_pdf_path, pdf_fresh_after
+
+PDF_LINK_SALT = 'payroll.signed_pdf_link'
+
+
+def pdf_link_max_age():
+    return getattr(settings, 'PDF_LINK_MAX_AGE', 3600)
+
+
+def sign_pdf_token(payslip, period=None, config=None):
+    """Token for an approved payslip's PDF; None for any other status."""
+    if payslip.approval_status != 'approved':
+        return None
+    filepath, filename = payslip_pdf_path(payslip)
+    return signing.TimestampSigner(salt=PDF_LINK_SALT).sign_object({
+        'id': payslip.id,
+        'version': payslip.version,
+        'path': os.path.relpath(filepath, settings.MEDIA_ROOT).replace(os.sep, '/'),
+        'name': filename,
+        'fresh': pdf_fresh_after(payslip, period, config).timestamp(),
+    }, compress=True)
+
+
+def read_pdf_token(token):
+    """Payload of a valid, unexpired token; raises signing.BadSignature otherwise."""
+    return signing.TimestampSigner(salt=PDF_LINK_SALT).unsign_object(token, max_age=pdf_link_max_age())
+
+
+def pdf_link_is_current(payload):
+    """Whether the token's payslip is still approved at the version it was signed for."""
+    return Payslip.objects.filter(
+        id=payload['id'], version=payload.get('version'), approval_status='approved'
+    ).exists()
+
+
+def cached_pdf_for(payload):
+    """
+    Absolute path of the cached PDF named by a token, or None if it is
+    missing, stale or was rendered from another version of the payslip
+    (e.g. a finance preview of a later edit).
+    """
+    filepath = os.path.join(settings.MEDIA_ROOT, *payload['path'].split('/'))
+    try:
+        if os.path.getmtime(filepath) < payload['fresh']:
+            return None
+    except OSError:
+        return None
+    rendered = PayslipPdf.objects.filter(
+        path=payload['path'], payslip_id=payload['id'], payslip_version=payload.get('version')
+    ).exists()
+    return filepath if rendered else None
+
+
+def signed_pdf_links(payslip, period=None, config=None):
+    """Preview and download URLs for an approved payslip, or None."""
+    token = sign_pdf_token(payslip, period, config)
+    if token is None:
+        return None
+    return {
+        'preview': reverse('payroll:payslip_signed_pdf', args=[token]),
+        'download': reverse('payroll:payslip_signed_pdf_download', args=[token]),
+    }
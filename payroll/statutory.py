@@ -0,0 +1,172 @@
+"""
+SSNIT, Tier 2 and PAYE remittance schedules
+
+Each schedule lists every employee's contribution for a month with a
+grand total. Rows are grouped and summed by the database in a single
+query and the totals are accumulated as the rows stream out. Schedules of
+closed periods are written once to media/reports/ and served from there.
+"""
+import csv
+import os
+from collections import namedtuple
+from decimal import Decimal
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from payslip.date_utils import parse_month_year
+from .models import Payslip, PayrollPeriod, SystemConfiguration
+from .pdf_storage import absolute_path, atomic_write
+from .utils import EchoBuffer
+
+SCHEDULE_CHUNK_SIZE = 2000
+REPORT_ROOT = 'reports'
+
+Schedule = namedtuple('Schedule', 'title amount_field amount_heading rate_field id_fields')
+
+SCHEDULES = {
+    'ssnit': Schedule('SSNIT Contribution Schedule', 'ssnit_deduction', 'SSNIT Contribution',
+                      'ssnit_rate', ['ssnit_number', 'ghana_card']),
+    'tier2': Schedule('Tier 2 Pension Schedule', 'tier2_deduction', 'Tier 2 Contribution',
+                      'tier2_rate', ['ssnit_number', 'ghana_card']),
+    'paye': Schedule('PAYE Schedule', 'income_tax', 'PAYE', None, ['ghana_card']),
+}
+
+SCHEDULE_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+}
+
+
+def schedule_rate(month_year, kind, period=None):
+    """Rate printed on the schedule: the period's frozen rate once closed, else the configured one."""
+    field = SCHEDULES[kind].rate_field
+    if field is None:
+        return None
+    if period is not None and getattr(period, field) is not None:
+        return getattr(period, field)
+    return getattr(SystemConfiguration.get_settings(), field)
+
+
+def schedule_headings(kind):
+    schedule = SCHEDULES[kind]
+    id_headings = {'ssnit_number': 'SSNIT #', 'ghana_card': 'Ghana Card'}
+    return (
+        ['Staff ID', 'Name'] + [id_headings[field] for field in schedule.id_fields]
+        + ['Basic Salary', 'Gross Salary', schedule.amount_heading]
+    )
+
+
+def schedule_lines(month_year, kind, chunk_size=SCHEDULE_CHUNK_SIZE):
+    """
+    Yield ('row', values) for each employee with approved pay in the
+    period, then ('total', values) with the grand totals.
+    """
+    schedule = SCHEDULES[kind]
+    id_fields = [f'employee__{field}' for field in schedule.id_fields]
+    rows = (
+        Payslip.objects.filter(month_year=month_year, approval_status='approved')
+        .values('employee__staff_id', 'employee__name', *id_fields)
+        .annotate(
+            basic=Sum('basic_salary'),
+            gross=Sum('gross_salary'),
+            amount=Sum(schedule.amount_field),
+        )
+        .order_by('employee__name', 'employee__staff_id')
+        .iterator(chunk_size=chunk_size)
+    )
+    employees = 0
+    basic_total = gross_total = amount_total = Decimal('0')
+    for row in rows:
+        employees += 1
+        basic_total += row['basic']
+        gross_total += row['gross']
+        amount_total += row['amount']
+        yield ('row', (
+            [row['employee__staff_id'], row['employee__name']]
+            + [row[field] or '' for field in id_fields]
+            + [row['basic'], row['gross'], row['amount']]
+        ))
+    padding = [''] * len(id_fields)
+    yield ('total', ['TOTAL', f"{employees} employees"] + padding + [basic_total, gross_total, amount_total])
+
+
+def _title_lines(month_year, kind, period):
+    config = SystemConfiguration.get_settings()
+    lines = [[f"{config.agency_name} - {SCHEDULES[kind].title}"], ['Period', month_year]]
+    rate = schedule_rate(month_year, kind, period)
+    if rate is not None:
+        lines.append(['Rate (%)', f"{rate:.2f}"])
+    return lines
+
+
+def schedule_csv_lines(month_year, kind, period=None):
+    writer = csv.writer(EchoBuffer())
+    for line in _title_lines(month_year, kind, period):
+        yield writer.writerow(line)
+    yield writer.writerow(schedule_headings(kind))
+    for _, row in schedule_lines(month_year, kind):
+        yield writer.writerow([f"{value:.2f}" if isinstance(value, Decimal) else value for value in row])
+
+
+def write_schedule_csv(month_year, kind, output, period=None):
+    with open(output, 'w', encoding='utf-8', newline='') as handle:
+        handle.writelines(schedule_csv_lines(month_year, kind, period))
+
+
+def write_schedule_xlsx(month_year, kind, output, period=None):
+    """Write the schedule to ``output`` (a path or binary file) as a write-only workbook."""
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet(title=f"{kind.upper()} {month_year}")
+    bold = Font(bold=True)
+
+    def cells(values, font=None):
+        result = []
+        for value in values:
+            cell = WriteOnlyCell(sheet, value=value)
+            if isinstance(value, Decimal):
+                cell.number_format = '#,##0.00'
+            if font is not None:
+                cell.font = font
+            result.append(cell)
+        return result
+
+    for line in _title_lines(month_year, kind, period):
+        sheet.append(cells(line, bold))
+    sheet.append(cells(schedule_headings(kind), bold))
+    for line_type, row in schedule_lines(month_year, kind):
+        sheet.append(cells(row, bold if line_type == 'total' else None))
+    workbook.save(output)
+
+
+SCHEDULE_WRITERS = {
+    'csv': write_schedule_csv,
+    'xlsx': write_schedule_xlsx,
+}
+
+
+def schedule_filename(month_year, kind, fmt):
+    return f"{kind}_schedule_{month_year.replace('-', '_')}.{fmt}"
+
+
+def cached_schedule(month_year, kind, fmt):
+    """
+    Path of the schedule file for a closed or locked period, written on first
+    use; None for open periods. The file name carries the close time, so a
+    reopened and re-closed period gets a fresh file.
+    """
+    period = PayrollPeriod.objects.filter(month_year=month_year, status__in=PayrollPeriod.FINAL_STATUSES).first()
+    if period is None or period.closed_at is None:
+        return None
+    period_dt = parse_month_year(month_year)
+    stamp = timezone.localtime(period.closed_at).strftime('%Y%m%d%H%M%S')
+    filename = schedule_filename(month_year, kind, fmt).replace(f'.{fmt}', f'_{stamp}.{fmt}')
+    filepath = absolute_path(f"{REPORT_ROOT}/{period_dt.strftime('%Y-%m')}/{filename}")
+    if not os.path.exists(filepath):
+        with atomic_write(filepath) as tmp_path:
+            SCHEDULE_WRITERS[fmt](month_year, kind, tmp_path, period)
+    return filepath
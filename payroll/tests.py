@@ -1,3 +1,398 @@
-from django.test import TestCase
+import base64
+import csv
+import os
+import re
+import tempfile
+import zlib
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.db import DatabaseError
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from core_config.models import DeductionType, PaymentType
+from staff.models import Employee
+from .adjustments import apply_adjustments, validate_adjustments
+from .generation import calculate_payslip_figures, calculate_with_rules, resolve_period_settings
+from .models import (
+    EmployeeYTD, Payslip, PayslipAudit, PayslipLineItem, PayslipPdf, PdfRenderJob, SystemConfiguration,
+)
+from .pdf_canvas import draw_payslip
+from .periods import close_period, reopen_period
+from .recompute import recompute_payslips
+from .render_queue import MAX_RENDER_ATTEMPTS, enqueue_pdf_renders, process_render_jobs
+from .rules import PayRuleSet
+from .signed_links import read_pdf_token, sign_pdf_token
+from .transitions import bulk_transition
+from .utils import _build_payslip_pdf, payslip_pdf_fields
+
+STREAM_RE = re.compile(rb'stream\r?\n(.*?)endstream', re.S)
+TEXT_RE = re.compile(rb'\(((?:\\.|[^\\)])*)\)\s*Tj|\[((?:\\.|[^\]])*)\]\s*TJ', re.S)
+STRING_RE = re.compile(rb'\(((?:\\.|[^\\)])*)\)', re.S)
+ESCAPE_RE = re.compile(rb'\\([0-7]{1,3}|.)', re.S)
+ESCAPES = {b'n': b'\n', b'r': b'\r', b't': b'\t', b'b': b'\b', b'f': b'\f'}
+
+
+def _unescape(value):
+    def replace(match):
+        code = match.group(1)
+        if code[:1].isdigit():
+            return bytes([int(code, 8) & 0xFF])
+        return ESCAPES.get(code, code)
+    return ESCAPE_RE.sub(replace, value).decode('cp1252')
+
+
+def _content_streams(data):
+    for match in STREAM_RE.finditer(data):
+        raw = match.group(1).rstrip(b'\r\n')
+        try:
+            yield zlib.decompress(raw)
+        except zlib.error:
+            try:
+                yield zlib.decompress(base64.a85decode(raw.strip(), adobe=True))
+            except (ValueError, zlib.error):
+                continue
+
+
+def extract_text(path):
+    """Strings drawn with Tj/TJ, in drawing order."""
+    with open(path, 'rb') as handle:
+        data = handle.read()
+    strings = []
+    for stream in _content_streams(data):
+        if b'BT' not in stream:
+            continue
+        for shown, array in TEXT_RE.findall(stream):
+            if array:
+                text = ''.join(_unescape(part) for part in STRING_RE.findall(array))
+            else:
+                text = _unescape(shown)
+            if text.strip():
+                strings.append(text)
+    return strings
+
+
+class CanvasRendererParityTests(TestCase):
+    """The canvas fast path must print exactly what the platypus layout prints."""
+
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='finance', password='x', first_name='Ama', last_name='Mensah')
+        self.employee = Employee.objects.create(
+            staff_id='CAS01234', name='Kofi Boateng', monthly_salary=Decimal('4200.00'),
+            ssnit_number='C0123456789', department='GREATER ACCRA', unit='HEADQUARTERS',
+            grade='PARAMEDIC', level='2',
+        )
+        self.payslip = Payslip.objects.create(
+            employee=self.employee, generated_by=user, month_year='Jan-2026',
+            basic_salary=Decimal('4200.00'), allowances=Decimal('0'), gross_salary=Decimal('4200.00'),
+            ssnit_deduction=Decimal('231.00'), tier2_deduction=Decimal('147.00'),
+            income_tax=Decimal('612.50'), other_deductions=Decimal('0'), net_salary=Decimal('3209.50'),
+        )
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def render_both(self):
+        payslip = Payslip.objects.select_related('employee', 'generated_by').get(id=self.payslip.id)
+        fields = payslip_pdf_fields(payslip)
+        platypus_path = os.path.join(self.tmpdir.name, 'platypus.pdf')
+        canvas_path = os.path.join(self.tmpdir.name, 'canvas.pdf')
+        _build_payslip_pdf(payslip, platypus_path, fields)
+        draw_payslip(payslip, canvas_path, fields)
+        return extract_text(platypus_path), extract_text(canvas_path)
+
+    def test_same_text_without_optional_rows(self):
+        platypus_text, canvas_text = self.render_both()
+        self.assertIn('NATIONAL AMBULANCE SERVICE', platypus_text)
+        self.assertIn('3209.50', platypus_text)
+        self.assertEqual(canvas_text, platypus_text)
+
+    def test_same_text_with_allowances_and_other_deductions(self):
+        Payslip.objects.filter(id=self.payslip.id).update(
+            allowances=Decimal('350.00'), gross_salary=Decimal('4550.00'), other_deductions=Decimal('75.00'),
+        )
+        platypus_text, canvas_text = self.render_both()
+        self.assertIn('    Allowances', platypus_text)
+        self.assertIn('(75.00)', platypus_text)
+        self.assertEqual(canvas_text, platypus_text)
+
+    def test_gross_salary_shown_when_allowances_move_the_rows(self):
+        Payslip.objects.filter(id=self.payslip.id).update(allowances=Decimal('350.00'), gross_salary=Decimal('4550.00'))
+        platypus_text, canvas_text = self.render_both()
+        for text in (platypus_text, canvas_text):
+            self.assertIn('4550.00', text)
+
+
+class RecomputeTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='finance', password='x')
+        employee = Employee.objects.create(staff_id='CAS00001', name='Kofi Boateng', monthly_salary=Decimal('4200.00'))
+        # Figures at an old 5.0% SSNIT rate; the configured rate is 5.5%.
+        self.payslip = Payslip.objects.create(
+            employee=employee, generated_by=self.user, month_year='Mar-2026', approval_status='pending',
+            basic_salary=Decimal('4200.00'), gross_salary=Decimal('4200.00'), ssnit_deduction=Decimal('210.00'),
+            tier2_deduction=Decimal('147.00'), income_tax=Decimal('612.50'), net_salary=Decimal('3230.50'),
+        )
+
+    def test_rewrites_stale_figures(self):
+        summary = recompute_payslips(self.user, month_year='Mar-2026')
+        self.assertEqual((summary.examined, summary.changed, summary.skipped), (1, 1, 0))
+        payslip = Payslip.objects.get(id=self.payslip.id)
+        self.assertEqual(payslip.ssnit_deduction, Decimal('231.00'))
+        self.assertEqual(payslip.version, self.payslip.version + 1)
+        self.assertEqual(summary.net_change, payslip.net_salary - self.payslip.net_salary)
+        self.assertTrue(PayslipAudit.objects.filter(payslip=payslip, action='recompute').exists())
+
+    def test_payslip_approved_during_the_run_is_skipped(self):
+        def approve_then_calculate(*args, **kwargs):
+            # Another approver commits between the read and the write.
+            bulk_transition(Payslip.objects.filter(id=self.payslip.id), 'approve', self.user)
+            return calculate_payslip_figures(*args, **kwargs)
+
+        with mock.patch('payroll.recompute.calculate_payslip_figures', side_effect=approve_then_calculate):
+            summary = recompute_payslips(self.user, month_year='Mar-2026')
+        self.assertEqual((summary.changed, summary.skipped, summary.net_change), (0, 1, 0))
+        payslip = Payslip.objects.get(id=self.payslip.id)
+        self.assertEqual(payslip.approval_status, 'approved')
+        self.assertEqual(payslip.ssnit_deduction, Decimal('210.00'))
+        self.assertFalse(PayslipAudit.objects.filter(payslip=payslip, action='recompute').exists())
+        self.assertEqual(payslip.employee.ytd_totals.get(tax_year=2026).net_salary, Decimal('3230.50'))
+
+
+class AdjustmentTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='finance', password='x')
+        employee = Employee.objects.create(staff_id='CAS00001', name='Kofi Boateng', monthly_salary=Decimal('4000.00'))
+        PaymentType.objects.create(code='BONUS', name='Bonus')
+        DeductionType.objects.create(code='LOAN', name='Staff Loan')
+        DeductionType.objects.create(code='WELFARE', name='Welfare', default_rate_percent=Decimal('2.00'))
+        # Generated with a per-run SSNIT override of 5.0% (configured: 5.5%).
+        period = resolve_period_settings('Mar-2026', ssnit_rate=Decimal('5.00'))
+        figures, applied = calculate_with_rules(Decimal('4000.00'), period, PayRuleSet.load())
+        self.payslip = Payslip.objects.create(
+            employee=employee, generated_by=self.user, month_year='Mar-2026', approval_status='pending', **figures
+        )
+        PayslipLineItem.objects.bulk_create(applied.build_line_items(self.payslip.id))
+        # Rates changed after generation must not leak into adjustments.
+        SystemConfiguration.objects.filter(id=1).update(ssnit_rate=Decimal('6.00'), tier2_rate=Decimal('4.00'))
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+
+    def adjust(self, code, amount):
+        path = os.path.join(self.tmpdir.name, 'adjustments.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as handle:
+            csv.writer(handle).writerows([['STAFF ID', 'type', 'amount'], ['CAS00001', code, amount]])
+        batch = validate_adjustments(path, 'Mar-2026')
+        self.assertEqual(batch.errors, [])
+        self.assertEqual(apply_adjustments(batch, self.user, 'test'), 1)
+        return Payslip.objects.get(id=self.payslip.id)
+
+    def test_deduction_changes_only_other_deductions_and_net(self):
+        payslip = self.adjust('LOAN', '100')
+        for name in ['gross_salary', 'ssnit_deduction', 'tier2_deduction', 'income_tax', 'ssnit_rate', 'tier2_rate']:
+            self.assertEqual(getattr(payslip, name), getattr(self.payslip, name), name)
+        self.assertEqual(payslip.other_deductions, self.payslip.other_deductions + 100)
+        self.assertEqual(payslip.net_salary, self.payslip.net_salary - 100)
+
+    def test_allowance_uses_the_payslip_rates_and_updates_rule_deductions(self):
+        payslip = self.adjust('BONUS', '500')
+        self.assertEqual(payslip.gross_salary, Decimal('4500.00'))
+        self.assertEqual(payslip.ssnit_deduction, Decimal('225.00'))
+        self.assertEqual(payslip.tier2_deduction, Decimal('157.50'))
+        welfare = payslip.line_items.get(deduction_type__code='WELFARE')
+        self.assertEqual(welfare.balance, Decimal('90.00'))
+        self.assertEqual(payslip.other_deductions, Decimal('90.00'))
+        self.assertEqual(
+            payslip.net_salary,
+            payslip.gross_salary - payslip.ssnit_deduction - payslip.tier2_deduction - payslip.income_tax - Decimal('90.00'),
+        )
+
+
+class RenderQueueTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='finance', password='x')
+        employee = Employee.objects.create(staff_id='CAS00001', name='Kofi Boateng', monthly_salary=Decimal('4200.00'))
+        self.payslip = Payslip.objects.create(
+            employee=employee, generated_by=user, month_year='Mar-2026', approval_status='approved',
+            basic_salary=Decimal('4200.00'), gross_salary=Decimal('4200.00'), ssnit_deduction=Decimal('231.00'),
+            tier2_deduction=Decimal('147.00'), income_tax=Decimal('605.00'), net_salary=Decimal('3217.00'),
+        )
+        enqueue_pdf_renders([self.payslip.id])
+
+    def drain(self):
+        # Render in-process: forked children cannot see the test transaction.
+        with mock.patch('payroll.render_queue._render_pool', return_value=None):
+            return process_render_jobs()
+
+    def test_unexpected_render_error_fails_the_job(self):
+        with mock.patch('payroll.render_queue.generate_payslip_pdf', side_effect=KeyError('logo')):
+            self.assertEqual(self.drain(), (0, MAX_RENDER_ATTEMPTS))
+        job = PdfRenderJob.objects.get(payslip=self.payslip)
+        self.assertEqual((job.status, job.attempts), ('failed', MAX_RENDER_ATTEMPTS))
+        self.assertEqual(job.last_error, "KeyError: 'logo'")
+
+    def test_failed_task_marks_its_payslips_failed(self):
+        with mock.patch('payroll.render_queue.SystemConfiguration.get_settings', side_effect=DatabaseError('gone away')):
+            self.assertEqual(self.drain(), (0, MAX_RENDER_ATTEMPTS))
+        job = PdfRenderJob.objects.get(payslip=self.payslip)
+        self.assertEqual((job.status, job.last_error), ('failed', 'DatabaseError: gone away'))
+
+
+def create_payslip(user, staff_id='CAS00001', approval_status='pending', month_year='Mar-2026'):
+    employee, _ = Employee.objects.get_or_create(
+        staff_id=staff_id, defaults={'name': 'Kofi Boateng', 'monthly_salary': Decimal('4200.00')}
+    )
+    return Payslip.objects.create(
+        employee=employee, generated_by=user, month_year=month_year, approval_status=approval_status,
+        basic_salary=Decimal('4200.00'), gross_salary=Decimal('4200.00'), ssnit_deduction=Decimal('231.00'),
+        tier2_deduction=Decimal('147.00'), income_tax=Decimal('605.00'), net_salary=Decimal('3217.00'),
+    )
+
+
+class SingleApprovalTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='finance', password='x', role='finance')
+        self.client.force_login(self.user)
+        self.payslip = create_payslip(self.user)
+
+    def approve(self, **data):
+        return self.client.post(reverse('payroll:payslip_approve', args=[self.payslip.id]), data, follow=True)
+
+    def test_current_version_approves_with_audit_and_ledger(self):
+        self.approve(version=self.payslip.version)
+        payslip = Payslip.objects.get(id=self.payslip.id)
+        self.assertEqual((payslip.approval_status, payslip.version), ('approved', self.payslip.version + 1))
+        audit = PayslipAudit.objects.get(payslip=payslip)
+        self.assertEqual((audit.action, audit.old_status, audit.new_status), ('approve', 'pending', 'approved'))
+        self.assertEqual(payslip.employee.ytd_totals.get(tax_year=2026).net_salary, Decimal('3217.00'))
+        self.assertTrue(PdfRenderJob.objects.filter(payslip=payslip).exists())
+
+    def test_stale_version_is_refused(self):
+        # Someone else saved the payslip after this page was rendered.
+        Payslip.objects.filter(id=self.payslip.id).update(version=F('version') + 1)
+        response = self.approve(version=self.payslip.version)
+        self.assertContains(response, 'was changed by someone else')
+        payslip = Payslip.objects.get(id=self.payslip.id)
+        self.assertEqual(payslip.approval_status, 'pending')
+        self.assertFalse(PayslipAudit.objects.filter(payslip=payslip).exists())
+        self.assertFalse(payslip.employee.ytd_totals.exists())
+
+    def test_missing_version_is_a_bad_request(self):
+        self.assertEqual(self.approve().status_code, 400)
+        self.assertEqual(Payslip.objects.get(id=self.payslip.id).approval_status, 'pending')
+
+
+class BulkTransitionTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='finance', password='x')
+        self.first = create_payslip(self.user)
+        self.second = create_payslip(self.user, staff_id='CAS00002')
+        self.approved = create_payslip(self.user, staff_id='CAS00003', approval_status='approved')
+
+    def ytd_net(self):
+        return {
+            staff_id: net for staff_id, net in
+            EmployeeYTD.objects.filter(tax_year=2026).values_list('employee_id', 'net_salary')
+        }
+
+    def test_approve_audits_and_counts_exactly_the_rows_it_changed(self):
+        result = bulk_transition(Payslip.objects.filter(month_year='Mar-2026'), 'approve', self.user)
+        self.assertEqual((result.matched, result.updated), (2, 2))
+        audited = PayslipAudit.objects.filter(action='approve').values_list('payslip_id', 'old_status')
+        self.assertEqual(sorted(audited), [(self.first.id, 'pending'), (self.second.id, 'pending')])
+        # The payslip that was already approved is neither audited nor counted again.
+        self.assertEqual(self.ytd_net(), {'CAS00001': Decimal('3217.00'), 'CAS00002': Decimal('3217.00')})
+        self.assertEqual(PdfRenderJob.objects.count(), 2)
+
+    def test_revert_takes_approved_payslips_off_the_ledger(self):
+        bulk_transition(Payslip.objects.filter(id=self.first.id), 'approve', self.user)
+        bulk_transition(Payslip.objects.filter(id=self.second.id), 'reject', self.user)
+        result = bulk_transition(Payslip.objects.filter(id__in=[self.first.id, self.second.id]), 'revert', self.user)
+        self.assertEqual(result.updated, 2)
+        # Only the approved payslip was on the ledger.
+        self.assertEqual(self.ytd_net(), {'CAS00001': Decimal('0.00')})
+        audited = PayslipAudit.objects.filter(action='revert').values_list('payslip_id', 'old_status')
+        self.assertEqual(sorted(audited), [(self.first.id, 'approved'), (self.second.id, 'rejected')])
+
+
+class ClosedPeriodTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username='finance', password='x', role='finance')
+        self.client.force_login(self.user)
+        self.payslip = create_payslip(self.user, approval_status='approved')
+        close_period('Mar-2026', self.user)
+        self.payslip.refresh_from_db()
+
+    def test_edit_and_revert_are_refused(self):
+        url = reverse('payroll:payslip_edit', args=[self.payslip.id])
+        response = self.client.post(url, {
+            'version': self.payslip.version, 'edit_reason_choice': 'Correction', 'basic_salary': '5000.00',
+        }, follow=True)
+        self.assertContains(response, 'Mar-2026 is closed')
+        url = reverse('payroll:payslip_revert_to_pending', args=[self.payslip.id])
+        self.client.post(url, {'version': self.payslip.version, 'reason_choice': 'Correction'})
+        payslip = Payslip.objects.get(id=self.payslip.id)
+        self.assertEqual((payslip.approval_status, payslip.basic_salary), ('approved', Decimal('4200.00')))
+        self.assertEqual(payslip.version, self.payslip.version)
+
+    def test_adjustments_are_refused(self):
+        with tempfile.NamedTemporaryFile('w', suffix='.csv', delete=False) as handle:
+            csv.writer(handle).writerows([['STAFF ID', 'type', 'amount'], ['CAS00001', 'BONUS', '100']])
+        self.addCleanup(os.remove, handle.name)
+        batch = validate_adjustments(handle.name, 'Mar-2026')
+        self.assertEqual(batch.errors, ['Mar-2026 is closed; its payslips can no longer be adjusted.'])
+
+    def test_only_a_closed_period_can_be_reopened(self):
+        reopen_period('Mar-2026', self.user)
+        with self.assertRaisesMessage(ValueError, 'Only a closed period can be reopened'):
+            reopen_period('Mar-2026', self.user)
+
+
+class SignedLinkTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        media = override_settings(MEDIA_ROOT=self.tmpdir.name)
+        media.enable()
+        self.addCleanup(media.disable)
+        self.user = get_user_model().objects.create_user(username='finance', password='x')
+        self.payslip = create_payslip(self.user)
+        bulk_transition(Payslip.objects.filter(id=self.payslip.id), 'approve', self.user)
+        self.payslip.refresh_from_db()
+        self.token = sign_pdf_token(self.payslip)
+        self.payload = read_pdf_token(self.token)
+        # A cached PDF rendered from the approved version.
+        filepath = os.path.join(self.tmpdir.name, *self.payload['path'].split('/'))
+        os.makedirs(os.path.dirname(filepath))
+        with open(filepath, 'wb') as handle:
+            handle.write(b'%PDF-1.4\n')
+        self.pdf = PayslipPdf.objects.create(
+            payslip=self.payslip, path=self.payload['path'], payslip_version=self.payslip.version,
+            rendered_at=timezone.now(),
+        )
+
+    def get(self):
+        return self.client.get(reverse('payroll:payslip_signed_pdf', args=[self.token]))
+
+    def test_current_link_serves_the_cached_pdf(self):
+        response = self.get()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'%PDF-1.4\n')
+
+    def test_reverted_payslip_link_is_dead(self):
+        bulk_transition(Payslip.objects.filter(id=self.payslip.id), 'revert', self.user)
+        self.assertEqual(self.get().status_code, 404)
+
+    def test_edited_payslip_link_is_dead(self):
+        Payslip.objects.filter(id=self.payslip.id).update(version=F('version') + 1)
+        self.assertEqual(self.get().status_code, 404)
+
+    def test_pdf_of_another_version_is_not_served(self):
+        PayslipPdf.objects.filter(id=self.pdf.id).update(payslip_version=self.payslip.version + 1)
+        response = self.get()
+        self.assertRedirects(
+            response, reverse('payroll:payslip_preview_pdf', args=[self.payslip.id]), fetch_redirect_response=False
+        )
@@ -0,0 +1,123 @@
+"""
+Set-based approval transitions for payslips matched by a filter
+"""
+from dataclasses import dataclass
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from core_config.models import ApprovalStatus
+from .models import Payslip, PayslipAudit
+from .render_queue import enqueue_pdf_renders
+from .ytd import add_to_ytd, remove_from_ytd
+
+TRANSITIONS = {
+    'approve': (['pending'], 'approved'),
+    'reject': (['pending'], 'rejected'),
+    'revert': (['approved', 'rejected'], 'pending'),
+}
+AUDIT_BATCH_SIZE = 1000
+
+
+@dataclass
+class TransitionResult:
+    action: str
+    matched: int = 0
+    updated: int = 0
+
+
+def approval_queryset(month=None, year=None, department=None):
+    """Payslips matching the approval list filters."""
+    queryset = Payslip.objects.all()
+    if month:
+        queryset = queryset.filter(month_year__startswith=month)
+    if year:
+        queryset = queryset.filter(month_year__endswith=year)
+    if department:
+        queryset = queryset.filter(department=department)
+    return queryset
+
+
+def status_config_for(status):
+    """Dynamic approval status whose code matches a legacy status, if configured."""
+    return ApprovalStatus.objects.filter(code__iexact=status, is_active=True).first()
+
+
+def compare_and_swap(payslip_id, expected_version, from_statuses=None, unless=None, **changes):
+    """
+    Write ``changes`` to one payslip only if it is still at ``expected_version``
+    (and in one of ``from_statuses``, and not matching the ``unless`` Q),
+    bumping the version in the same UPDATE.
+
+    Returns False when another writer got there first.
+    """
+    queryset = Payslip.objects.filter(id=payslip_id, version=expected_version)
+    if from_statuses:
+        queryset = queryset.filter(approval_status__in=from_statuses)
+    if unless is not None:
+        queryset = queryset.exclude(unless)
+    return queryset.update(version=F('version') + 1, **changes) == 1
+
+
+def bulk_transition(queryset, action, user, reason=''):
+    """
+    Move every payslip in ``queryset`` through an approval transition.
+
+    Matching rows are locked and read once for their ids and old statuses,
+    then exactly those ids are changed with an ``UPDATE`` guarded by the
+    allowed source statuses (the filter itself is not re-run, so audits and
+    ledger entries describe the rows written, and MySQL never sees a
+    subquery on the table it updates), and an audit entry is bulk inserted
+    for each. Approved payslips are
+    added to the year-to-date ledger and queued for PDF pre-rendering;
+    reverted ones are taken off the ledger.
+    """
+    from_statuses, to_status = TRANSITIONS[action]
+    result = TransitionResult(action=action)
+    guarded = queryset.filter(approval_status__in=from_statuses)
+
+    with transaction.atomic():
+        rows = list(guarded.select_for_update().values_list('id', 'approval_status'))
+        result.matched = len(rows)
+        if not rows:
+            return result
+
+        now = timezone.now()
+        changes = {
+            'approval_status': to_status,
+            'status_config': status_config_for(to_status),
+            'last_modified_by': user,
+            'last_modified_at': now,
+            'version': F('version') + 1,
+        }
+        if action == 'approve':
+            changes.update(approved_by=user, approved_at=now)
+        elif action == 'revert':
+            changes.update(approved_by=None, approved_at=None)
+        ids = [payslip_id for payslip_id, _ in rows]
+        for start in range(0, len(ids), AUDIT_BATCH_SIZE):
+            result.updated += Payslip.objects.filter(
+                id__in=ids[start:start + AUDIT_BATCH_SIZE], approval_status__in=from_statuses
+            ).update(**changes)
+
+        PayslipAudit.objects.bulk_create(
+            [
+                PayslipAudit(
+                    payslip_id=payslip_id,
+                    action=action,
+                    old_status=old_status,
+                    new_status=to_status,
+                    reason=reason,
+                    performed_by=user,
+                )
+                for payslip_id, old_status in rows
+            ],
+            batch_size=AUDIT_BATCH_SIZE,
+        )
+        if action == 'approve':
+            add_to_ytd(ids)
+            enqueue_pdf_renders(ids)
+        elif action == 'revert':
+            remove_from_ytd([payslip_id for payslip_id, old_status in rows if old_status == 'approved'])
+    return result
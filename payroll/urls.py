@@ -6,15 +6,29 @@ app_name = 'payroll'
 urlpatterns = [
     path('payslip/generate/', views.payslip_generate, name='payslip_generate'),
     path('payslip/generate/bulk/', views.payslip_bulk_generate, name='payslip_bulk_generate'),
+    path('payslip/adjustments/', views.payslip_bulk_adjust, name='payslip_bulk_adjust'),
     path('payslip/approvals/', views.payslip_approve_list, name='payslip_approve_list'),
     path('payslip/<int:payslip_id>/approve/', views.payslip_approve, name='payslip_approve'),
     path('payslip/<int:payslip_id>/reject/', views.payslip_reject, name='payslip_reject'),
     path('payslip/<int:payslip_id>/revert/', views.payslip_revert_to_pending, name='payslip_revert_to_pending'),
     path('payslip/<int:payslip_id>/delete/', views.payslip_delete, name='payslip_delete'),
     path('payslip/bulk-approve/', views.payslip_bulk_approve, name='payslip_bulk_approve'),
+    path('payslip/approvals/claim/', views.payslip_claim_batch, name='payslip_claim_batch'),
+    path('payslip/approvals/release/', views.payslip_release_batch, name='payslip_release_batch'),
+    path('payslip/bulk/<str:action>/', views.payslip_bulk_transition, name='payslip_bulk_transition'),
     path('payslip/<int:payslip_id>/', views.payslip_view, name='payslip_view'),
     path('payslip/<int:payslip_id>/preview/', views.payslip_preview_pdf, name='payslip_preview_pdf'),
     path('payslip/<int:payslip_id>/download/', views.payslip_download_pdf, name='payslip_download_pdf'),
+    path('payslip/file/<str:token>/', views.payslip_signed_pdf, name='payslip_signed_pdf'),
+    path('payslip/file/<str:token>/download/', views.payslip_signed_pdf,
+         {'as_attachment': True}, name='payslip_signed_pdf_download'),
     path('payslip/<int:payslip_id>/edit/', views.payslip_edit, name='payslip_edit'),
+    path('periods/', views.payroll_periods, name='payroll_periods'),
+    path('periods/<str:month_year>/register.<str:fmt>', views.payroll_register, name='payroll_register'),
+    path('periods/<str:month_year>/bank.<str:fmt>', views.bank_payment_file, name='bank_payment_file'),
+    path('periods/<str:month_year>/<str:kind>-schedule.<str:fmt>', views.statutory_schedule,
+         name='statutory_schedule'),
+    path('periods/<str:month_year>/<str:action>/', views.payroll_period_action, name='payroll_period_action'),
     path('settings/', views.system_settings, name='system_settings'),
+    path('settings/recompute/', views.payslip_recompute, name='payslip_recompute'),
 ]
@@ -11,8 +11,13 @@ from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from datetime import datetime, date
 import calendar
 import os
+from urllib.parse import quote
 from django.conf import settings
+from django.http import FileResponse, HttpResponse
+from django.utils.http import content_disposition_header
 from .models import SystemConfiguration
+from .pdf_canvas import draw_payslip
+from .pdf_storage import absolute_path, atomic_write, pdf_relative_path, record_pdf
 
 MONTH_YEAR_FORMAT = '%b-%Y'
 
@@ -33,7 +38,27 @@ def calculate_tier2(gross_salary, rate=None):
     return round(Decimal(gross_salary) * Decimal(rate) / Decimal(100), 2)
 
 
-def calculate_income_tax(monthly_gross):
+# Annual PAYE bands (band width in GHS, rate %), keyed by the first tax year
+# each table applies to. Add a new entry when the bands change.
+TAX_TABLES = {
+    2024: [
+        (Decimal('4380'), Decimal('0')),      # First 4,380: 0%
+        (Decimal('1320'), Decimal('5')),      # Next 1,320: 5%
+        (Decimal('1320'), Decimal('10')),     # Next 1,320: 10%
+        (Decimal('33120'), Decimal('17.5')),  # Next 33,120: 17.5%
+        (Decimal('199860'), Decimal('25')),   # Next 199,860: 25%
+        (Decimal('999999999'), Decimal('30')) # Above 240,000: 30%
+    ],
+}
+
+
+def tax_brackets_for(year):
+    """Tax table in force for a tax year (earliest table for older years)"""
+    applicable = [start for start in TAX_TABLES if start <= year]
+    return TAX_TABLES[max(applicable) if applicable else min(TAX_TABLES)]
+
+
+def calculate_income_tax(monthly_gross, brackets=None):
     """
     Calculate Ghana income tax based on 2024/2025 tax brackets
     Progressive tax calculation on annual income
@@ -41,14 +66,8 @@ def calculate_income_tax(monthly_gross):
     annual_gross = Decimal(monthly_gross) * Decimal(12)
     
     # Tax brackets (annual amounts in GHS)
-    brackets = [
-        (Decimal('4380'), Decimal('0')),      # First 4,380: 0%
-        (Decimal('1320'), Decimal('5')),      # Next 1,320: 5%
-        (Decimal('1320'), Decimal('10')),     # Next 1,320: 10%
-        (Decimal('33120'), Decimal('17.5')),  # Next 33,120: 17.5%
-        (Decimal('199860'), Decimal('25')),   # Next 199,860: 25%
-        (Decimal('999999999'), Decimal('30')) # Above 240,000: 30%
-    ]
+    if brackets is None:
+        brackets = tax_brackets_for(date.today().year)
     
     total_tax = Decimal('0')
     remaining = annual_gross
@@ -67,18 +86,160 @@ def calculate_income_tax(monthly_gross):
     return round(monthly_tax, 2)
 
 
-def generate_payslip_pdf(payslip):
+def payslip_pdf_path(payslip):
+    """Location of the cached PDF for a payslip, and its download filename"""
+    relative, filename = pdf_relative_path(payslip.employee_id, payslip.month_year)
+    return absolute_path(relative), filename
+
+
+def pdf_fresh_after(payslip, period=None, config=None):
+    """
+    Time after which a cached PDF of the payslip is still valid.
+
+    In a closed or locked period nothing changes after closing, so any PDF
+    rendered since the close stays valid. Otherwise the PDF must be newer
+    than the payslip, the employee record and the system configuration.
+    """
+    if period is not None and period.is_final() and period.closed_at:
+        return period.closed_at
+    config = config or SystemConfiguration.get_settings()
+    stamps = [payslip.last_modified_at, payslip.employee.updated_at, config.updated_at]
+    return max(stamp for stamp in stamps if stamp is not None)
+
+
+def cached_pdf_is_fresh(payslip, period=None, config=None):
+    """Whether the cached PDF of the payslip exists and is still valid"""
+    filepath, _ = payslip_pdf_path(payslip)
+    try:
+        return os.path.getmtime(filepath) >= pdf_fresh_after(payslip, period, config).timestamp()
+    except OSError:
+        return False
+
+
+def get_payslip_pdf(payslip, period=None, config=None):
+    """Return (filepath, filename) of the payslip PDF, rendering it only if the cached copy is stale."""
+    if cached_pdf_is_fresh(payslip, period, config):
+        return payslip_pdf_path(payslip)
+    return generate_payslip_pdf(payslip)
+
+
+class EchoBuffer:
+    """File-like object whose write() returns the line, for streaming csv.writer output."""
+
+    def write(self, value):
+        return value
+
+
+def pdf_file_response(filepath, filename, as_attachment=False, content_type='application/pdf'):
+    """
+    Response sending a PDF (or other cached report) from disk with the
+    configured PDF_SERVE_BACKEND.
+
+    With 'nginx' or 'apache' the body is left empty and the web server
+    streams the file itself; anything else falls back to FileResponse.
+    """
+    backend = getattr(settings, 'PDF_SERVE_BACKEND', 'django')
+    if backend not in ('nginx', 'apache'):
+        return FileResponse(
+            open(filepath, 'rb'), as_attachment=as_attachment, filename=filename, content_type=content_type
+        )
+
+    response = HttpResponse(content_type=content_type)
+    response['Content-Disposition'] = content_disposition_header(as_attachment, filename)
+    if backend == 'nginx':
+        relative = os.path.relpath(filepath, settings.MEDIA_ROOT).replace(os.sep, '/')
+        response['X-Accel-Redirect'] = settings.PDF_INTERNAL_URL.rstrip('/') + '/' + quote(relative)
+    else:
+        response['X-Sendfile'] = os.path.abspath(filepath)
+    return response
+
+
+def generate_payslip_pdf(payslip, record=True):
     """
     Generate an Excel-style payslip PDF optimized for black and white printing
     Uses simple borders, no colors, landscape orientation
+
+    PAYSLIP_PDF_RENDERER picks the platypus layout (default) or the faster
+    fixed-coordinate canvas renderer, which draws the same page.
+    With ``record=False`` the caller is responsible for the manifest entry.
     """
-    # Create PDF filename
-    filename = f"payslip_{payslip.employee.staff_id}_{payslip.month_year.replace('-', '_')}.pdf"
-    filepath = os.path.join(settings.MEDIA_ROOT, 'payslips', filename)
-    
-    # Ensure directory exists
-    os.makedirs(os.path.dirname(filepath), exist_ok=True)
+    filepath, filename = payslip_pdf_path(payslip)
+    fields = payslip_pdf_fields(payslip)
+    build = draw_payslip if getattr(settings, 'PAYSLIP_PDF_RENDERER', 'platypus') == 'canvas' else _build_payslip_pdf
+    with atomic_write(filepath) as tmp_path:
+        build(payslip, tmp_path, fields)
+    if record:
+        record_pdf(payslip, filepath)
+    return filepath, filename
+
+
+def agency_logo_path(config):
+    """Uploaded agency logo, falling back to the static default logo (None if neither exists)."""
+    if config.agency_logo and os.path.exists(config.agency_logo.path):
+        return config.agency_logo.path
+    static_logo_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'logo.png')
+    if os.path.exists(static_logo_path):
+        return static_logo_path
+    return None
+
+
+def employee_identifier(employee):
+    """SSNIT number, or the Ghana Card once the employee is past SSNIT age (60)."""
+    birth_date = employee.date_of_birth
+    is_above_ssnit_age = False
+    if birth_date:
+        today = date.today()
+        age = today.year - birth_date.year - (
+            (today.month, today.day) < (birth_date.month, birth_date.day)
+        )
+        is_above_ssnit_age = age >= 60
+
+    # SSNIT is preferred unless employee is above SSNIT age.
+    if not is_above_ssnit_age and employee.ssnit_number:
+        return employee.ssnit_number
+    if employee.ghana_card:
+        return employee.ghana_card
+    return employee.ssnit_number or ''
+
+
+def payslip_pdf_fields(payslip, config=None):
+    """Values printed on a payslip PDF, shared by the platypus and canvas renderers."""
+    config = config or SystemConfiguration.get_settings()
+
+    # Parse month_year for period display
+    try:
+        month_dt = datetime.strptime(payslip.month_year, MONTH_YEAR_FORMAT)
+        last_day = calendar.monthrange(month_dt.year, month_dt.month)[1]
+        period_display = f"01-{month_dt.strftime(MONTH_YEAR_FORMAT).upper()} TO {last_day}-{month_dt.strftime(MONTH_YEAR_FORMAT).upper()}"
+    except (TypeError, ValueError):
+        period_display = payslip.month_year
     
+    if payslip.generated_by:
+        generated_by_name = payslip.generated_by.get_full_name() or payslip.generated_by.username
+    else:
+        generated_by_name = "Deleted user"
+
+    return {
+        'logo_path': agency_logo_path(config),
+        'period_display': period_display,
+        # Snapshot fallbacks to current employee record when payslip snapshot is empty.
+        'department': payslip.department or payslip.employee.department or '',
+        'unit': payslip.unit or payslip.employee.unit or '',
+        'grade': payslip.grade or payslip.employee.grade or '',
+        'level': payslip.level or payslip.employee.level or '',
+        'staff_identifier': employee_identifier(payslip.employee),
+        'agency': payslip.agency or config.agency_name,
+        'district': payslip.district or config.default_district,
+        'total_deductions': float(payslip.ssnit_deduction + payslip.tier2_deduction +
+                                  payslip.income_tax + payslip.other_deductions),
+        'payment_mode': payslip.payment_mode or "Bank Transfer",
+        'generated_line': f"Generated on {payslip.generated_at.strftime('%d %b %Y at %H:%M')} "
+                          f"by {generated_by_name} | Payslip ID: #{payslip.id}",
+    }
+
+
+def _build_payslip_pdf(payslip, filepath, fields):
+    """Lay out and write the payslip PDF to ``filepath`` with platypus flowables."""
     # Create PDF document (landscape orientation, standard margins)
     doc = SimpleDocTemplate(
         filepath,
@@ -93,9 +254,6 @@ def generate_payslip_pdf(payslip):
     elements = []
     styles = getSampleStyleSheet()
     
-    # Get system configuration
-    config = SystemConfiguration.get_settings()
-    
     # Simple text styles (no colors)
     header_style = ParagraphStyle(
         'HeaderStyle',
@@ -121,23 +279,8 @@ def generate_payslip_pdf(payslip):
         alignment=TA_CENTER
     )
     
-    # Parse month_year for period display
-    try:
-        month_dt = datetime.strptime(payslip.month_year, MONTH_YEAR_FORMAT)
-        last_day = calendar.monthrange(month_dt.year, month_dt.month)[1]
-        period_display = f"01-{month_dt.strftime(MONTH_YEAR_FORMAT).upper()} TO {last_day}-{month_dt.strftime(MONTH_YEAR_FORMAT).upper()}"
-    except (TypeError, ValueError):
-        period_display = payslip.month_year
-    
-    # Add logo with fallback to static default logo
-    logo_path = None
-    if config.agency_logo and os.path.exists(config.agency_logo.path):
-        logo_path = config.agency_logo.path
-    else:
-        static_logo_path = os.path.join(settings.BASE_DIR, 'static', 'images', 'logo.png')
-        if os.path.exists(static_logo_path):
-            logo_path = static_logo_path
-
+    period_display = fields['period_display']
+    logo_path = fields['logo_path']
     if logo_path:
         try:
             logo = Image(logo_path, width=1.2*inch, height=0.6*inch, kind='proportional')
@@ -151,27 +294,11 @@ def generate_payslip_pdf(payslip):
     elements.append(Paragraph("NATIONAL AMBULANCE SERVICE", header_style))
     elements.append(Spacer(1, 0.04*inch))
 
-    # Snapshot fallbacks to current employee record when payslip snapshot is empty.
-    department = payslip.department or payslip.employee.department or ''
-    unit = payslip.unit or payslip.employee.unit or ''
-    grade = payslip.grade or payslip.employee.grade or ''
-    level = payslip.level or payslip.employee.level or ''
-    birth_date = payslip.employee.date_of_birth
-    is_above_ssnit_age = False
-    if birth_date:
-        today = date.today()
-        age = today.year - birth_date.year - (
-            (today.month, today.day) < (birth_date.month, birth_date.day)
-        )
-        is_above_ssnit_age = age >= 60
-
-    # SSNIT is preferred unless employee is above SSNIT age.
-    if not is_above_ssnit_age and payslip.employee.ssnit_number:
-        staff_identifier = payslip.employee.ssnit_number
-    elif payslip.employee.ghana_card:
-        staff_identifier = payslip.employee.ghana_card
-    else:
-        staff_identifier = payslip.employee.ssnit_number or ''
+    department = fields['department']
+    unit = fields['unit']
+    grade = fields['grade']
+    level = fields['level']
+    staff_identifier = fields['staff_identifier']
     
     # Employee and Organization Information Table
     info_data = [
@@ -180,9 +307,9 @@ def generate_payslip_pdf(payslip):
          Paragraph("<b>ORGANIZATION INFORMATION</b>", normal_center_style), ''],
         # Data rows
         [Paragraph("<b>Name:</b>", styles['Normal']), payslip.employee.name or '', 
-         Paragraph("<b>Agency:</b>", styles['Normal']), payslip.agency or config.agency_name],
+         Paragraph("<b>Agency:</b>", styles['Normal']), fields['agency']],
         [Paragraph("<b>Staff ID:</b>", styles['Normal']), payslip.employee.staff_id or '', 
-         Paragraph("<b>District:</b>", styles['Normal']), payslip.district or config.default_district],
+         Paragraph("<b>District:</b>", styles['Normal']), fields['district']],
         [Paragraph("<b>SSNIT/Ghana Card #:</b>", styles['Normal']), staff_identifier, 
          Paragraph("<b>Department:</b>", styles['Normal']), department],
         [Paragraph("<b>Unit:</b>", styles['Normal']), unit,
@@ -219,8 +346,7 @@ def generate_payslip_pdf(payslip):
     elements.append(Spacer(1, 0.04*inch))
     
     # Financial Breakdown Table
-    total_deductions = float(payslip.ssnit_deduction + payslip.tier2_deduction + 
-                           payslip.income_tax + payslip.other_deductions)
+    total_deductions = fields['total_deductions']
     
     financial_data = [
         # Header
@@ -236,6 +362,7 @@ def generate_payslip_pdf(payslip):
         financial_data.append(['    Allowances', f'{payslip.allowances:.2f} '])
     
     # Gross Salary
+    gross_row = len(financial_data)
     financial_data.extend([
         [Paragraph("<b>GROSS SALARY</b>", styles['Normal']), 
          Paragraph(f"<b>{payslip.gross_salary:.2f}</b>", styles['Normal'])],
@@ -281,7 +408,7 @@ def generate_payslip_pdf(payslip):
         ('BOTTOMPADDING', (0, 0), (-1, -1), 3),
         ('LEFTPADDING', (0, 0), (-1, -1), 6),
         # Gross salary row - gray background
-        ('BACKGROUND', (0, 3), (-1, 3), colors.HexColor('#f0f0f0')),
+        ('BACKGROUND', (0, gross_row), (-1, gross_row), colors.HexColor('#f0f0f0')),
         # Total deductions row - gray background
         ('BACKGROUND', (0, -2), (-1, -2), colors.HexColor('#f0f0f0')),
         # Net salary row - darker gray 
@@ -290,8 +417,9 @@ def generate_payslip_pdf(payslip):
         ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
     ]))
     
-    #  Need to add DEDUCTIONS header styling dynamically
-    deductions_row = 4
+    # DEDUCTIONS header follows the gross salary row, which moves down when
+    # there is an allowances row.
+    deductions_row = gross_row + 1
     financial_table.setStyle(TableStyle([
         ('SPAN', (0, deductions_row), (1, deductions_row)),
         ('ALIGN', (0, deductions_row), (0, deductions_row), 'CENTER'),
@@ -302,7 +430,7 @@ def generate_payslip_pdf(payslip):
     elements.append(Spacer(1, 0.04*inch))
     
     # Payment Mode Table 
-    payment_mode_text = payslip.payment_mode or "Bank Transfer"
+    payment_mode_text = fields['payment_mode']
     payment_data = [[Paragraph("<b>Payment Mode:</b>", styles['Normal']), payment_mode_text]]
     payment_table = Table(payment_data, colWidths=[1.3*inch, 6.2*inch])
     payment_table.setStyle(TableStyle([
@@ -319,18 +447,11 @@ def generate_payslip_pdf(payslip):
     
     # Footer
     elements.append(Spacer(1, 0.05*inch))
-    if payslip.generated_by:
-        generated_by_name = payslip.generated_by.get_full_name() or payslip.generated_by.username
-    else:
-        generated_by_name = "Deleted user"
-
     footer_text = f"""<b>This is a computer-generated payslip</b><br/>
-        Generated on {payslip.generated_at.strftime('%d %b %Y at %H:%M')} by {generated_by_name} | Payslip ID: #{payslip.id}"""
+        {fields['generated_line']}"""
     
     footer_para = Paragraph(footer_text, footer_style)
     elements.append(footer_para)
     
     # Build PDF
     doc.build(elements)
-    
-    return filepath, filename
@@ -0,0 +1,114 @@
+"""
+Month-over-month payslip variance
+
+Each payslip of a period is compared with the same employee's payslip of
+the month before. The previous figures and the deltas come from window
+functions (Lag/Lead partitioned by employee, ordered by period) in one
+query, so a month of any size is compared without loading history into
+Python; only the threshold checks run on the returned rows.
+"""
+import calendar
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import Case, F, IntegerField, Value, When, Window
+from django.db.models.functions import Cast, Lag, Lead, Right
+
+from payslip.date_utils import previous_month_year
+from .models import Payslip
+
+VARIANCE_FLAGS = {
+    'new': 'New hire',
+    'separated': 'Separation',
+    'gross': 'Salary change',
+    'deductions': 'Deduction change',
+}
+
+
+def period_key():
+    """month_year ('Jan-2026') as a sortable number, year * 12 + month, in SQL."""
+    month = Case(
+        *[When(month_year__startswith=abbr, then=Value(number))
+          for number, abbr in enumerate(calendar.month_abbr) if abbr],
+        output_field=IntegerField(),
+    )
+    return Cast(Right('month_year', 4), IntegerField()) * 12 + month
+
+
+def _is_outlier(change, previous, percent):
+    """True if ``change`` is over the minimum amount and ``percent`` of ``previous``."""
+    change = abs(change)
+    if change < Decimal(str(settings.VARIANCE_MIN_CHANGE_AMOUNT)):
+        return False
+    return not previous or change * 100 >= abs(previous) * Decimal(str(percent))
+
+
+def variance_rows(month_year, department=None):
+    """
+    Every employee paid in ``month_year`` or the month before, as one row
+    each: the current payslip with last month's figures and the deltas, or
+    last month's payslip for employees with no payslip this month.
+    Rejected payslips are left out on both sides.
+    """
+    previous = previous_month_year(month_year)
+    queryset = Payslip.objects.filter(month_year__in=[previous, month_year]).exclude(approval_status='rejected')
+    if department:
+        queryset = queryset.filter(department=department)
+    deductions = F('gross_salary') - F('net_salary')
+
+    def window(function):
+        return Window(function, partition_by=[F('employee_id')], order_by=period_key().asc())
+
+    return (
+        queryset
+        .annotate(
+            previous_gross=window(Lag('gross_salary')),
+            previous_deductions=window(Lag(deductions)),
+            previous_net=window(Lag('net_salary')),
+            previous_id=window(Lag('id')),
+            next_id=window(Lead('id')),
+        )
+        .annotate(
+            gross_change=F('gross_salary') - F('previous_gross'),
+            deduction_change=deductions - F('previous_deductions'),
+            net_change=F('net_salary') - F('previous_net'),
+        )
+        # Keep each employee's latest row; the comparison with last month is already on it.
+        .filter(next_id__isnull=True)
+        .values(
+            'id', 'employee_id', 'employee__name', 'month_year', 'department', 'approval_status',
+            'gross_salary', 'net_salary', 'previous_id', 'previous_gross', 'previous_deductions',
+            'previous_net', 'gross_change', 'deduction_change', 'net_change',
+        )
+        .order_by('employee__name', 'employee_id')
+    )
+
+
+def variance_flags(row, month_year):
+    """Flag codes (see VARIANCE_FLAGS) for one row of variance_rows()."""
+    if row['month_year'] != month_year:
+        return ['separated']
+    if row['previous_id'] is None:
+        return ['new']
+    flags = []
+    if _is_outlier(row['gross_change'], row['previous_gross'], settings.VARIANCE_GROSS_CHANGE_PERCENT):
+        flags.append('gross')
+    if _is_outlier(row['deduction_change'], row['previous_deductions'], settings.VARIANCE_DEDUCTION_CHANGE_PERCENT):
+        flags.append('deductions')
+    return flags
+
+
+def variance_exceptions(month_year, department=None):
+    """
+    The rows of variance_rows() that trip a threshold, each with its
+    ``flags`` and ``flag_labels``; separations come last.
+    """
+    current, separated = [], []
+    for row in variance_rows(month_year, department):
+        flags = variance_flags(row, month_year)
+        if not flags:
+            continue
+        row['flags'] = flags
+        row['flag_labels'] = [VARIANCE_FLAGS[flag] for flag in flags]
+        (separated if flags == ['separated'] else current).append(row)
+    return current + separated
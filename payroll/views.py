@@ -1,23 +1,59 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.urls import reverse
 from django.contrib import messages
-from django.http import FileResponse
 from django.conf import settings
-from django.db import DatabaseError
+from django.core import signing
+from django.http import FileResponse, Http404, HttpResponseBadRequest, StreamingHttpResponse
+from django.db import DatabaseError, transaction
+from django.db.models import Count, Max, OuterRef, Q, Subquery, Sum
 from django.core.paginator import Paginator
 from django.views.decorators.clickjacking import xframe_options_sameorigin
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
 from decimal import Decimal, DecimalException
 from datetime import datetime, date
 from django.utils import timezone
+import hashlib
 import os
+import tempfile
+from urllib.parse import urlencode
 
-from .models import Payslip, PayslipAudit, SystemConfiguration
-from .forms import PayslipGenerateForm, BulkPayslipGenerateForm, SystemConfigurationForm
-from .utils import calculate_ssnit, calculate_tier2, calculate_income_tax, generate_payslip_pdf
-from payslip.date_utils import parse_month_year, build_month_year_filters
+from .models import EmployeeYTD, Payslip, PayslipAudit, PayslipLineItem, PayrollPeriod, SystemConfiguration
+from .forms import (
+    PayslipGenerateForm, BulkPayslipGenerateForm, BulkAdjustmentForm, PayslipRecomputeForm,
+    SystemConfigurationForm,
+)
+from .utils import get_payslip_pdf, pdf_file_response
+from .generation import calculate_with_rules, generate_payslips, resolve_period_settings
+from .rules import PayRuleSet
+from .adjustments import apply_adjustments, validate_adjustments
+from .recompute import recompute_payslips
+from .periods import close_period, lock_period, reopen_period
+from .bank_files import BANK_FILE_FORMATS, bank_file_name
+from .register import REGISTER_WRITERS, register_filename
+from .render_queue import enqueue_pdf_renders
+from .statutory import (
+    SCHEDULE_FORMATS, SCHEDULES, cached_schedule, schedule_csv_lines, schedule_filename, write_schedule_xlsx,
+)
+from .signed_links import cached_pdf_for, pdf_link_is_current, pdf_link_max_age, read_pdf_token
+from .ytd import add_to_ytd, apply_ytd, employee_ytd, payslip_totals, remove_from_ytd
+from .variance import variance_exceptions
+from .transitions import TRANSITIONS, approval_queryset, bulk_transition, compare_and_swap, status_config_for
+from .leases import (
+    LEASE_BATCH_SIZE, active_leases, claim_batch, lease_holder, leased_by_others, release_leases,
+)
+from payslip.date_utils import parse_month_year, build_month_year_filters, previous_month_year
 
 from staff.models import Employee
+from staff.salaries import period_start, salary_as_of
 from accounts.decorators import admin_required, finance_required, staff_or_admin_required
 
+ADJUSTMENT_ERRORS_SHOWN = 50
+FINAL_PDF_MAX_AGE = 60 * 60 * 24 * 365
+EDITABLE_AMOUNT_FIELDS = [
+    'basic_salary', 'allowances', 'ssnit_deduction', 'tier2_deduction', 'income_tax', 'other_deductions',
+]
+
 
 def _resolved_snapshot(payslip):
     """Resolve snapshot values with fallback to current employee record."""
@@ -49,6 +85,102 @@ def _resolved_snapshot(payslip):
     }
 
 
+def _refuse_if_final(request, payslip):
+    """Redirect with an error if the payslip's period is closed or locked."""
+    if not PayrollPeriod.is_month_final(payslip.month_year):
+        return None
+    messages.error(request, f"{payslip.month_year} is closed; its payslips can no longer be changed.")
+    return redirect('payroll:payslip_view', payslip_id=payslip.id)
+
+
+def _can_access_payslip(user, staff_id, approval_status):
+    """Admins, finance and HR see every payslip; staff only their own approved ones."""
+    if user.is_admin() or user.is_finance() or user.is_hr_admin():
+        return True
+    return staff_id == user.staff_id and approval_status == 'approved'
+
+
+def _payslip_validators(request, payslip_id):
+    """
+    ETag parts and Last-Modified time for a payslip, or None if the user may
+    not see it (so the view runs and refuses as usual).
+
+    Everything a payslip page or PDF shows changes the payslip version, the
+    employee record, the pay period or the system configuration, so those
+    stamps identify a rendering. Computed once per request.
+    """
+    cache = request.__dict__.setdefault('_payslip_validators', {})
+    if payslip_id in cache:
+        return cache[payslip_id]
+
+    period_updated_at = PayrollPeriod.objects.filter(month_year=OuterRef('month_year')).values('updated_at')[:1]
+    row = Payslip.objects.filter(id=payslip_id).annotate(
+        period_updated_at=Subquery(period_updated_at)
+    ).values(
+        'version', 'last_modified_at', 'approval_status', 'employee_id',
+        'employee__updated_at', 'period_updated_at',
+    ).first()
+    validators = None
+    if row and _can_access_payslip(request.user, row['employee_id'], row['approval_status']):
+        config_updated_at = SystemConfiguration.get_settings().updated_at
+        stamps = [
+            row['last_modified_at'], row['employee__updated_at'], row['period_updated_at'], config_updated_at,
+        ]
+        last_modified = max(stamp for stamp in stamps if stamp is not None)
+        parts = [
+            str(payslip_id),
+            str(row['version']),
+            *(str(int(stamp.timestamp() * 1000000)) if stamp else '0' for stamp in stamps),
+        ]
+        validators = (parts, last_modified)
+    cache[payslip_id] = validators
+    return validators
+
+
+def _payslip_pdf_etag(request, payslip_id):
+    validators = _payslip_validators(request, payslip_id)
+    return '-'.join(validators[0]) if validators else None
+
+
+def _payslip_last_modified(request, payslip_id):
+    validators = _payslip_validators(request, payslip_id)
+    return validators[1] if validators else None
+
+
+def _payslip_page_validators(request, payslip_id):
+    """
+    Validators for the HTML page, or None while flash messages are queued:
+    actions that change nothing redirect here with an error, and a 304 would
+    leave it unshown until some later page.
+    """
+    if messages.get_messages(request):
+        return None
+    return _payslip_validators(request, payslip_id)
+
+
+def _payslip_page_last_modified(request, payslip_id):
+    validators = _payslip_page_validators(request, payslip_id)
+    return validators[1] if validators else None
+
+
+def _payslip_page_etag(request, payslip_id):
+    # The HTML page also carries the user's CSRF token, filter options and
+    # the employee's year-to-date totals, so it is only reusable by the same
+    # session for the same query while those totals stand.
+    validators = _payslip_page_validators(request, payslip_id)
+    if not validators:
+        return None
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    latest_payslip_id = Payslip.objects.aggregate(latest=Max('id'))['latest']
+    ytd_updated_at = EmployeeYTD.objects.filter(employee__payslips=payslip_id).aggregate(
+        latest=Max('updated_at')
+    )['latest']
+    digest = hashlib.sha256(
+        f"{request.user.pk}|{csrf_cookie}|{request.GET.urlencode()}|{latest_payslip_id}|{ytd_updated_at}".encode()
+    ).hexdigest()[:16]
+    return '-'.join(validators[0] + [digest])
+
+
 @finance_required(allow_admin=False)
 def payslip_generate(request):
     """Generate a new payslip"""
@@ -58,6 +190,8 @@ def payslip_generate(request):
             try:
                 employee = form.cleaned_data['employee']
                 month_year = form.cleaned_data['month_year']
+                if PayrollPeriod.is_month_final(month_year):
+                    raise ValueError(f"{month_year} is closed")
                 config = SystemConfiguration.get_settings()
                 ssnit_rate = form.cleaned_data.get('ssnit_rate', config.ssnit_rate)
                 tier2_rate = form.cleaned_data.get('tier2_rate', config.tier2_rate)
@@ -65,39 +199,27 @@ def payslip_generate(request):
                 # Use default district from config if empty
                 district = form.cleaned_data.get('district') or config.default_district
                 
-                # Calculate financials
-                basic_salary = employee.monthly_salary
-                allowances = Decimal(0)
-                other_deductions = Decimal(0)
-                gross_salary = basic_salary + allowances
-                
-                ssnit = calculate_ssnit(gross_salary, ssnit_rate)
-                tier2 = calculate_tier2(gross_salary, tier2_rate)
-                income_tax = calculate_income_tax(gross_salary)
+                # Calculate financials (salary in force for the selected period)
+                period = resolve_period_settings(month_year, ssnit_rate, tier2_rate, district, config)
+                basic_salary = salary_as_of(employee, period_start(month_year))
+                figures, applied = calculate_with_rules(basic_salary, period, PayRuleSet.load())
                 
-                net_salary = gross_salary - ssnit - tier2 - income_tax - other_deductions
-                
-                payslip = Payslip.objects.create(
-                    employee=employee,
-                    month_year=month_year,
-                    agency=config.agency_name,
-                    district=district,
-                    department=employee.department,
-                    unit=employee.unit,
-                    grade=employee.grade,
-                    level=employee.level,
-                    basic_salary=basic_salary,
-                    allowances=allowances,
-                    gross_salary=gross_salary,
-                    ssnit_deduction=ssnit,
-                    tier2_deduction=tier2,
-                    income_tax=income_tax,
-                    other_deductions=other_deductions,
-                    net_salary=net_salary,
-                    payment_mode=f"{employee.bank_name}, {employee.bank_branch}" if employee.bank_name else "",
-                    approval_status='pending',
-                    generated_by=request.user
-                )
+                with transaction.atomic():
+                    payslip = Payslip.objects.create(
+                        employee=employee,
+                        month_year=month_year,
+                        agency=config.agency_name,
+                        district=district,
+                        department=employee.department,
+                        unit=employee.unit,
+                        grade=employee.grade,
+                        level=employee.level,
+                        **figures,
+                        payment_mode=f"{employee.bank_name}, {employee.bank_branch}" if employee.bank_name else "",
+                        approval_status='pending',
+                        generated_by=request.user
+                    )
+                    PayslipLineItem.objects.bulk_create(applied.build_line_items(payslip.id))
                 
                 messages.success(request, f'Payslip generated successfully for {employee.name}')
                 return redirect(settings.LOGIN_REDIRECT_URL)
@@ -136,59 +258,29 @@ def payslip_bulk_generate(request):
     if request.method == 'POST':
         form = BulkPayslipGenerateForm(request.POST)
         if form.is_valid():
-            config = SystemConfiguration.get_settings()
-            month_year = form.cleaned_data['month_year']
-            district = form.cleaned_data.get('district') or config.default_district
-            ssnit_rate = form.cleaned_data.get('ssnit_rate', config.ssnit_rate)
-            tier2_rate = form.cleaned_data.get('tier2_rate', config.tier2_rate)
-            
-            active_employees = Employee.objects.filter(is_active=True)
-            created_count = 0
-            skipped_count = 0
+            periods = form.cleaned_data['periods']
+            summary = generate_payslips(
+                periods,
+                request.user,
+                ssnit_rate=form.cleaned_data.get('ssnit_rate'),
+                tier2_rate=form.cleaned_data.get('tier2_rate'),
+                district=form.cleaned_data.get('district'),
+                include_arrears=form.cleaned_data.get('include_arrears', False),
+            )
+            period_label = periods[0] if len(periods) == 1 else f'{periods[0]} to {periods[-1]}'
             
-            for employee in active_employees:
-                if Payslip.objects.filter(employee=employee, month_year=month_year).exists():
-                    skipped_count += 1
-                    continue
-                
-                # Calculate financials (simplified for bulk)
-                basic_salary = employee.monthly_salary
-                allowances = Decimal(0) 
-                other_deductions = Decimal(0)
-                gross_salary = basic_salary + allowances
-                
-                ssnit = calculate_ssnit(gross_salary, ssnit_rate)
-                tier2 = calculate_tier2(gross_salary, tier2_rate)
-                income_tax = calculate_income_tax(gross_salary)
-                net_salary = gross_salary - ssnit - tier2 - income_tax - other_deductions
-                
-                Payslip.objects.create(
-                    employee=employee,
-                    month_year=month_year,
-                    agency=config.agency_name,
-                    district=district,
-                    department=employee.department,
-                    unit=employee.unit,
-                    grade=employee.grade,
-                    level=employee.level,
-                    basic_salary=basic_salary,
-                    allowances=allowances,
-                    gross_salary=gross_salary,
-                    ssnit_deduction=ssnit,
-                    tier2_deduction=tier2,
-                    income_tax=income_tax,
-                    other_deductions=other_deductions,
-                    net_salary=net_salary,
-                    payment_mode=("" if not employee.bank_name else f"{employee.bank_name}, {employee.bank_branch}"),
-                    approval_status='pending',
-                    generated_by=request.user
+            if summary.created > 0:
+                messages.success(request, f'Successfully generated {summary.created} payslips for {period_label}.')
+            if summary.skipped > 0:
+                messages.warning(request, f'Skipped {summary.skipped} employee-months (payslips already exist).')
+            if summary.closed_periods:
+                messages.warning(request, f'Skipped closed periods: {", ".join(summary.closed_periods)}.')
+            if summary.arrears_periods:
+                messages.info(
+                    request,
+                    f'Arrears ({summary.arrears_periods[0].month_year} to {summary.arrears_periods[-1].month_year}): '
+                    f'{summary.arrears_count} payslips, net GHS {summary.arrears_net_total:,.2f}.'
                 )
-                created_count += 1
-            
-            if created_count > 0:
-                messages.success(request, f'Successfully generated {created_count} payslips for {month_year}.')
-            if skipped_count > 0:
-                messages.warning(request, f'Skipped {skipped_count} employees (payslips already exist).')
                 
             return redirect(settings.LOGIN_REDIRECT_URL)
     else:
@@ -199,62 +291,239 @@ def payslip_bulk_generate(request):
         'active_count': Employee.objects.filter(is_active=True).count()
     })
 
+@finance_required(allow_admin=False)
+def payslip_bulk_adjust(request):
+    """Apply uploaded allowances and deductions to a period's pending payslips"""
+    errors = []
+    if request.method == 'POST':
+        form = BulkAdjustmentForm(request.POST, request.FILES)
+        if form.is_valid():
+            uploaded = form.cleaned_data['file']
+            suffix = os.path.splitext(uploaded.name)[1].lower()
+            with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as handle:
+                for chunk in uploaded.chunks():
+                    handle.write(chunk)
+            try:
+                batch = validate_adjustments(handle.name, form.cleaned_data['month_year'])
+                if batch.is_valid:
+                    updated = apply_adjustments(batch, request.user, form.cleaned_data['reason'])
+            except (OSError, ValueError, KeyError, DatabaseError) as e:
+                messages.error(request, f'Error applying adjustments: {str(e)}')
+                batch = None
+            finally:
+                os.remove(handle.name)
+
+            if batch is not None and batch.is_valid:
+                messages.success(
+                    request,
+                    f'Applied {batch.row_count} adjustment rows to {updated} payslips for {batch.month_year}.'
+                )
+                return redirect('payroll:payslip_approve_list')
+            if batch is not None:
+                errors = batch.errors
+                messages.error(request, f'No adjustments applied: {len(errors)} problem(s) found in the file.')
+    else:
+        form = BulkAdjustmentForm()
+
+    return render(request, 'payroll/payslip_bulk_adjust.html', {
+        'form': form,
+        'errors': errors[:ADJUSTMENT_ERRORS_SHOWN],
+        'hidden_error_count': max(len(errors) - ADJUSTMENT_ERRORS_SHOWN, 0),
+    })
+
 @finance_required(allow_admin=True)
 def payslip_approve_list(request):
     """List all pending payslips for approval"""
     selected_month = request.GET.get('month', '').strip()
     selected_year = request.GET.get('year', '').strip()
+    selected_department = request.GET.get('department', '').strip()
+    variance_only = request.GET.get('variance') == '1'
 
-    pending_payslips = Payslip.objects.filter(approval_status='pending').select_related('employee', 'generated_by')
-    all_payslips = Payslip.objects.select_related('employee', 'approved_by').order_by('-generated_at')
+    filtered = approval_queryset(selected_month, selected_year, selected_department)
+    pending_payslips = filtered.filter(approval_status='pending')
+    leased_elsewhere_count = pending_payslips.filter(leased_by_others(request.user)).count()
+    pending_payslips = pending_payslips.exclude(leased_by_others(request.user)).select_related('employee', 'generated_by')
+    pending_total = pending_payslips.count()
+    my_leases = active_leases(request.user).select_related('payslip__employee').order_by('payslip_id')
+    all_payslips = filtered.select_related('employee', 'approved_by')
 
-    if selected_month:
-        pending_payslips = pending_payslips.filter(month_year__startswith=selected_month)
-        all_payslips = all_payslips.filter(month_year__startswith=selected_month)
-    if selected_year:
-        pending_payslips = pending_payslips.filter(month_year__endswith=selected_year)
-        all_payslips = all_payslips.filter(month_year__endswith=selected_year)
+    # Variance filter: only payslips that changed noticeably against the month before.
+    variance_period = f"{selected_month}-{selected_year}" if selected_month and selected_year else ''
+    variance_flags = {}
+    separations = []
+    if variance_only and variance_period:
+        for row in variance_exceptions(variance_period, selected_department):
+            if row['month_year'] == variance_period:
+                variance_flags[row['id']] = row['flag_labels']
+            else:
+                separations.append(row)
+        pending_payslips = pending_payslips.filter(id__in=list(variance_flags))
+        all_payslips = all_payslips.filter(id__in=list(variance_flags))
 
     _, month_options, year_options = build_month_year_filters(
         Payslip.objects.values_list('month_year', flat=True).distinct()
     )
+    department_options = (
+        Payslip.objects.exclude(department='').values_list('department', flat=True).distinct().order_by('department')
+    )
     
     pending_payslips = Paginator(pending_payslips.order_by('-generated_at'), 15).get_page(request.GET.get('pending_page'))
     all_payslips = Paginator(all_payslips.order_by('-generated_at'), 15).get_page(request.GET.get('recent_page'))
+    for payslip in pending_payslips:
+        payslip.variance_labels = variance_flags.get(payslip.id, [])
 
     context = {
         'pending_payslips': pending_payslips,
         'all_payslips': all_payslips,
         'month_options': month_options,
         'year_options': year_options,
+        'department_options': department_options,
         'selected_month': selected_month,
         'selected_year': selected_year,
+        'selected_department': selected_department,
+        'variance_only': variance_only,
+        'variance_period': variance_period,
+        'variance_previous': previous_month_year(variance_period) if variance_period else '',
+        'variance_count': len(variance_flags),
+        'separations': separations,
+        'pending_total': pending_total,
+        'processed_count': filtered.filter(approval_status__in=['approved', 'rejected']).count(),
+        'my_leases': my_leases,
+        'leased_elsewhere_count': leased_elsewhere_count,
+        'lease_batch_size': LEASE_BATCH_SIZE,
         'can_act_on_approvals': request.user.is_finance(),
     }
     return render(request, 'payroll/payslip_approve_list.html', context)
 
+def _approval_filters(request):
+    """Approval list filters posted back from the list, and the list URL they map to."""
+    month = (request.POST.get('month') or '').strip()
+    year = (request.POST.get('year') or '').strip()
+    department = (request.POST.get('department') or '').strip()
+    filters = urlencode({'month': month, 'year': year, 'department': department})
+    return (month, year, department), f"{reverse('payroll:payslip_approve_list')}?{filters}"
+
+@finance_required(allow_admin=False)
+def payslip_claim_batch(request):
+    """Lease the next batch of pending payslips matching the filter to the current user"""
+    filters, list_url = _approval_filters(request)
+    if request.method != 'POST':
+        return redirect(list_url)
+
+    leases = claim_batch(request.user, approval_queryset(*filters))
+    count = leases.count()
+    if count:
+        messages.success(request, f'You have {count} payslips reserved for review.')
+    else:
+        messages.info(request, 'No unclaimed pending payslips matched the current filter.')
+    return redirect(list_url)
+
+@finance_required(allow_admin=False)
+def payslip_release_batch(request):
+    """Release every payslip the current user has reserved"""
+    _, list_url = _approval_filters(request)
+    if request.method == 'POST':
+        released = release_leases(request.user)
+        messages.info(request, f'Released {released} payslips back to the queue.')
+    return redirect(list_url)
+
+MISSING_VERSION_MESSAGE = "The payslip version is missing; reload the page and try again."
+
+def _expected_version(request):
+    """Version the user's page was rendered from, or None if the form did not send one."""
+    try:
+        return int(request.POST['version'])
+    except (KeyError, ValueError):
+        return None
+
+def _conflict_message(request, payslip):
+    messages.error(
+        request,
+        f'Payslip for {payslip.employee.name} was changed by someone else while you were working on it. '
+        'Review the latest version and try again.'
+    )
+
+def _transition_single(request, payslip, expected_version, action, **changes):
+    """
+    Move one payslip through an approval transition unless another approver
+    holds it, and record the audit entry bulk_transition would write.
+
+    The update is a compare-and-swap on the payslip version, so a payslip
+    changed or processed by someone else is reported instead of silently
+    overwritten.
+    """
+    (from_status,), to_status = TRANSITIONS[action]
+    if payslip.approval_status != from_status:
+        messages.error(request, f'Payslip for {payslip.employee.name} was already processed.')
+        return False
+    # The lease check is part of the guarded UPDATE, so a lease taken after
+    # the page was loaded still wins.
+    swapped = compare_and_swap(
+        payslip.id, expected_version, [from_status], unless=leased_by_others(request.user),
+        approval_status=to_status, status_config=status_config_for(to_status),
+        last_modified_by=request.user, last_modified_at=timezone.now(), **changes
+    )
+    if not swapped:
+        holder = lease_holder(payslip.id, request.user)
+        if holder is not None:
+            messages.error(
+                request,
+                f'Payslip for {payslip.employee.name} is being reviewed by '
+                f'{holder.get_full_name() or holder.username}.'
+            )
+        else:
+            _conflict_message(request, payslip)
+        return False
+    PayslipAudit.objects.create(
+        payslip=payslip,
+        action=action,
+        old_status=from_status,
+        new_status=to_status,
+        performed_by=request.user,
+    )
+    release_leases(request.user, [payslip.id])
+    return True
+
 @finance_required(allow_admin=False)
 def payslip_approve(request, payslip_id):
     """Approve a specific payslip"""
     payslip = get_object_or_404(Payslip, id=payslip_id)
-    
-    payslip.approval_status = 'approved'
-    payslip.approved_by = request.user
-    payslip.approved_at = timezone.now()
-    payslip.save()
-    
-    messages.success(request, f'Payslip for {payslip.employee.name} approved.')
+    if request.method != 'POST':
+        messages.error(request, "Invalid request.")
+        return redirect('payroll:payslip_approve_list')
+    expected_version = _expected_version(request)
+    if expected_version is None:
+        return HttpResponseBadRequest(MISSING_VERSION_MESSAGE)
+
+    # Status change, audit entry, ledger entry and render job commit together, as in bulk_transition.
+    with transaction.atomic():
+        approved = _transition_single(
+            request, payslip, expected_version, 'approve',
+            approved_by=request.user,
+            approved_at=timezone.now(),
+        )
+        if approved:
+            add_to_ytd([payslip.id])
+            enqueue_pdf_renders([payslip.id])
+    if approved:
+        messages.success(request, f'Payslip for {payslip.employee.name} approved.')
     return redirect('payroll:payslip_approve_list')
 
 @finance_required(allow_admin=False)
 def payslip_reject(request, payslip_id):
     """Reject a specific payslip"""
     payslip = get_object_or_404(Payslip, id=payslip_id)
-    
-    payslip.approval_status = 'rejected'
-    payslip.save()
-    
-    messages.warning(request, f'Payslip for {payslip.employee.name} rejected.')
+    if request.method != 'POST':
+        messages.error(request, "Invalid request.")
+        return redirect('payroll:payslip_approve_list')
+    expected_version = _expected_version(request)
+    if expected_version is None:
+        return HttpResponseBadRequest(MISSING_VERSION_MESSAGE)
+
+    with transaction.atomic():
+        rejected = _transition_single(request, payslip, expected_version, 'reject')
+    if rejected:
+        messages.warning(request, f'Payslip for {payslip.employee.name} rejected.')
     return redirect('payroll:payslip_approve_list')
 
 @finance_required(allow_admin=False)
@@ -266,10 +535,18 @@ def payslip_revert_to_pending(request, payslip_id):
         messages.error(request, "Invalid request.")
         return redirect('payroll:payslip_view', payslip_id=payslip.id)
 
+    expected_version = _expected_version(request)
+    if expected_version is None:
+        return HttpResponseBadRequest(MISSING_VERSION_MESSAGE)
+
     if payslip.approval_status == 'pending':
         messages.info(request, f'Payslip for {payslip.employee.name} is already pending.')
         return redirect('payroll:payslip_view', payslip_id=payslip.id)
 
+    refused = _refuse_if_final(request, payslip)
+    if refused:
+        return refused
+
     reason_choice = (request.POST.get('reason_choice') or '').strip()
     reason_details = (request.POST.get('reason_details') or '').strip()
     reason = reason_choice
@@ -280,20 +557,31 @@ def payslip_revert_to_pending(request, payslip_id):
         return redirect('payroll:payslip_view', payslip_id=payslip.id)
 
     old_status = payslip.approval_status
-    payslip.approval_status = 'pending'
-    payslip.approved_by = None
-    payslip.approved_at = None
-    payslip.last_modified_by = request.user
-    payslip.save()
-
-    PayslipAudit.objects.create(
-        payslip=payslip,
-        action='revert',
-        old_status=old_status,
-        new_status='pending',
-        reason=reason,
-        performed_by=request.user,
-    )
+    # The status change, its ledger delta and its audit entry commit together.
+    with transaction.atomic():
+        swapped = compare_and_swap(
+            payslip.id, expected_version, ['approved', 'rejected'],
+            approval_status='pending',
+            status_config=status_config_for('pending'),
+            approved_by=None,
+            approved_at=None,
+            last_modified_by=request.user,
+            last_modified_at=timezone.now(),
+        )
+        if swapped:
+            if old_status == 'approved':
+                remove_from_ytd([payslip.id])
+            PayslipAudit.objects.create(
+                payslip=payslip,
+                action='revert',
+                old_status=old_status,
+                new_status='pending',
+                reason=reason,
+                performed_by=request.user,
+            )
+    if not swapped:
+        _conflict_message(request, payslip)
+        return redirect('payroll:payslip_view', payslip_id=payslip.id)
 
     messages.success(request, f'Payslip for {payslip.employee.name} reverted to pending.')
     return redirect('payroll:payslip_view', payslip_id=payslip.id)
@@ -304,18 +592,48 @@ def payslip_bulk_approve(request):
     if request.method == 'POST':
         payslip_ids = request.POST.getlist('payslip_ids')
         if payslip_ids:
-            approved_at = timezone.now()
-            Payslip.objects.filter(id__in=payslip_ids).update(
-                approval_status='approved',
-                approved_by=request.user,
-                approved_at=approved_at
-            )
-            messages.success(request, f'{len(payslip_ids)} payslips approved successfully.')
+            queryset = Payslip.objects.filter(id__in=payslip_ids).exclude(leased_by_others(request.user))
+            result = bulk_transition(queryset, 'approve', request.user)
+            messages.success(request, f'{result.updated} payslips approved successfully.')
         else:
             messages.info(request, 'No payslips selected.')
     return redirect('payroll:payslip_approve_list')
 
+@finance_required(allow_admin=False)
+def payslip_bulk_transition(request, action):
+    """Approve, reject or revert every payslip matching the approval list filters"""
+    if request.method != 'POST' or action not in TRANSITIONS:
+        messages.error(request, "Invalid request.")
+        return redirect('payroll:payslip_approve_list')
+
+    filters, list_url = _approval_filters(request)
+    reason = (request.POST.get('reason') or '').strip()
+    if action == 'revert' and not reason:
+        messages.error(request, "Revert reason is required.")
+        return redirect(list_url)
+
+    queryset = approval_queryset(*filters).exclude(month_year__in=PayrollPeriod.final_month_years())
+    if request.POST.get('scope') == 'mine':
+        queryset = queryset.filter(id__in=active_leases(request.user).values('payslip_id'))
+    elif action != 'revert':
+        # Leave payslips reserved by other approvers to them.
+        queryset = queryset.exclude(leased_by_others(request.user))
+
+    try:
+        result = bulk_transition(queryset, action, request.user, reason)
+    except DatabaseError as e:
+        messages.error(request, f'Error updating payslips: {str(e)}')
+        return redirect(list_url)
+
+    past_tense = {'approve': 'approved', 'reject': 'rejected', 'revert': 'reverted to pending'}[action]
+    if result.updated:
+        messages.success(request, f'{result.updated} payslips {past_tense}.')
+    else:
+        messages.info(request, 'No payslips matched the current filter.')
+    return redirect(list_url)
+
 @staff_or_admin_required
+@condition(etag_func=_payslip_page_etag, last_modified_func=_payslip_page_last_modified)
 def payslip_view(request, payslip_id):
     """View details of a payslip"""
     payslip = get_object_or_404(Payslip, id=payslip_id)
@@ -374,10 +692,12 @@ def payslip_view(request, payslip_id):
 
     config = SystemConfiguration.get_settings()
     snapshot = _resolved_snapshot(payslip)
-    return render(request, 'payroll/payslip_view.html', {
+    response = render(request, 'payroll/payslip_view.html', {
         'payslip': payslip,
         'config': config,
         'snapshot': snapshot,
+        'line_items': payslip.line_items.all(),
+        'ytd': employee_ytd(payslip.employee_id, payslip.month_year),
         'employee_options': employee_options,
         'month_options': month_options,
         'year_options': year_options,
@@ -385,9 +705,24 @@ def payslip_view(request, payslip_id):
         'selected_month': selected_month,
         'selected_year': selected_year,
     })
+    # An authenticated page: the browser must revalidate rather than guess a lifetime from Last-Modified.
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def _cache_final_pdf(response, period):
+    """
+    PDFs of locked periods never change, so the browser may keep them.
+    Anything else, including closed periods that can still be reopened, is
+    revalidated against the ETag on every use.
+    """
+    if period is not None and period.status == 'locked':
+        patch_cache_control(response, private=True, max_age=FINAL_PDF_MAX_AGE, immutable=True)
+    else:
+        patch_cache_control(response, private=True, no_cache=True)
 
 @staff_or_admin_required
 @xframe_options_sameorigin
+@condition(etag_func=_payslip_pdf_etag, last_modified_func=_payslip_last_modified)
 def payslip_preview_pdf(request, payslip_id):
     """Preview payslip PDF in browser"""
     payslip = get_object_or_404(Payslip, id=payslip_id)
@@ -402,16 +737,18 @@ def payslip_preview_pdf(request, payslip_id):
             return redirect(settings.LOGIN_REDIRECT_URL)
             
     try:
-        filepath, filename = generate_payslip_pdf(payslip)
+        period = PayrollPeriod.objects.filter(month_year=payslip.month_year).first()
+        filepath, filename = get_payslip_pdf(payslip, period)
         
-        response = FileResponse(open(filepath, 'rb'), content_type='application/pdf')
-        response['Content-Disposition'] = f'inline; filename="{filename}"'
+        response = pdf_file_response(filepath, filename)
+        _cache_final_pdf(response, period)
         return response
     except (OSError, ValueError, TypeError) as e:
         messages.error(request, f'Error generating PDF: {str(e)}')
         return redirect('payroll:payslip_view', payslip_id=payslip_id)
 
 @staff_or_admin_required
+@condition(etag_func=_payslip_pdf_etag, last_modified_func=_payslip_last_modified)
 def payslip_download_pdf(request, payslip_id):
     """Download payslip PDF"""
     payslip = get_object_or_404(Payslip, id=payslip_id)
@@ -423,12 +760,39 @@ def payslip_download_pdf(request, payslip_id):
             return redirect(settings.LOGIN_REDIRECT_URL)
 
     try:
-        filepath, filename = generate_payslip_pdf(payslip)
-        return FileResponse(open(filepath, 'rb'), as_attachment=True, filename=filename)
+        period = PayrollPeriod.objects.filter(month_year=payslip.month_year).first()
+        filepath, filename = get_payslip_pdf(payslip, period)
+        response = pdf_file_response(filepath, filename, as_attachment=True)
+        _cache_final_pdf(response, period)
+        return response
     except (OSError, ValueError, TypeError) as e:
         messages.error(request, f'Error: {str(e)}')
         return redirect('payroll:payslip_view', payslip_id=payslip_id)
 
+@xframe_options_sameorigin
+def payslip_signed_pdf(request, token, as_attachment=False):
+    """
+    Serve a cached payslip PDF from a signed link issued on the staff
+    dashboard. The signature stands in for login and permission checks; a
+    link whose payslip has since been reverted or edited is refused, and a
+    PDF that is missing, stale or rendered from another version falls back
+    to the regular authenticated view, which renders it.
+    """
+    try:
+        payload = read_pdf_token(token)
+    except signing.BadSignature:
+        raise Http404("This payslip link is invalid or has expired.")
+    if not pdf_link_is_current(payload):
+        raise Http404("This payslip has changed since the link was issued.")
+
+    filepath = cached_pdf_for(payload)
+    if filepath is None:
+        fallback = 'payroll:payslip_download_pdf' if as_attachment else 'payroll:payslip_preview_pdf'
+        return redirect(fallback, payslip_id=payload['id'])
+    response = pdf_file_response(filepath, payload['name'], as_attachment=as_attachment)
+    patch_cache_control(response, private=True, max_age=pdf_link_max_age())
+    return response
+
 @finance_required(allow_admin=False)
 def payslip_edit(request, payslip_id):
     """Edit a payslip"""
@@ -438,8 +802,14 @@ def payslip_edit(request, payslip_id):
     if payslip.approval_status != 'pending' and not (request.user.is_admin() or request.user.is_finance()):
         messages.error(request, "Cannot edit processed payslips.")
         return redirect('payroll:payslip_approve_list')
+    refused = _refuse_if_final(request, payslip)
+    if refused:
+        return refused
         
     if request.method == 'POST':
+        expected_version = _expected_version(request)
+        if expected_version is None:
+            return HttpResponseBadRequest(MISSING_VERSION_MESSAGE)
         reason_choice = (request.POST.get('edit_reason_choice') or '').strip()
         reason_details = (request.POST.get('edit_reason_details') or '').strip()
         reason = reason_choice
@@ -451,36 +821,58 @@ def payslip_edit(request, payslip_id):
 
         old_status = payslip.approval_status
         # Simple update logic matching the template's fields
-        payslip.department = request.POST.get('department', payslip.department)
-        payslip.unit = request.POST.get('unit', payslip.unit)
-        payslip.basic_salary = Decimal(request.POST.get('basic_salary', payslip.basic_salary))
-        payslip.allowances = Decimal(request.POST.get('allowances', payslip.allowances))
-        payslip.ssnit_deduction = Decimal(request.POST.get('ssnit_deduction', payslip.ssnit_deduction))
-        payslip.tier2_deduction = Decimal(request.POST.get('tier2_deduction', payslip.tier2_deduction))
-        payslip.income_tax = Decimal(request.POST.get('income_tax', payslip.income_tax))
-        payslip.other_deductions = Decimal(request.POST.get('other_deductions', payslip.other_deductions))
+        submitted = {
+            'department': request.POST.get('department', payslip.department),
+            'unit': request.POST.get('unit', payslip.unit),
+        }
+        for name in EDITABLE_AMOUNT_FIELDS:
+            submitted[name] = Decimal(request.POST.get(name, getattr(payslip, name)))
         
         # Recalculate Net
-        payslip.gross_salary = payslip.basic_salary + payslip.allowances
-        payslip.net_salary = payslip.gross_salary - (payslip.ssnit_deduction + payslip.tier2_deduction + payslip.income_tax + payslip.other_deductions)
+        submitted['gross_salary'] = submitted['basic_salary'] + submitted['allowances']
+        submitted['net_salary'] = submitted['gross_salary'] - (
+            submitted['ssnit_deduction'] + submitted['tier2_deduction']
+            + submitted['income_tax'] + submitted['other_deductions']
+        )
+        changes = {name: value for name, value in submitted.items() if getattr(payslip, name) != value}
+        if not changes:
+            messages.info(request, "No changes to save.")
+            return redirect('payroll:payslip_view', payslip_id=payslip.id)
         
         # If it was approved/rejected, revert to pending after changes
         if payslip.approval_status in ['approved', 'rejected']:
-            payslip.approval_status = 'pending'
-            payslip.approved_by = None
-            payslip.approved_at = None
-
-        payslip.last_modified_by = request.user
-        payslip.save()
-
-        PayslipAudit.objects.create(
-            payslip=payslip,
-            action='edit',
-            old_status=old_status,
-            new_status=payslip.approval_status,
-            reason=reason,
-            performed_by=request.user,
-        )
+            changes.update(
+                approval_status='pending',
+                status_config=status_config_for('pending'),
+                approved_by=None,
+                approved_at=None,
+            )
+
+        # The edit, its ledger delta and its audit entry commit together.
+        with transaction.atomic():
+            swapped = compare_and_swap(
+                payslip.id, expected_version,
+                last_modified_by=request.user, last_modified_at=timezone.now(), **changes
+            )
+            if swapped:
+                if old_status == 'approved':
+                    # ``payslip`` still holds the amounts the ledger counted.
+                    apply_ytd([payslip_totals(payslip)], -1)
+                PayslipAudit.objects.create(
+                    payslip=payslip,
+                    action='edit',
+                    old_status=old_status,
+                    new_status=changes.get('approval_status', old_status),
+                    reason=reason,
+                    performed_by=request.user,
+                )
+        if not swapped:
+            _conflict_message(request, payslip)
+            payslip.refresh_from_db()
+            return render(request, 'payroll/payslip_edit.html', {
+                'payslip': payslip,
+                'snapshot': _resolved_snapshot(payslip),
+            }, status=409)
         messages.success(request, f"Payslip for {payslip.employee.name} updated.")
         return redirect('payroll:payslip_view', payslip_id=payslip.id)
 
@@ -490,10 +882,111 @@ def payslip_edit(request, payslip_id):
 @admin_required
 def payslip_delete(request, payslip_id):
     payslip = get_object_or_404(Payslip, id=payslip_id)
-    payslip.delete()
+    refused = _refuse_if_final(request, payslip)
+    if refused:
+        return refused
+    with transaction.atomic():
+        if payslip.approval_status == 'approved':
+            remove_from_ytd([payslip.id])
+        payslip.delete()
     messages.success(request, 'Payslip deleted.')
     return redirect('payroll:payslip_approve_list')
 
+@finance_required(allow_admin=True)
+def payroll_periods(request):
+    """List pay periods with their payslip counts and close/lock state"""
+    counts = (
+        Payslip.objects.values('month_year')
+        .annotate(
+            total=Count('id'),
+            pending=Count('id', filter=Q(approval_status='pending')),
+            approved=Count('id', filter=Q(approval_status='approved')),
+            net_total=Sum('net_salary'),
+        )
+        .order_by()
+    )
+    periods = {p.month_year: p for p in PayrollPeriod.objects.select_related('closed_by', 'locked_by')}
+    rows = []
+    for row in counts:
+        row['period'] = periods.get(row['month_year'])
+        row['status'] = row['period'].status if row['period'] else 'open'
+        rows.append(row)
+    rows.sort(key=lambda row: parse_month_year(row['month_year']) or datetime.min, reverse=True)
+    return render(request, 'payroll/payroll_periods.html', {
+        'rows': rows,
+        'can_manage_periods': request.user.is_finance() or request.user.is_admin(),
+    })
+
+@finance_required(allow_admin=True)
+def payroll_register(request, month_year, fmt):
+    """Download the period's payroll register as XLSX or PDF"""
+    writer = REGISTER_WRITERS.get(fmt)
+    if writer is None or parse_month_year(month_year) is None:
+        raise Http404("Unknown register format or period.")
+
+    # Spooled to disk and streamed back, so large periods never sit in memory.
+    handle = tempfile.TemporaryFile()
+    try:
+        writer(month_year, handle)
+    except DatabaseError as e:
+        handle.close()
+        messages.error(request, f'Could not build the {month_year} register: {str(e)}')
+        return redirect('payroll:payroll_periods')
+    handle.seek(0)
+    return FileResponse(handle, as_attachment=True, filename=register_filename(month_year, fmt))
+
+@finance_required(allow_admin=True)
+def bank_payment_file(request, month_year, fmt):
+    """Stream the bank transfer list for a period's approved payslips"""
+    if fmt not in BANK_FILE_FORMATS or parse_month_year(month_year) is None:
+        raise Http404("Unknown bank file format or period.")
+
+    lines, content_type = BANK_FILE_FORMATS[fmt]
+    response = StreamingHttpResponse(lines(month_year), content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{bank_file_name(month_year, fmt)}"'
+    return response
+
+@finance_required(allow_admin=True)
+def statutory_schedule(request, month_year, kind, fmt):
+    """Download the SSNIT, Tier 2 or PAYE schedule of a period"""
+    if kind not in SCHEDULES or fmt not in SCHEDULE_FORMATS or parse_month_year(month_year) is None:
+        raise Http404("Unknown schedule, format or period.")
+
+    filename = schedule_filename(month_year, kind, fmt)
+    content_type = SCHEDULE_FORMATS[fmt]
+    # Closed periods no longer change: their schedules are written once and served from disk.
+    filepath = cached_schedule(month_year, kind, fmt)
+    if filepath is not None:
+        return pdf_file_response(filepath, filename, as_attachment=True, content_type=content_type)
+
+    if fmt == 'csv':
+        response = StreamingHttpResponse(schedule_csv_lines(month_year, kind), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+    handle = tempfile.TemporaryFile()
+    write_schedule_xlsx(month_year, kind, handle)
+    handle.seek(0)
+    return FileResponse(handle, as_attachment=True, filename=filename, content_type=content_type)
+
+@finance_required(allow_admin=True)
+def payroll_period_action(request, month_year, action):
+    """Close, lock or reopen a pay period"""
+    handlers = {'close': close_period, 'lock': lock_period, 'reopen': reopen_period}
+    if request.method != 'POST' or action not in handlers:
+        messages.error(request, "Invalid request.")
+        return redirect('payroll:payroll_periods')
+
+    try:
+        period = handlers[action](month_year, request.user)
+    except (ValueError, DatabaseError) as e:
+        messages.error(request, f'Could not {action} {month_year}: {str(e)}')
+        return redirect('payroll:payroll_periods')
+
+    messages.success(request, f'{month_year} is now {period.get_status_display().lower()}.')
+    if action == 'close':
+        messages.info(request, f'Payslip PDFs for {month_year} have been queued for rendering.')
+    return redirect('payroll:payroll_periods')
+
 @admin_required
 def system_settings(request):
     """View to manage global system configuration"""
@@ -508,4 +1001,38 @@ def system_settings(request):
     else:
         form = SystemConfigurationForm(instance=config)
     
-    return render(request, 'payroll/system_settings.html', {'form': form, 'config': config})
+    return render(request, 'payroll/system_settings.html', {
+        'form': form,
+        'config': config,
+        'recompute_form': PayslipRecomputeForm(),
+    })
+
+@admin_required
+def payslip_recompute(request):
+    """Recompute unapproved payslips with the current rates"""
+    if request.method != 'POST':
+        return redirect('payroll:system_settings')
+
+    form = PayslipRecomputeForm(request.POST)
+    if not form.is_valid():
+        messages.error(request, "Invalid recompute request.")
+        return redirect('payroll:system_settings')
+
+    month_year = form.cleaned_data['month_year']
+    try:
+        summary = recompute_payslips(request.user, month_year=month_year, statuses=form.cleaned_data['status'])
+    except DatabaseError as e:
+        messages.error(request, f'Error recomputing payslips: {str(e)}')
+        return redirect('payroll:system_settings')
+
+    scope = month_year or 'all periods'
+    messages.success(
+        request,
+        f'Recomputed {summary.examined} payslips for {scope}: {summary.changed} changed, '
+        f'net pay change GHS {summary.net_change:,.2f}.'
+    )
+    if summary.skipped:
+        messages.warning(
+            request, f'Skipped {summary.skipped} payslips changed by someone else while recomputing; run it again.'
+        )
+    return redirect('payroll:system_settings')
@@ -0,0 +1,150 @@
+"""
+Incremental year-to-date totals per employee
+
+EmployeeYTD holds the sums of each employee's approved payslips for a tax
+year. A payslip counts while it is approved, so only the changes that move
+a payslip into or out of that state (approve, revert, editing or deleting
+an approved payslip) touch the ledger, each applying its own delta.
+"""
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from payslip.date_utils import parse_month_year
+from .models import EmployeeYTD, Payslip
+
+YTD_FIELDS = ['basic_salary', 'gross_salary', 'ssnit_deduction', 'tier2_deduction', 'income_tax', 'net_salary']
+YTD_BATCH_SIZE = 1000
+
+
+def tax_year_of(month_year):
+    period = parse_month_year(month_year)
+    return period.year if period else None
+
+
+def _payslip_totals(payslip_ids):
+    """Amounts of the given payslips summed per employee and month."""
+    return (
+        Payslip.objects.filter(id__in=payslip_ids)
+        .values('employee_id', 'month_year')
+        .annotate(payslip_count=Count('id'), **{field: Sum(field) for field in YTD_FIELDS})
+        .order_by()
+    )
+
+
+def payslip_totals(payslip):
+    """The amounts one in-memory payslip contributes, e.g. before an edit replaces them."""
+    totals = {field: getattr(payslip, field) for field in YTD_FIELDS}
+    totals.update(employee_id=payslip.employee_id, month_year=payslip.month_year, payslip_count=1)
+    return totals
+
+
+def apply_ytd(totals, sign=1):
+    """
+    Add (``sign=1``) or remove (``sign=-1``) payslip totals from the ledger.
+
+    Deltas are merged per employee and tax year; the affected rows are
+    created if missing, locked, and written back with one upsert per chunk.
+    """
+    deltas = defaultdict(lambda: defaultdict(Decimal))
+    for row in totals:
+        tax_year = tax_year_of(row['month_year'])
+        if tax_year is None:
+            continue
+        delta = deltas[(row['employee_id'], tax_year)]
+        for field in ['payslip_count', *YTD_FIELDS]:
+            delta[field] += sign * (row[field] or 0)
+    if not deltas:
+        return 0
+
+    keys = list(deltas)
+    now = timezone.now()
+    # MySQL upserts on any unique key and rejects an explicit conflict target.
+    unique_fields = ['employee', 'tax_year'] if connection.features.supports_update_conflicts_with_target else None
+    with transaction.atomic():
+        for start in range(0, len(keys), YTD_BATCH_SIZE):
+            chunk = keys[start:start + YTD_BATCH_SIZE]
+            # Make sure every row exists, then lock them so concurrent deltas queue up.
+            EmployeeYTD.objects.bulk_create(
+                [EmployeeYTD(employee_id=employee_id, tax_year=tax_year) for employee_id, tax_year in chunk],
+                ignore_conflicts=True,
+            )
+            current = EmployeeYTD.objects.select_for_update().filter(
+                employee_id__in={employee_id for employee_id, _ in chunk},
+                tax_year__in={tax_year for _, tax_year in chunk},
+            ).values('employee_id', 'tax_year', 'payslip_count', *YTD_FIELDS)
+            updated = []
+            for row in current:
+                delta = deltas.get((row['employee_id'], row['tax_year']))
+                if delta is None:
+                    continue
+                row['payslip_count'] += int(delta['payslip_count'])
+                for field in YTD_FIELDS:
+                    row[field] += delta[field]
+                updated.append(EmployeeYTD(updated_at=now, **row))
+            # One INSERT ... ON CONFLICT/DUPLICATE KEY UPDATE instead of a per-row CASE update.
+            EmployeeYTD.objects.bulk_create(
+                updated,
+                update_conflicts=True,
+                unique_fields=unique_fields,
+                update_fields=['payslip_count', *YTD_FIELDS, 'updated_at'],
+            )
+    return len(deltas)
+
+
+def add_to_ytd(payslip_ids):
+    """Count newly approved payslips."""
+    return apply_ytd(_payslip_totals(payslip_ids), 1)
+
+
+def remove_from_ytd(payslip_ids):
+    """Stop counting payslips that are leaving the approved state (read before they change)."""
+    return apply_ytd(_payslip_totals(payslip_ids), -1)
+
+
+def employee_ytd(employee_id, month_year):
+    """The employee's ledger row for the tax year of ``month_year``, or None."""
+    return EmployeeYTD.objects.filter(employee_id=employee_id, tax_year=tax_year_of(month_year)).first()
+
+
+def rebuild_ytd(tax_year=None, batch_size=YTD_BATCH_SIZE):
+    """
+    Recompute the ledger from approved payslips, for one tax year or all.
+
+    Each year is summed per employee by the database, streamed, and written
+    with chunked ``bulk_create`` after the year's old rows are removed.
+    Returns the number of rows written.
+    """
+    if tax_year is not None:
+        years = {tax_year}
+    else:
+        month_years = Payslip.objects.values_list('month_year', flat=True).distinct().order_by()
+        years = {tax_year_of(month_year) for month_year in month_years} - {None}
+        # Rows for years that no longer have approved payslips are stale too.
+        years |= set(EmployeeYTD.objects.values_list('tax_year', flat=True).distinct().order_by())
+
+    written = 0
+    now = timezone.now()
+    for year in sorted(years):
+        totals = (
+            Payslip.objects.filter(approval_status='approved', month_year__endswith=f'-{year}')
+            .values('employee_id')
+            .annotate(payslip_count=Count('id'), **{field: Sum(field) for field in YTD_FIELDS})
+            .order_by('employee_id')
+            .iterator(chunk_size=batch_size)
+        )
+        with transaction.atomic():
+            EmployeeYTD.objects.filter(tax_year=year).delete()
+            batch = []
+            for row in totals:
+                batch.append(EmployeeYTD(tax_year=year, updated_at=now, **row))
+                if len(batch) >= batch_size:
+                    EmployeeYTD.objects.bulk_create(batch)
+                    written += len(batch)
+                    batch = []
+            EmployeeYTD.objects.bulk_create(batch)
+            written += len(batch)
+    return written
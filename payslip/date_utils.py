@@ -1,4 +1,4 @@
-from datetime import datetime
+from datetime import date, datetime
 
 MONTH_YEAR_FORMAT = "%b-%Y"
 
@@ -10,6 +10,27 @@ def parse_month_year(value):
         return None
 
 
+def month_year_range(start, end):
+    """All Mon-YYYY periods from start to end inclusive, oldest first."""
+    start_dt = parse_month_year(start)
+    end_dt = parse_month_year(end)
+    if not start_dt or not end_dt:
+        return []
+    periods = []
+    for index in range(start_dt.year * 12 + start_dt.month - 1, end_dt.year * 12 + end_dt.month):
+        periods.append(date(index // 12, index % 12 + 1, 1).strftime(MONTH_YEAR_FORMAT))
+    return periods
+
+
+def previous_month_year(value):
+    """The Mon-YYYY period before ``value``, or None if it does not parse."""
+    period = parse_month_year(value)
+    if not period:
+        return None
+    index = period.year * 12 + period.month - 2
+    return date(index // 12, index % 12 + 1, 1).strftime(MONTH_YEAR_FORMAT)
+
+
 def build_month_year_filters(period_values):
     parsed_periods = []
     for period in period_values:
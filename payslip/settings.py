@@ -136,6 +136,28 @@ STATIC_ROOT = BASE_DIR / 'staticfiles'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Uploaded employee import sheets and their error reports. Kept outside
+# MEDIA_ROOT, which is served publicly; reports are downloaded through the
+# import job views, which require an HR admin.
+IMPORT_ROOT = config('IMPORT_ROOT', default=str(BASE_DIR / 'private' / 'imports'))
+
+# How cached payslip PDFs are sent once permissions pass: 'django' streams
+# them from Python, 'nginx' returns X-Accel-Redirect to PDF_INTERNAL_URL
+# (an internal location aliased to MEDIA_ROOT), 'apache' returns X-Sendfile.
+PDF_SERVE_BACKEND = config('PDF_SERVE_BACKEND', default='django')
+PDF_INTERNAL_URL = config('PDF_INTERNAL_URL', default='/protected-media/')
+# Payslip PDF renderer: 'platypus' (flowable layout) or 'canvas' (same page
+# drawn with fixed coordinates, several times faster)
+PAYSLIP_PDF_RENDERER = config('PAYSLIP_PDF_RENDERER', default='platypus')
+# Lifetime in seconds of the signed PDF links on the staff dashboard
+PDF_LINK_MAX_AGE = config('PDF_LINK_MAX_AGE', default=3600, cast=int)
+# Month-over-month variance filter on the approvals page: a payslip is an
+# exception when its gross pay or total deductions moved by at least the
+# given percentage of last month's figure, and by at least the minimum amount
+VARIANCE_GROSS_CHANGE_PERCENT = config('VARIANCE_GROSS_CHANGE_PERCENT', default=10, cast=float)
+VARIANCE_DEDUCTION_CHANGE_PERCENT = config('VARIANCE_DEDUCTION_CHANGE_PERCENT', default=20, cast=float)
+VARIANCE_MIN_CHANGE_AMOUNT = config('VARIANCE_MIN_CHANGE_AMOUNT', default=50, cast=float)
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.0/ref/settings/#default-auto-field
 
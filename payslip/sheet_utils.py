@@ -0,0 +1,98 @@
+import csv
+import os
+
+CSV_EXTENSIONS = {'.csv'}
+XLSX_EXTENSIONS = {'.xlsx', '.xlsm'}
+
+
+def _normalize_cell(value):
+    """Map empty cells to None and strip surrounding whitespace from text."""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = value.strip()
+        return value or None
+    return value
+
+
+def _iter_csv_rows(path):
+    with open(path, newline='', encoding='utf-8-sig') as handle:
+        reader = csv.reader(handle)
+        headers = next(reader, None)
+        if headers is None:
+            return
+        headers = [str(h).strip() for h in headers]
+        for values in reader:
+            if not any(v.strip() for v in values):
+                continue
+            yield {h: _normalize_cell(v) for h, v in zip(headers, values)}
+
+
+def _iter_xlsx_rows(path):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(path, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        headers = next(rows, None)
+        if headers is None:
+            return
+        headers = ['' if h is None else str(h).strip() for h in headers]
+        for values in rows:
+            if all(v is None or (isinstance(v, str) and not v.strip()) for v in values):
+                continue
+            yield {h: _normalize_cell(v) for h, v in zip(headers, values) if h}
+    finally:
+        workbook.close()
+
+
+def _iter_legacy_excel_rows(path):
+    # openpyxl cannot read .xls; fall back to pandas for the legacy format.
+    import pandas as pd
+
+    df = pd.read_excel(path)
+    df.columns = [str(c).strip() for c in df.columns]
+    for record in df.to_dict('records'):
+        yield {k: (None if pd.isnull(v) else _normalize_cell(v)) for k, v in record.items()}
+
+
+def iter_sheet_rows(path):
+    """
+    Stream rows from a CSV or Excel file as dicts keyed by header.
+
+    Rows are read one at a time (openpyxl read-only mode for .xlsx), so large
+    sheets never need to be held in memory. Blank cells come back as None.
+    """
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext in CSV_EXTENSIONS:
+        return _iter_csv_rows(path)
+    if ext in XLSX_EXTENSIONS:
+        return _iter_xlsx_rows(path)
+    return _iter_legacy_excel_rows(path)
+
+
+def read_sheet_headers(path):
+    """Return the stripped header row of a CSV or Excel file."""
+    ext = os.path.splitext(str(path))[1].lower()
+    if ext in CSV_EXTENSIONS:
+        with open(path, newline='', encoding='utf-8-sig') as handle:
+            headers = next(csv.reader(handle), None) or []
+        return [str(h).strip() for h in headers]
+    if ext in XLSX_EXTENSIONS:
+        from openpyxl import load_workbook
+
+        workbook = load_workbook(path, read_only=True, data_only=True)
+        try:
+            headers = next(workbook.active.iter_rows(values_only=True), None) or []
+        finally:
+            workbook.close()
+        return [str(h).strip() for h in headers if h is not None]
+
+    import pandas as pd
+
+    return [str(c).strip() for c in pd.read_excel(path, nrows=0).columns]
+
+
+def count_sheet_rows(path):
+    """Count data rows without materializing the sheet."""
+    return sum(1 for _ in iter_sheet_rows(path))
@@ -1,5 +1,13 @@
 from django.contrib import admin
-from .models import Employee
+from .models import Employee, EmployeeSalary, ImportJob
+
+
+class EmployeeSalaryInline(admin.TabularInline):
+    """Inline for salary history within employee"""
+    model = EmployeeSalary
+    extra = 0
+    fields = ['effective_from', 'monthly_salary', 'created_by', 'created_at']
+    readonly_fields = ['created_at']
 
 
 @admin.register(Employee)
@@ -15,6 +23,7 @@ class EmployeeAdmin(admin.ModelAdmin):
     list_filter = ['is_active', 'position_config', 'status', 'department', 'gender']
     search_fields = ['staff_id', 'name', 'email', 'contact', 'ghana_card', 'ssnit_number']
     list_editable = ['is_active']
+    inlines = [EmployeeSalaryInline]
     
     fieldsets = (
         ('Identification', {
@@ -39,3 +48,14 @@ class EmployeeAdmin(admin.ModelAdmin):
             'fields': ('bank_name', 'bank_account', 'bank_branch')
         }),
     )
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    """Admin interface for background employee imports"""
+    list_display = [
+        'original_filename', 'status', 'rows_processed', 'total_rows',
+        'inserted_count', 'updated_count', 'unchanged_count', 'error_count', 'created_by', 'created_at', 'finished_at'
+    ]
+    list_filter = ['status']
+    readonly_fields = ['created_at', 'started_at', 'heartbeat_at', 'finished_at']
@@ -1,8 +1,17 @@
 from django import forms
 from .models import Employee
+from .salaries import current_period_start
 
 class EmployeeForm(forms.ModelForm):
     """Form for creating and editing employees"""
+    salary_effective_from = forms.DateField(
+        required=False,
+        label="Salary Effective From",
+        help_text="Date the salary takes effect (defaults to the hire date for a new employee, "
+                  "otherwise the start of this month)",
+        widget=forms.DateInput(attrs={'type': 'date', 'class': 'form-control'})
+    )
+
     class Meta:
         model = Employee
         exclude = ['separation_reason', 'separated_at', 'separated_by']
@@ -17,6 +26,9 @@ class EmployeeForm(forms.ModelForm):
         for field in self.fields:
             if 'class' not in self.fields[field].widget.attrs:
                 self.fields[field].widget.attrs.update({'class': 'form-control'})
+        if self.instance.pk:
+            # A new employee's salary starts at the hire date unless a date is given.
+            self.fields['salary_effective_from'].initial = current_period_start()
 
 class ImportEmployeeForm(forms.Form):
     """Form to import employees from Excel"""
@@ -25,6 +37,12 @@ class ImportEmployeeForm(forms.Form):
         help_text="Upload an Excel file (.xlsx) with employee data",
         widget=forms.FileInput(attrs={'class': 'form-control', 'accept': '.xlsx, .xls'})
     )
+    dry_run = forms.BooleanField(
+        required=False,
+        label="Validate only (dry run)",
+        help_text="Check the whole file and produce an error report without saving anything",
+        widget=forms.CheckboxInput(attrs={'class': 'form-check-input'})
+    )
     
     def clean_file(self):
         file = self.cleaned_data['file']
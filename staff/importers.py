@@ -0,0 +1,478 @@
+"""
+Employee import pipeline used by the background import worker
+"""
+import csv
+import hashlib
+import json
+import os
+import re
+from datetime import timedelta
+from decimal import Decimal, DecimalException
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.storage import FileSystemStorage
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from accounts.models import CustomUser
+from payslip.sheet_utils import iter_sheet_rows, count_sheet_rows, read_sheet_headers
+from .models import Employee, ImportJob
+from .salaries import record_salary_changes
+
+IMPORT_CHUNK_SIZE = 500
+# A running job whose heartbeat is older than this is assumed to have crashed.
+STALE_JOB_AFTER = timedelta(minutes=10)
+
+STAFF_ID_HEADERS = ['STAFF ID', 'staff_id', 'ID']
+ROLE_HEADERS = ['ROLE', 'role']
+NAME_HEADERS = ['Fullname', 'full_name', 'Name']
+STATION_HEADERS = ['STATION:', 'station_name', 'station']
+REGION_HEADERS = ['REGION:', 'region']
+PHONE_HEADERS = ['PHONE:', 'contact_number:', 'phone', 'contact']
+EMAIL_HEADERS = ['EMAIL:', 'email']
+GENDER_HEADERS = ['Gender', 'gender']
+SALARY_HEADERS = ['salary']
+GRADE_HEADERS = ['grade', 'Grade']
+LEVEL_HEADERS = ['level', 'Level']
+
+REQUIRED_HEADERS = {
+    'staff_id': STAFF_ID_HEADERS,
+    'name': NAME_HEADERS,
+}
+STAFF_ID_PATTERN = re.compile(r'^[A-Za-z0-9][A-Za-z0-9/_.\-]*$')
+STAFF_ID_MAX_LENGTH = Employee._meta.get_field('staff_id').max_length
+ERROR_REPORT_HEADERS = ['row', 'staff_id', 'field', 'error']
+
+
+def get_row_value(row, possibilities):
+    """Get value from row checking multiple possible header names"""
+    for p in possibilities:
+        if row.get(p) is not None:
+            return str(row[p]).strip()
+    # Also try case-insensitive match if direct match fails
+    row_keys_lower = {k.lower(): k for k in row.keys()}
+    for p in possibilities:
+        k = row_keys_lower.get(p.lower())
+        if k is not None and row[k] is not None:
+            return str(row[k]).strip()
+    return ''
+
+
+def parse_salary(value):
+    """
+    Parse a salary cell; blank cells count as zero.
+
+    Raises ValueError for anything that is not a finite amount fitting the
+    monthly_salary column, so bad cells become row errors.
+    """
+    if not value:
+        return Decimal(0)
+    try:
+        salary = Decimal(str(value).replace(',', ''))
+    except DecimalException:
+        raise ValueError(f"Invalid salary '{value}'")
+    if not salary.is_finite():
+        raise ValueError(f"Invalid salary '{value}'")
+    field = Employee._meta.get_field('monthly_salary')
+    # Compare after rounding to the column's decimal places, as the row will be stored.
+    limit = Decimal(10) ** (field.max_digits - field.decimal_places) - Decimal(10) ** -field.decimal_places / 2
+    if abs(salary) >= limit:
+        raise ValueError(f"Salary '{value}' is too large")
+    return salary
+
+
+def resolve_role(row):
+    """Map the ROLE/STATION/REGION columns to a system role code"""
+    csv_role = get_row_value(row, ROLE_HEADERS).lower()
+    station_name = get_row_value(row, STATION_HEADERS).lower()
+    region_name = get_row_value(row, REGION_HEADERS).lower()
+
+    if 'hr-admin' in csv_role or 'hr admin' in csv_role:
+        return 'hr_admin'
+    if 'finance' in csv_role or 'finance' in station_name or 'finance' in region_name:
+        return 'finance'
+    if 'admin' in csv_role:
+        return 'admin'
+    return 'staff'
+
+
+def is_skipped_staff_id(staff_id):
+    return not staff_id or staff_id.lower() in ('nan', 'bulk')
+
+
+def missing_required_headers(headers):
+    """Return the required fields that have no matching column."""
+    present = {h.lower() for h in headers}
+    return [
+        field for field, possibilities in REQUIRED_HEADERS.items()
+        if not any(p.lower() in present for p in possibilities)
+    ]
+
+
+def _check_existing_rows(pending, writer):
+    """
+    Batch existence checks for one chunk of validated rows.
+
+    Flags rows that would silently update a separated employee, and
+    non-casual staff IDs whose username already belongs to a login account
+    that was not created for that staff ID (e.g. a system user). Two
+    queries per chunk.
+    """
+    staff_ids = [staff_id for _, staff_id in pending]
+
+    separated = dict(
+        Employee.objects.filter(staff_id__in=staff_ids, is_active=False)
+        .values_list('staff_id', 'separated_at')
+    )
+    foreign_accounts = set(
+        CustomUser.objects.filter(username__in=[s for s in staff_ids if not s.startswith('CA')])
+        .exclude(staff_id=F('username'))
+        .values_list('username', flat=True)
+    )
+
+    error_count = 0
+    for row_number, staff_id in pending:
+        if staff_id in separated:
+            separated_at = separated[staff_id]
+            when = f" on {separated_at:%d %b %Y}" if separated_at else ""
+            writer.writerow([row_number, staff_id, 'staff_id', f"Employee was separated{when}; reinstate before importing"])
+            error_count += 1
+        if staff_id in foreign_accounts:
+            writer.writerow([row_number, staff_id, 'staff_id', "Username already belongs to a different login account"])
+            error_count += 1
+    return error_count
+
+
+def validate_import_file(path, report_path, chunk_size=IMPORT_CHUNK_SIZE, heartbeat=None):
+    """
+    Check a whole import file in one streaming pass without writing to the
+    database, writing every problem to a CSV error report. ``heartbeat`` is
+    called after each chunk so a long pass keeps the job's claim.
+
+    Returns ``(total_rows, error_count)``.
+    """
+    os.makedirs(os.path.dirname(report_path), exist_ok=True)
+    total_rows = 0
+    error_count = 0
+
+    with open(report_path, 'w', newline='', encoding='utf-8') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(ERROR_REPORT_HEADERS)
+
+        missing = missing_required_headers(read_sheet_headers(path))
+        for field in missing:
+            expected = ' / '.join(REQUIRED_HEADERS[field])
+            writer.writerow([1, '', field, f"Missing required column (expected one of: {expected})"])
+        if missing:
+            return total_rows, len(missing)
+
+        first_seen = {}
+        pending = []
+        for index, row in enumerate(iter_sheet_rows(path)):
+            total_rows += 1
+            # +2: one for the header row, one for 1-based numbering
+            row_number = index + 2
+            staff_id = get_row_value(row, STAFF_ID_HEADERS)
+
+            if is_skipped_staff_id(staff_id):
+                if not staff_id and get_row_value(row, NAME_HEADERS):
+                    writer.writerow([row_number, '', 'staff_id', "Staff ID is required"])
+                    error_count += 1
+                continue
+
+            if len(staff_id) > STAFF_ID_MAX_LENGTH or not STAFF_ID_PATTERN.match(staff_id):
+                writer.writerow([row_number, staff_id, 'staff_id', "Invalid staff ID format"])
+                error_count += 1
+                continue
+
+            if staff_id in first_seen:
+                writer.writerow([row_number, staff_id, 'staff_id', f"Duplicate staff ID (first seen on row {first_seen[staff_id]})"])
+                error_count += 1
+                continue
+            first_seen[staff_id] = row_number
+
+            if not get_row_value(row, NAME_HEADERS):
+                writer.writerow([row_number, staff_id, 'name', "Name is required"])
+                error_count += 1
+
+            try:
+                if parse_salary(get_row_value(row, SALARY_HEADERS)) < 0:
+                    writer.writerow([row_number, staff_id, 'salary', "Salary cannot be negative"])
+                    error_count += 1
+            except ValueError as e:
+                writer.writerow([row_number, staff_id, 'salary', str(e)])
+                error_count += 1
+
+            pending.append((row_number, staff_id))
+            if len(pending) >= chunk_size:
+                error_count += _check_existing_rows(pending, writer)
+                pending = []
+                if heartbeat:
+                    heartbeat()
+
+        if pending:
+            error_count += _check_existing_rows(pending, writer)
+
+    return total_rows, error_count
+
+
+def import_storage():
+    """Private storage for uploaded import sheets, outside MEDIA_ROOT."""
+    return FileSystemStorage(location=settings.IMPORT_ROOT)
+
+
+def error_report_path_for(job):
+    return os.path.join(settings.IMPORT_ROOT, 'reports', f'import_{job.id}_errors.csv')
+
+
+def touch_import_job(job):
+    """Heartbeat: keep a job that is still working from being reclaimed as stale."""
+    job.heartbeat_at = timezone.now()
+    ImportJob.objects.filter(id=job.id, status='running').update(heartbeat_at=job.heartbeat_at)
+
+
+def run_validation(job, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Validate a claimed job. Returns True when the import may proceed;
+    otherwise the job is finished as 'invalid' or 'validated' (dry run).
+    """
+    report_path = error_report_path_for(job)
+    total_rows, error_count = validate_import_file(
+        job.file_path, report_path, chunk_size=chunk_size, heartbeat=lambda: touch_import_job(job)
+    )
+
+    job.total_rows = total_rows
+    job.validation_error_count = error_count
+    job.error_report_path = report_path
+    job.validated_at = timezone.now()
+    job.heartbeat_at = job.validated_at
+    update_fields = ['total_rows', 'validation_error_count', 'error_report_path', 'validated_at', 'heartbeat_at']
+
+    if not error_count:
+        # Nothing to download; only reports that list errors are kept.
+        os.remove(report_path)
+        job.error_report_path = ''
+
+    proceed = not error_count and not job.dry_run
+    if not proceed:
+        job.status = 'invalid' if error_count else 'validated'
+        job.finished_at = job.validated_at
+        update_fields += ['status', 'finished_at']
+    job.save(update_fields=update_fields)
+    return proceed
+
+
+EMPLOYEE_IMPORT_FIELDS = [
+    'name', 'contact', 'email', 'gender', 'unit', 'department', 'monthly_salary', 'grade', 'level',
+]
+USER_IMPORT_FIELDS = ['role', 'first_name', 'last_name', 'email', 'staff_id', 'department', 'unit']
+
+
+def parse_import_row(row):
+    """
+    Turn a sheet row into ``(staff_id, employee_fields, user_fields)``.
+
+    ``user_fields`` is None for casual employees, who get no login account.
+    Returns None for rows that are skipped (blank/placeholder staff IDs).
+    """
+    staff_id = get_row_value(row, STAFF_ID_HEADERS)
+    if is_skipped_staff_id(staff_id):
+        return None
+
+    full_name = get_row_value(row, NAME_HEADERS)
+    name_parts = full_name.split(' ')
+    employee_fields = {
+        'name': full_name,
+        'contact': get_row_value(row, PHONE_HEADERS),
+        'email': get_row_value(row, EMAIL_HEADERS),
+        'gender': get_row_value(row, GENDER_HEADERS),
+        'unit': get_row_value(row, STATION_HEADERS),
+        'department': get_row_value(row, REGION_HEADERS),
+        'monthly_salary': parse_salary(get_row_value(row, SALARY_HEADERS)).quantize(Decimal('0.01')),
+        'grade': get_row_value(row, GRADE_HEADERS),
+        'level': get_row_value(row, LEVEL_HEADERS),
+    }
+
+    # Only create User Account for non-casual employees
+    # Casual employees (staff IDs starting with 'CA') should NOT have login access
+    user_fields = None
+    if not staff_id.startswith('CA'):
+        user_fields = {
+            'role': resolve_role(row),
+            'first_name': name_parts[0] if name_parts else "",
+            'last_name': " ".join(name_parts[1:]) if len(name_parts) > 1 else "",
+            'email': employee_fields['email'],
+            'staff_id': staff_id,
+            'department': employee_fields['department'],
+            'unit': employee_fields['unit'],
+        }
+    return staff_id, employee_fields, user_fields
+
+
+def row_content_hash(employee_fields, user_fields):
+    """Stable digest of everything an import row writes."""
+    payload = json.dumps([employee_fields, user_fields], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def apply_import_chunk(records, password, user=None):
+    """
+    Write one chunk of parsed rows, skipping rows whose content hash matches
+    the hash stored by the previous import.
+
+    Runs a fixed number of queries per chunk: one hash lookup, one insert
+    and one update for employees, one salary-history upsert, and the same
+    for login accounts when any new or changed row needs one. New accounts
+    get ``password`` hashed with their own salt, or an unusable password
+    if it is None. Returns ``(inserted, updated, unchanged)``.
+    """
+    existing = {
+        staff_id: (import_hash, monthly_salary)
+        for staff_id, import_hash, monthly_salary in
+        Employee.objects.filter(staff_id__in=[staff_id for staff_id, _, _ in records])
+        .values_list('staff_id', 'import_hash', 'monthly_salary')
+    }
+
+    now = timezone.now()
+    new_employees = []
+    changed_employees = []
+    salary_changes = []
+    user_rows = {}
+    for staff_id, employee_fields, user_fields in records:
+        content_hash = row_content_hash(employee_fields, user_fields)
+        salary = employee_fields['monthly_salary']
+        if staff_id not in existing:
+            new_employees.append(Employee(staff_id=staff_id, import_hash=content_hash, **employee_fields))
+            salary_changes.append((staff_id, salary))
+        elif existing[staff_id][0] != content_hash:
+            changed_employees.append(
+                Employee(staff_id=staff_id, import_hash=content_hash, updated_at=now, **employee_fields)
+            )
+            if existing[staff_id][1] != salary:
+                salary_changes.append((staff_id, salary))
+        else:
+            continue
+        if user_fields is not None:
+            user_rows[staff_id] = user_fields
+
+    if new_employees:
+        Employee.objects.bulk_create(new_employees)
+    if changed_employees:
+        # bulk_update skips auto_now, so updated_at is set explicitly above.
+        Employee.objects.bulk_update(
+            changed_employees, EMPLOYEE_IMPORT_FIELDS + ['import_hash', 'updated_at']
+        )
+    record_salary_changes(salary_changes, user=user)
+
+    if user_rows:
+        existing_users = {
+            user.username: user
+            for user in CustomUser.objects.filter(username__in=list(user_rows))
+        }
+        new_users = []
+        changed_users = []
+        for username, user_fields in user_rows.items():
+            user_obj = existing_users.get(username)
+            if user_obj is None:
+                new_users.append(CustomUser(username=username, password=make_password(password), **user_fields))
+            else:
+                for attr, value in user_fields.items():
+                    setattr(user_obj, attr, value)
+                changed_users.append(user_obj)
+        if new_users:
+            CustomUser.objects.bulk_create(new_users)
+        if changed_users:
+            CustomUser.objects.bulk_update(changed_users, USER_IMPORT_FIELDS)
+
+    unchanged = len(records) - len(new_employees) - len(changed_employees)
+    return len(new_employees), len(changed_employees), unchanged
+
+
+def claim_next_import_job():
+    """
+    Atomically claim the oldest queued job, or a running job whose worker
+    stopped sending heartbeats. Returns None when the queue is empty.
+    """
+    stale_before = timezone.now() - STALE_JOB_AFTER
+    candidates = ImportJob.objects.filter(
+        Q(status='queued') | Q(status='running', heartbeat_at__lt=stale_before)
+    ).order_by('created_at').values_list('id', 'status', 'heartbeat_at')
+
+    for job_id, status, heartbeat_at in candidates[:10]:
+        now = timezone.now()
+        # Guard on the values we read so two workers cannot claim the same job.
+        claimed = ImportJob.objects.filter(
+            id=job_id, status=status, heartbeat_at=heartbeat_at
+        ).update(status='running', heartbeat_at=now)
+        if claimed:
+            job = ImportJob.objects.get(id=job_id)
+            if job.started_at is None:
+                job.started_at = now
+                job.save(update_fields=['started_at'])
+            return job
+    return None
+
+
+def run_import_job(job, chunk_size=IMPORT_CHUNK_SIZE):
+    """
+    Process a claimed job chunk by chunk, skipping rows already committed.
+
+    Nothing is written until the whole file has passed validation.
+    """
+    if job.validated_at is None and not run_validation(job, chunk_size=chunk_size):
+        return
+
+    password = settings.DEFAULT_USER_PASSWORD or None
+
+    if job.total_rows is None:
+        job.total_rows = count_sheet_rows(job.file_path)
+        job.save(update_fields=['total_rows'])
+
+    rows = islice(iter_sheet_rows(job.file_path), job.rows_processed, None)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            break
+
+        records = []
+        error_count = 0
+        last_error = job.last_error
+        for offset, row in enumerate(chunk):
+            try:
+                record = parse_import_row(row)
+            except (ValueError, TypeError, KeyError) as e:
+                error_count += 1
+                # +2: one for the header row, one for 1-based numbering
+                last_error = f"Row {job.rows_processed + offset + 2}: {e}"
+                continue
+            if record is not None:
+                records.append(record)
+
+        with transaction.atomic():
+            inserted, updated, unchanged = apply_import_chunk(records, password, job.created_by) if records else (0, 0, 0)
+
+            job.rows_processed += len(chunk)
+            job.inserted_count += inserted
+            job.updated_count += updated
+            job.unchanged_count += unchanged
+            job.success_count += len(records)
+            job.error_count += error_count
+            job.last_error = last_error
+            job.heartbeat_at = timezone.now()
+            job.save(update_fields=[
+                'rows_processed', 'inserted_count', 'updated_count', 'unchanged_count',
+                'success_count', 'error_count', 'last_error', 'heartbeat_at'
+            ])
+
+    job.status = 'completed'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'finished_at'])
+
+
+def remove_import_upload(job):
+    """Delete a finished job's uploaded sheet; its error report stays for download."""
+    if job.file_path and os.path.exists(job.file_path):
+        os.remove(job.file_path)
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError
+from django.utils import timezone
+
+from staff.importers import IMPORT_CHUNK_SIZE, claim_next_import_job, remove_import_upload, run_import_job
+
+
+class Command(BaseCommand):
+    help = "Process queued employee import jobs (run continuously or with --once)"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Exit when the queue is empty")
+        parser.add_argument('--sleep', type=float, default=5.0, help="Seconds to wait between polls")
+        parser.add_argument('--chunk-size', type=int, default=IMPORT_CHUNK_SIZE)
+
+    def _process(self, job, chunk_size):
+        self.stdout.write(f"Processing import job #{job.id} ({job.original_filename}) from row {job.rows_processed}...")
+        try:
+            run_import_job(job, chunk_size=chunk_size)
+        except (OSError, ValueError, KeyError, DatabaseError) as exc:
+            job.status = 'failed'
+            job.last_error = f"Error reading file: {exc}"
+            job.finished_at = timezone.now()
+            job.save(update_fields=['status', 'last_error', 'finished_at'])
+            remove_import_upload(job)
+            self.stdout.write(self.style.ERROR(f"Job #{job.id} failed: {exc}"))
+            return
+
+        remove_import_upload(job)
+        if job.status == 'invalid':
+            self.stdout.write(self.style.WARNING(
+                f"Job #{job.id} failed validation with {job.validation_error_count} errors; nothing was imported."
+            ))
+            return
+        if job.status == 'validated':
+            self.stdout.write(self.style.SUCCESS(f"Job #{job.id} dry run passed validation ({job.total_rows} rows)."))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Job #{job.id} complete: {job.inserted_count} inserted, {job.updated_count} updated, "
+            f"{job.unchanged_count} unchanged, {job.error_count} errors "
+            f"({job.rows_per_second()} rows/s)."
+        ))
+
+    def handle(self, *args, **options):
+        while True:
+            job = claim_next_import_job()
+            if job is not None:
+                self._process(job, options['chunk_size'])
+                continue
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
@@ -0,0 +1,38 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0005_importjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='dry_run',
+            field=models.BooleanField(default=False, verbose_name='Validate Only'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='error_report_path',
+            field=models.CharField(blank=True, max_length=500, verbose_name='Error Report'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='validated_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='validation_error_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Validation Errors'),
+        ),
+        migrations.AlterField(
+            model_name='importjob',
+            name='status',
+            field=models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('validated', 'Validated (Dry Run)'), ('invalid', 'Validation Failed'), ('completed', 'Completed'), ('failed', 'Failed')], db_index=True, default='queued', max_length=20),
+        ),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0006_importjob_validation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employee',
+            name='import_hash',
+            field=models.CharField(blank=True, editable=False, help_text='Content hash of the last imported sheet row; unchanged rows are skipped on re-import', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='inserted_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Inserted'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='unchanged_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Unchanged'),
+        ),
+        migrations.AddField(
+            model_name='importjob',
+            name='updated_count',
+            field=models.PositiveIntegerField(default=0, verbose_name='Updated'),
+        ),
+    ]
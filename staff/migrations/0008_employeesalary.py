@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:09
+
+import django.core.validators
+import django.db.models.deletion
+from decimal import Decimal
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0007_employee_import_hash'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EmployeeSalary',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('monthly_salary', models.DecimalField(decimal_places=2, max_digits=10, validators=[django.core.validators.MinValueValidator(Decimal('0.00'))], verbose_name='Monthly Basic Salary')),
+                ('effective_from', models.DateField(verbose_name='Effective From')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('created_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='salary_revisions', to=settings.AUTH_USER_MODEL)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='salary_history', to='staff.employee')),
+            ],
+            options={
+                'verbose_name': 'Salary Revision',
+                'verbose_name_plural': 'Salary History',
+                'ordering': ['employee', '-effective_from'],
+                'unique_together': {('employee', 'effective_from')},
+            },
+        ),
+    ]
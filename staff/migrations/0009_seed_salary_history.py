@@ -0,0 +1,35 @@
+# Generated by Django 5.0.14 on 2026-10-19 10:09
+
+from django.db import migrations
+
+
+def seed_salary_history(apps, schema_editor):
+    """Record each employee's current salary as their first revision."""
+    Employee = apps.get_model('staff', 'Employee')
+    EmployeeSalary = apps.get_model('staff', 'EmployeeSalary')
+
+    batch = []
+    for staff_id, monthly_salary, date_of_hire, created_at in Employee.objects.values_list(
+        'staff_id', 'monthly_salary', 'date_of_hire', 'created_at'
+    ).iterator():
+        batch.append(EmployeeSalary(
+            employee_id=staff_id,
+            monthly_salary=monthly_salary,
+            effective_from=date_of_hire or created_at.date(),
+        ))
+        if len(batch) >= 1000:
+            EmployeeSalary.objects.bulk_create(batch, ignore_conflicts=True)
+            batch = []
+    if batch:
+        EmployeeSalary.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('staff', '0008_employeesalary'),
+    ]
+
+    operations = [
+        migrations.RunPython(seed_salary_history, migrations.RunPython.noop),
+    ]
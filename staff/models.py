@@ -2,6 +2,7 @@ from django.db import models
 from django.core.validators import MinValueValidator
 from decimal import Decimal
 from django.conf import settings
+from django.utils import timezone
 
 
 class Employee(models.Model):
@@ -98,6 +99,12 @@ class Employee(models.Model):
     # Metadata
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    import_hash = models.CharField(
+        max_length=64,
+        blank=True,
+        editable=False,
+        help_text="Content hash of the last imported sheet row; unchanged rows are skipped on re-import"
+    )
     
     class Meta:
         ordering = ['name']
@@ -115,3 +122,121 @@ class Employee(models.Model):
             return dict(self.STATUS_CHOICES).get(self.status, self.status)
         return "Unknown"
 
+
+
+
+class EmployeeSalary(models.Model):
+    """
+    Effective-dated monthly salary history.
+
+    ``Employee.monthly_salary`` always holds the latest value; this table
+    keeps every revision so past periods are paid at the salary that was in
+    force at the time.
+    """
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name='salary_history')
+    monthly_salary = models.DecimalField(
+        max_digits=10,
+        decimal_places=2,
+        validators=[MinValueValidator(Decimal('0.00'))],
+        verbose_name="Monthly Basic Salary"
+    )
+    effective_from = models.DateField(verbose_name="Effective From")
+    created_at = models.DateTimeField(auto_now_add=True)
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='salary_revisions',
+    )
+
+    class Meta:
+        ordering = ['employee', '-effective_from']
+        verbose_name = "Salary Revision"
+        verbose_name_plural = "Salary History"
+        # The unique index on (employee, effective_from) also serves the as-of lookups.
+        unique_together = ['employee', 'effective_from']
+
+    def __str__(self):
+        return f"{self.employee_id}: GHS {self.monthly_salary} from {self.effective_from}"
+
+class ImportJob(models.Model):
+    """
+    Employee import queued for background processing.
+
+    The upload view stores the file and creates a job; the
+    ``process_import_jobs`` management command drains the queue. Every job
+    is validated in one pass before anything is written; a file with errors
+    (or a dry run) stops there with a downloadable error report. Progress
+    is committed together with each chunk of rows, so a job interrupted by
+    a crash resumes from its last committed chunk.
+    """
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('validated', 'Validated (Dry Run)'),
+        ('invalid', 'Validation Failed'),
+        ('completed', 'Completed'),
+        ('failed', 'Failed'),
+    ]
+    FINISHED_STATUSES = ('validated', 'invalid', 'completed', 'failed')
+
+    file_path = models.CharField(max_length=500, verbose_name="Stored File")
+    original_filename = models.CharField(max_length=255, verbose_name="Uploaded File")
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued', db_index=True)
+    dry_run = models.BooleanField(default=False, verbose_name="Validate Only")
+
+    # Validation pass
+    validated_at = models.DateTimeField(null=True, blank=True)
+    validation_error_count = models.PositiveIntegerField(default=0, verbose_name="Validation Errors")
+    error_report_path = models.CharField(max_length=500, blank=True, verbose_name="Error Report")
+
+    # Progress counters (committed per chunk)
+    total_rows = models.PositiveIntegerField(null=True, blank=True, verbose_name="Total Rows")
+    rows_processed = models.PositiveIntegerField(default=0, verbose_name="Rows Processed")
+    success_count = models.PositiveIntegerField(default=0, verbose_name="Imported/Updated")
+    inserted_count = models.PositiveIntegerField(default=0, verbose_name="Inserted")
+    updated_count = models.PositiveIntegerField(default=0, verbose_name="Updated")
+    unchanged_count = models.PositiveIntegerField(default=0, verbose_name="Unchanged")
+    error_count = models.PositiveIntegerField(default=0, verbose_name="Errors")
+    last_error = models.TextField(blank=True, verbose_name="Last Error")
+
+    created_by = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='import_jobs',
+    )
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name = "Import Job"
+        verbose_name_plural = "Import Jobs"
+
+    def __str__(self):
+        return f"Import {self.original_filename} ({self.get_status_display()})"
+
+    def is_finished(self):
+        return self.status in self.FINISHED_STATUSES
+
+    def rows_per_second(self):
+        """Average throughput since the job started"""
+        if not self.started_at or not self.rows_processed:
+            return 0.0
+        end = self.finished_at or timezone.now()
+        elapsed = (end - self.started_at).total_seconds()
+        if elapsed <= 0:
+            return 0.0
+        return round(self.rows_processed / elapsed, 1)
+
+    def progress_percent(self):
+        if self.status in ('validated', 'invalid'):
+            return 100
+        if not self.total_rows:
+            return 100 if self.status == 'completed' else 0
+        return min(100, int(self.rows_processed * 100 / self.total_rows))
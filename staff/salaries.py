@@ -0,0 +1,95 @@
+"""
+Effective-dated salary lookups
+"""
+from datetime import date
+
+from django.db.models import DecimalField, F, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from payslip.date_utils import parse_month_year
+from .models import Employee, EmployeeSalary
+
+
+def current_period_start():
+    """First day of the current month; the default effective date for revisions."""
+    return date.today().replace(day=1)
+
+
+def period_start(month_year):
+    """First day of a Mon-YYYY period, or None if it cannot be parsed."""
+    parsed = parse_month_year(month_year)
+    return parsed.date() if parsed else None
+
+
+def salary_as_of_expression(as_of):
+    """
+    Expression for the salary in force on ``as_of``, for annotating an
+    Employee queryset.
+
+    Resolved in the same query with correlated subqueries on the
+    (employee, effective_from) index. Dates before the first recorded
+    revision use the earliest revision; employees with no history fall back
+    to ``monthly_salary``.
+    """
+    history = EmployeeSalary.objects.filter(employee=OuterRef('pk'))
+    in_force = history.filter(effective_from__lte=as_of).order_by('-effective_from').values('monthly_salary')[:1]
+    earliest = history.order_by('effective_from').values('monthly_salary')[:1]
+    return Coalesce(
+        Subquery(in_force),
+        Subquery(earliest),
+        F('monthly_salary'),
+        output_field=DecimalField(max_digits=10, decimal_places=2),
+    )
+
+
+def with_salary_as_of(queryset, as_of):
+    """Annotate an Employee queryset with ``period_salary`` in force on ``as_of``."""
+    return queryset.annotate(period_salary=salary_as_of_expression(as_of))
+
+
+def salaries_as_of(as_of, employees=None):
+    """Map staff_id -> salary in force on ``as_of`` for every employee, in one query."""
+    queryset = Employee.objects.all() if employees is None else employees
+    return dict(with_salary_as_of(queryset, as_of).values_list('staff_id', 'period_salary'))
+
+
+def salary_as_of(employee, as_of):
+    """Salary in force on ``as_of`` for a single employee."""
+    return salaries_as_of(as_of, Employee.objects.filter(pk=employee.pk)).get(employee.pk, employee.monthly_salary)
+
+
+def record_salary_change(employee, monthly_salary, effective_from=None, user=None):
+    """Record a salary revision; a second revision on the same date replaces the first."""
+    revision, _ = EmployeeSalary.objects.update_or_create(
+        employee=employee,
+        effective_from=effective_from or current_period_start(),
+        defaults={'monthly_salary': monthly_salary, 'created_by': user},
+    )
+    return revision
+
+
+def record_salary_changes(changes, effective_from=None, user=None):
+    """
+    Bulk version of ``record_salary_change`` for imports.
+
+    ``changes`` is an iterable of ``(staff_id, monthly_salary)``; written in
+    one upsert.
+    """
+    effective_from = effective_from or current_period_start()
+    revisions = [
+        EmployeeSalary(
+            employee_id=staff_id,
+            monthly_salary=monthly_salary,
+            effective_from=effective_from,
+            created_by=user,
+        )
+        for staff_id, monthly_salary in changes
+    ]
+    if revisions:
+        EmployeeSalary.objects.bulk_create(
+            revisions,
+            update_conflicts=True,
+            unique_fields=['employee', 'effective_from'],
+            update_fields=['monthly_salary', 'created_by'],
+        )
+    return len(revisions)
@@ -1,3 +1,139 @@
-from django.test import TestCase
+import csv
+import os
+import tempfile
+from datetime import date, timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from .forms import EmployeeForm
+from .importers import (
+    parse_import_row, parse_salary, remove_import_upload, run_import_job, touch_import_job,
+    validate_import_file,
+)
+from .models import Employee, EmployeeSalary, ImportJob
+
+BAD_SALARIES = ['NaN', 'nan', 'sNaN', 'inf', '-Infinity', '100000000', '99999999.995', '1E+40']
+
+
+class ParseSalaryTests(TestCase):
+    def test_valid_amounts(self):
+        self.assertEqual(parse_salary(''), Decimal(0))
+        self.assertEqual(parse_salary('1,250.50'), Decimal('1250.50'))
+        self.assertEqual(parse_salary('99999999.99'), Decimal('99999999.99'))
+
+    def test_rejects_non_finite_and_oversized_values(self):
+        for value in BAD_SALARIES + ['abc']:
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_salary(value)
+
+    def test_parse_import_row_raises_value_error(self):
+        for value in BAD_SALARIES:
+            with self.subTest(value=value), self.assertRaises(ValueError):
+                parse_import_row({'STAFF ID': 'NAS001', 'Fullname': 'AMA MENSAH', 'salary': value})
+
+
+class ImportFileTests(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        media = override_settings(
+            MEDIA_ROOT=self.tmpdir.name, IMPORT_ROOT=self.tmpdir.name, DEFAULT_USER_PASSWORD='changeme123'
+        )
+        media.enable()
+        self.addCleanup(media.disable)
+
+    def write_sheet(self, salaries, prefix='CA'):
+        path = os.path.join(self.tmpdir.name, 'employees.csv')
+        with open(path, 'w', newline='', encoding='utf-8') as handle:
+            writer = csv.writer(handle)
+            writer.writerow(['STAFF ID', 'Fullname', 'salary'])
+            for number, salary in enumerate(salaries, start=1):
+                writer.writerow([f'{prefix}{number:04d}', f'EMPLOYEE {number}', salary])
+        return path
+
+    def test_validation_reports_bad_salaries_as_row_errors(self):
+        path = self.write_sheet(['1200'] + BAD_SALARIES + ['-5'])
+        report = os.path.join(self.tmpdir.name, 'report.csv')
+        total_rows, error_count = validate_import_file(path, report)
+        self.assertEqual(total_rows, len(BAD_SALARIES) + 2)
+        self.assertEqual(error_count, len(BAD_SALARIES) + 1)
+        with open(report, newline='', encoding='utf-8') as handle:
+            rows = list(csv.DictReader(handle))
+        self.assertEqual({row['field'] for row in rows}, {'salary'})
+
+    def test_job_with_bad_salaries_finishes_invalid(self):
+        job = ImportJob.objects.create(
+            file_path=self.write_sheet(['1200', 'NaN', 'inf']), original_filename='employees.csv', status='running',
+        )
+        run_import_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'invalid')
+        self.assertEqual(job.validation_error_count, 2)
+        self.assertFalse(Employee.objects.exists())
+        self.assertTrue(job.error_report_path.startswith(self.tmpdir.name))
+        remove_import_upload(job)
+        self.assertFalse(os.path.exists(job.file_path))
+        self.assertTrue(os.path.exists(job.error_report_path))
+
+    def test_job_imports_valid_rows(self):
+        job = ImportJob.objects.create(
+            file_path=self.write_sheet(['1,200.5', '980']), original_filename='employees.csv', status='running',
+        )
+        run_import_job(job)
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'completed')
+        self.assertEqual(job.inserted_count, 2)
+        self.assertEqual(Employee.objects.get(staff_id='CA0001').monthly_salary, Decimal('1200.50'))
+        # A clean file leaves no empty report behind.
+        self.assertEqual(job.error_report_path, '')
+        self.assertFalse(os.path.exists(os.path.join(self.tmpdir.name, 'reports', f'import_{job.id}_errors.csv')))
+
+    def test_validation_heartbeats_every_chunk(self):
+        stale = timezone.now() - timedelta(hours=1)
+        job = ImportJob.objects.create(
+            file_path=self.write_sheet(['1200', '980', '1500']), original_filename='employees.csv',
+            status='running', heartbeat_at=stale, dry_run=True,
+        )
+        beats = []
+        with mock.patch('staff.importers.touch_import_job', side_effect=lambda job: beats.append(job.id)):
+            run_import_job(job, chunk_size=1)
+        self.assertEqual(beats, [job.id] * 3)
+        job.heartbeat_at = stale
+        touch_import_job(job)
+        self.assertGreater(ImportJob.objects.get(id=job.id).heartbeat_at, stale)
+
+    def test_new_accounts_get_their_own_password_hash(self):
+        job = ImportJob.objects.create(
+            file_path=self.write_sheet(['1200', '980'], prefix='NAS'), original_filename='employees.csv',
+            status='running',
+        )
+        run_import_job(job)
+        first, second = get_user_model().objects.filter(username__in=['NAS0001', 'NAS0002']).order_by('username')
+        self.assertNotEqual(first.password, second.password)
+        self.assertTrue(first.check_password('changeme123'))
+        self.assertTrue(second.check_password('changeme123'))
+
+
+class EmployeeCreateTests(TestCase):
+    def setUp(self):
+        user = get_user_model().objects.create_user(username='hr', password='x', role='hr_admin')
+        self.client.force_login(user)
+
+    def create(self, **extra):
+        data = {'staff_id': 'NAS0100', 'name': 'ABENA OWUSU', 'monthly_salary': '3500', 'date_of_hire': '2025-11-03'}
+        data.update(extra)
+        self.client.post(reverse('staff:employee_create'), data)
+        return EmployeeSalary.objects.get(employee_id='NAS0100')
+
+    def test_backdated_hire_salary_starts_at_the_hire_date(self):
+        # The add form leaves the date blank, so a backdated hire is not paid from this month only.
+        self.assertIsNone(EmployeeForm().fields['salary_effective_from'].initial)
+        self.assertEqual(self.create().effective_from, date(2025, 11, 3))
+
+    def test_explicit_effective_date_wins(self):
+        self.assertEqual(self.create(salary_effective_from='2026-01-01').effective_from, date(2026, 1, 1))
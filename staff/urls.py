@@ -9,4 +9,7 @@ urlpatterns = [
     path('employees/<path:staff_id>/edit/', views.employee_edit, name='employee_edit'),
     path('employees/<path:staff_id>/delete/', views.employee_delete, name='employee_delete'),
     path('employees/import/', views.import_employees, name='import_employees'),
+    path('employees/import/<int:job_id>/', views.import_job_detail, name='import_job_detail'),
+    path('employees/import/<int:job_id>/status/', views.import_job_status, name='import_job_status'),
+    path('employees/import/<int:job_id>/errors/', views.import_job_error_report, name='import_job_error_report'),
 ]
@@ -3,13 +3,15 @@ from django.contrib import messages
 from django.conf import settings
 from django.db.models import Q
 from django.core.paginator import Paginator
-from django.core.files.storage import FileSystemStorage
+from django.http import FileResponse, JsonResponse
+from django.urls import reverse
 from django.utils import timezone
-from .models import Employee
+import os
+from .models import Employee, ImportJob
 from .forms import EmployeeForm, ImportEmployeeForm
-from accounts.models import CustomUser
+from .importers import import_storage
+from .salaries import record_salary_change
 from accounts.decorators import hr_admin_required, employee_record_access_required
-# import pandas as pd (Moved to import_employees to debug startup)
 
 from accounts.forms import CustomUserCreationForm # For User Management View but that's in accounts?
 # Actually User Management is admin stuff, might fit in accounts too. 
@@ -51,6 +53,12 @@ def employee_create(request):
         form = EmployeeForm(request.POST)
         if form.is_valid():
             employee = form.save()
+            record_salary_change(
+                employee,
+                employee.monthly_salary,
+                effective_from=form.cleaned_data['salary_effective_from'] or employee.date_of_hire,
+                user=request.user,
+            )
             messages.success(request, f'Employee {employee.name} added successfully!')
             return redirect(EMPLOYEE_LIST_URL_NAME)
     else:
@@ -69,9 +77,20 @@ def employee_edit(request, staff_id):
     employee = get_object_or_404(Employee, staff_id=staff_id)
     
     if request.method == 'POST':
+        previous_salary = employee.monthly_salary
         form = EmployeeForm(request.POST, instance=employee)
         if form.is_valid():
-            employee = form.save()
+            employee = form.save(commit=False)
+            # Manual edits diverge from the sheet; make the next import rewrite this row.
+            employee.import_hash = ''
+            employee.save()
+            if employee.monthly_salary != previous_salary:
+                record_salary_change(
+                    employee,
+                    employee.monthly_salary,
+                    effective_from=form.cleaned_data['salary_effective_from'],
+                    user=request.user,
+                )
             messages.success(request, f'Employee {employee.name} updated successfully!')
             return redirect(EMPLOYEE_LIST_URL_NAME)
     else:
@@ -109,135 +128,88 @@ def employee_delete(request, staff_id):
 
 @hr_admin_required
 def import_employees(request):
-    """Import employees from Excel file"""
-    import pandas as pd
+    """Upload an Excel/CSV file and queue it for background import"""
     if request.method == 'POST':
         form = ImportEmployeeForm(request.POST, request.FILES)
         if form.is_valid():
             excel_file = request.FILES['file']
-            fs = FileSystemStorage()
-            filename = fs.save(excel_file.name, excel_file)
-            uploaded_file_url = fs.path(filename)
-            
-            try:
-                # Read Excel/CSV
-                if filename.endswith('.csv'):
-                    df = pd.read_csv(uploaded_file_url)
-                else:
-                    df = pd.read_excel(uploaded_file_url)
-                
-                # Process data
-                success_count = 0
-                error_count = 0
-                
-                # Normalize headers for robustness (only strip whitespace)
-                df.columns = [c.strip() for c in df.columns]
-                default_user_password = settings.DEFAULT_USER_PASSWORD or None
-                if default_user_password is None:
-                    messages.warning(
-                        request,
-                        "DEFAULT_USER_PASSWORD is not set. New users will be created with unusable passwords.",
-                    )
-                
-                def get_row_value(row, possibilities):
-                    """Helper to get value from row checking multiple possible header names"""
-                    for p in possibilities:
-                        if p in row and pd.notnull(row[p]):
-                            return str(row[p]).strip()
-                    # Also try case-insensitive match if direct match fails
-                    row_keys_lower = {k.lower(): k for k in row.keys()}
-                    for p in possibilities:
-                        p_lower = p.lower()
-                        if p_lower in row_keys_lower:
-                            k = row_keys_lower[p_lower]
-                            if pd.notnull(row[k]):
-                                return str(row[k]).strip()
-                    return ''
-
-                for _, row in df.iterrows():
-                    try:
-                        # Extract basic info using flexible header mapping
-                        staff_id = get_row_value(row, ['STAFF ID', 'staff_id', 'ID'])
-                        
-                        if not staff_id or staff_id.lower() == 'nan' or staff_id.lower() == 'bulk':
-                            continue
-                            
-                        # Extract and Map Role
-                        csv_role = get_row_value(row, ['ROLE', 'role']).lower()
-                        role = 'staff'
-                        station_name = get_row_value(row, ['STATION:', 'station_name', 'station']).lower()
-                        region_name = get_row_value(row, ['REGION:', 'region']).lower()
-
-                        if 'hr-admin' in csv_role or 'hr admin' in csv_role: 
-                            role = 'hr_admin'
-                        elif 'finance' in csv_role or 'finance' in station_name or 'finance' in region_name:
-                            role = 'finance'
-                        elif 'admin' in csv_role: 
-                            role = 'admin'
-                        
-                        # Full name
-                        full_name = get_row_value(row, ['Fullname', 'full_name', 'Name'])
-                        name_parts = full_name.split(' ')
-                        first_name = name_parts[0] if name_parts else ""
-                        last_name = " ".join(name_parts[1:]) if len(name_parts) > 1 else ""
-                        
-                        # Create/Update Employee
-                        employee, _ = Employee.objects.update_or_create(
-                            staff_id=staff_id,
-                            defaults={
-                                'name': full_name,
-                                'contact': get_row_value(row, ['PHONE:', 'contact_number:', 'phone', 'contact']),
-                                'email': get_row_value(row, ['EMAIL:', 'email']),
-                                'gender': get_row_value(row, ['Gender', 'gender']),
-                                'unit': get_row_value(row, ['STATION:', 'station_name', 'station']),
-                                'department': get_row_value(row, ['REGION:', 'region']),
-                                'monthly_salary': row.get('salary', 0) if pd.notnull(row.get('salary')) else 0,
-                                'grade': get_row_value(row, ['grade', 'Grade']),
-                                'level': get_row_value(row, ['level', 'Level']),
-                            }
-                        )
-                        
-                        # Only create User Account for non-casual employees
-                        # Casual employees (staff IDs starting with 'CA') should NOT have login access
-                        if not staff_id.startswith('CA'):
-                            user_defaults = {
-                                'role': role,
-                                'first_name': first_name,
-                                'last_name': last_name,
-                                'email': employee.email,
-                                'staff_id': staff_id,
-                                'department': employee.department,
-                                'unit': employee.unit,
-                            }
-                            
-                            user_obj = CustomUser.objects.filter(username=staff_id).first()
-                            if not user_obj:
-                                CustomUser.objects.create_user(
-                                    username=staff_id,
-                                    password=default_user_password,
-                                    **user_defaults
-                                )
-                            else:
-                                # Update existing user role and details
-                                for attr, value in user_defaults.items():
-                                    setattr(user_obj, attr, value)
-                                user_obj.save()
-                        
-                        success_count += 1
-                    except (ValueError, TypeError, KeyError) as e:
-                        print(f"Error importing row: {e}")
-                        error_count += 1
-                
-                messages.success(request, f'Successfully imported/updated {success_count} employees. {error_count} errors.')
-                
-                # Clean up file
-                fs.delete(filename)
-                
-                return redirect(EMPLOYEE_LIST_URL_NAME)
-                
-            except (ValueError, OSError, KeyError) as e:
-                messages.error(request, f'Error reading file: {str(e)}')
+            fs = import_storage()
+            filename = fs.save(f'uploads/{excel_file.name}', excel_file)
+
+            if not settings.DEFAULT_USER_PASSWORD:
+                messages.warning(
+                    request,
+                    "DEFAULT_USER_PASSWORD is not set. New users will be created with unusable passwords.",
+                )
+
+            job = ImportJob.objects.create(
+                file_path=fs.path(filename),
+                original_filename=excel_file.name,
+                dry_run=form.cleaned_data['dry_run'],
+                created_by=request.user,
+            )
+            if job.dry_run:
+                messages.success(request, f'{excel_file.name} queued for validation.')
+            else:
+                messages.success(request, f'{excel_file.name} queued for import.')
+            return redirect('staff:import_job_detail', job_id=job.id)
     else:
         form = ImportEmployeeForm()
-        
-    return render(request, 'staff/import_employees.html', {'form': form})
+
+    recent_jobs = ImportJob.objects.select_related('created_by')[:10]
+    return render(request, 'staff/import_employees.html', {'form': form, 'recent_jobs': recent_jobs})
+
+
+def _import_job_payload(job):
+    return {
+        'id': job.id,
+        'status': job.status,
+        'status_display': job.get_status_display(),
+        'filename': job.original_filename,
+        'dry_run': job.dry_run,
+        'validation_error_count': job.validation_error_count,
+        'error_report_url': (
+            reverse('staff:import_job_error_report', args=[job.id])
+            if job.validation_error_count else ''
+        ),
+        'total_rows': job.total_rows,
+        'rows_processed': job.rows_processed,
+        'success_count': job.success_count,
+        'inserted_count': job.inserted_count,
+        'updated_count': job.updated_count,
+        'unchanged_count': job.unchanged_count,
+        'error_count': job.error_count,
+        'last_error': job.last_error,
+        'rows_per_second': job.rows_per_second(),
+        'progress_percent': job.progress_percent(),
+        'is_finished': job.is_finished(),
+    }
+
+
+@hr_admin_required
+def import_job_detail(request, job_id):
+    """Progress page for a queued import"""
+    job = get_object_or_404(ImportJob, id=job_id)
+    return render(request, 'staff/import_job_detail.html', {'job': job, 'payload': _import_job_payload(job)})
+
+
+@hr_admin_required
+def import_job_status(request, job_id):
+    """JSON progress for polling from the import job page"""
+    job = get_object_or_404(ImportJob, id=job_id)
+    return JsonResponse(_import_job_payload(job))
+
+
+@hr_admin_required
+def import_job_error_report(request, job_id):
+    """Download the row-level validation report for an import"""
+    job = get_object_or_404(ImportJob, id=job_id)
+    if not job.error_report_path or not os.path.exists(job.error_report_path):
+        messages.info(request, "No error report is available for this import.")
+        return redirect('staff:import_job_detail', job_id=job.id)
+    return FileResponse(
+        open(job.error_report_path, 'rb'),
+        as_attachment=True,
+        filename=f'import_{job.id}_errors.csv',
+        content_type='text/csv',
+    )
@@ -0,0 +1,52 @@
+(function () {
+    const card = document.getElementById('importJob');
+    if (!card || card.dataset.finished === '1') {
+        return;
+    }
+
+    const statusUrl = card.dataset.statusUrl;
+
+    function setText(id, value) {
+        const el = document.getElementById(id);
+        if (el) {
+            el.textContent = value;
+        }
+    }
+
+    function render(job) {
+        setText('jobStatus', job.status_display);
+        setText('jobRows', job.rows_processed);
+        setText('jobTotal', job.total_rows === null ? '-' : job.total_rows);
+        setText('jobInserted', job.inserted_count);
+        setText('jobUpdated', job.updated_count);
+        setText('jobUnchanged', job.unchanged_count);
+        setText('jobErrors', job.error_count);
+        setText('jobRate', job.rows_per_second);
+
+        const bar = document.getElementById('jobProgress');
+        bar.style.width = job.progress_percent + '%';
+        bar.setAttribute('aria-valuenow', job.progress_percent);
+        bar.textContent = job.progress_percent + '%';
+
+        setText('jobValidationCount', job.validation_error_count);
+        document.getElementById('jobValidation').classList.toggle('d-none', !job.validation_error_count);
+
+        const errorBox = document.getElementById('jobLastError');
+        errorBox.textContent = job.last_error;
+        errorBox.classList.toggle('d-none', !job.last_error);
+    }
+
+    function poll() {
+        fetch(statusUrl, { headers: { 'Accept': 'application/json' } })
+            .then((response) => response.json())
+            .then((job) => {
+                render(job);
+                if (!job.is_finished) {
+                    setTimeout(poll, 2000);
+                }
+            })
+            .catch(() => setTimeout(poll, 5000));
+    }
+
+    setTimeout(poll, 1000);
+})();